@@ -1,30 +1,167 @@
+#!/usr/bin/env python3
+"""
+Pick the featured game and its badge for every category in games.json.
+
+Deterministic: the same games.json, signals, seed and date always give the
+same result, so re-running it does not churn the file (and with it every
+client's cached catalog and the network-first games.json in sw.js).
+
+Usage:
+  python3 scripts/distribute_badge.py [--signals stats.csv] [--dry-run]
+
+Each visible game (show, non-empty avalid) of a category (first tag) is
+scored from the optional signals CSV (header row; `slug` plus any of
+`plays`, `impressions`, `clicks`, `ctr`): log-scaled plays and a smoothed click-through rate, both
+normalised within the category. Ties, and everything when there are no
+signals, are broken by a seeded hash of the slug. The featured slot(s)
+rotate through the category's top --pool games once per --period; the
+featured game gets 'popular' if it is the category leader and 'hot'
+otherwise. Games without a slot lose 'hot'/'popular'; any other badge
+(e.g. 'new', set by hand) is left alone.
+
+Only `featured` and `badge` are touched, games.json is rewritten only when
+one of them changes, and the changes are printed (and written as JSON with
+--diff-out).
+"""
+import argparse
+import csv
+import hashlib
 import json
-import random
-
-# 路径请根据实际情况调整
-GAMES_JSON_PATH = '/Users/yanmenghou/Desktop/h5games/h5games_poki2/games.json'
-
-with open(GAMES_JSON_PATH, 'r', encoding='utf-8') as f:
-    games = json.load(f)
-
-category_games = {}
-for game in games:
-    tags = game.get('tags', [])
-    if tags:
-        category = tags[0]
-        category_games.setdefault(category, []).append(game)
-
-for category, items in category_games.items():
-    random.shuffle(items)
-    if random.choice([True, False]):
-        items[0]['badge'] = 'popular'
-        items[0]['featured'] = True
-    else:
-        items[0]['badge'] = 'hot'
-        items[0]['featured'] = True
-    for i in range(1, len(items)):
-        items[i]['featured'] = False
-        items[i]['badge'] = 'none'
-
-with open(GAMES_JSON_PATH, 'w', encoding='utf-8') as f:
-    json.dump(games, f, ensure_ascii=False, indent=2)
+import math
+import os
+import sys
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+from common.catalog import CATALOG_PATH, load
+from common.incremental import write_if_changed
+
+# the badges this script hands out; anything else in BADGES is curated by hand
+ROTATION_BADGES = ('hot', 'popular')
+W_PLAYS = 0.6
+W_CTR = 0.4
+# CTR prior: a game with no data counts as 1 click in 20 impressions
+PRIOR_CLICKS = 1.0
+PRIOR_IMPRESSIONS = 20.0
+
+
+def read_signals(path):
+    """slug -> {'plays': float, 'ctr': float}"""
+    signals = {}
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            slug = (row.get('slug') or '').strip()
+            if not slug:
+                continue
+
+            def num(key):
+                try:
+                    return float(row.get(key) or 0)
+                except ValueError:
+                    return 0.0
+            if row.get('ctr'):
+                ctr = num('ctr')
+            else:
+                ctr = (num('clicks') + PRIOR_CLICKS) / (num('impressions') + PRIOR_IMPRESSIONS)
+            signals[slug] = {'plays': num('plays'), 'ctr': ctr}
+    return signals
+
+
+def stable_hash(seed, *parts):
+    key = '\x1f'.join((seed,) + parts).encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'big')
+
+
+def rank(games, signals, seed):
+    """Games best-first: weighted score, then the seeded hash."""
+    plays = {g.slug: signals.get(g.slug, {}).get('plays', 0.0) for g in games}
+    ctrs = {g.slug: signals.get(g.slug, {}).get('ctr') or PRIOR_CLICKS / PRIOR_IMPRESSIONS for g in games}
+    max_plays = math.log1p(max(plays.values(), default=0.0))
+    max_ctr = max(ctrs.values(), default=0.0)
+
+    def score(g):
+        s = 0.0
+        if max_plays > 0:
+            s += W_PLAYS * math.log1p(plays[g.slug]) / max_plays
+        if max_ctr > 0:
+            s += W_CTR * ctrs[g.slug] / max_ctr
+        return s
+    return sorted(games, key=lambda g: (-round(score(g), 9), stable_hash(seed, g.slug)))
+
+
+def period_index(day, period):
+    if period == 'day':
+        return day.toordinal()
+    if period == 'week':
+        year, week, _ = day.isocalendar()
+        return year * 53 + week
+    if period == 'month':
+        return day.year * 12 + day.month
+    return 0
+
+
+def assign(catalog, signals, seed, day, period, pool, slots):
+    """slug -> (featured, badge) for every game in the catalog."""
+    result = {g.slug: (False, '' if g.badge in ROTATION_BADGES else g.badge) for g in catalog}
+    turn = period_index(day, period)
+    for category in catalog.categories():
+        # only games the site actually displays somewhere can hold a slot
+        ranked = rank([g for g in catalog.select(category=category, show=True) if g.avalid], signals, seed)
+        if not ranked:
+            continue
+        candidates = ranked[:max(pool, slots)]
+        start = (turn + stable_hash(seed, 'rotation', category)) % len(candidates)
+        for k in range(min(slots, len(candidates))):
+            g = candidates[(start + k) % len(candidates)]
+            result[g.slug] = (True, 'popular' if g is ranked[0] else 'hot')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--games', default=CATALOG_PATH, help='games.json to update')
+    parser.add_argument('--signals', help='CSV with slug,plays,impressions,clicks (or ctr) per game')
+    parser.add_argument('--seed', default='poki2', help='Seed for tie-breaks and rotation offsets')
+    parser.add_argument('--date', type=date.fromisoformat, default=date.today(),
+                        help='Day the rotation is computed for (YYYY-MM-DD, default today)')
+    parser.add_argument('--period', choices=('day', 'week', 'month', 'never'), default='week',
+                        help='How often featured slots rotate')
+    parser.add_argument('--pool', type=int, default=3, help='Top-ranked games per category that take turns')
+    parser.add_argument('--slots', type=int, default=1, help='Featured games per category')
+    parser.add_argument('--dry-run', action='store_true', help='Print the changes without writing')
+    parser.add_argument('--diff-out', help='Also write the changes as JSON')
+    args = parser.parse_args()
+
+    catalog = load(args.games)
+    signals = read_signals(args.signals) if args.signals else {}
+    unknown = sorted(set(signals) - set(catalog.by_slug))
+    if unknown:
+        print(f'ignoring {len(unknown)} signal rows for unknown slugs, e.g. {unknown[:3]}')
+
+    wanted = assign(catalog, signals, args.seed, args.date, args.period, args.pool, args.slots)
+    games = catalog.to_list()
+    changes = []
+    for g, entry in zip(catalog, games):
+        featured, badge = wanted[g.slug]
+        for key, new in (('featured', featured), ('badge', badge)):
+            if entry.get(key) != new:
+                changes.append({'slug': g.slug, 'field': key, 'old': entry.get(key), 'new': new})
+                entry[key] = new
+
+    for c in changes:
+        print(f"{c['slug']}: {c['field']} {c['old']!r} -> {c['new']!r}")
+    if args.diff_out:
+        with open(args.diff_out, 'w', encoding='utf-8') as f:
+            json.dump(changes, f, ensure_ascii=False, indent=2)
+    if not changes:
+        print('No ranking changes; games.json left untouched')
+        return
+    if args.dry_run:
+        print(f'{len(changes)} field change(s) (dry run, nothing written)')
+        return
+    write_if_changed(args.games, json.dumps(games, ensure_ascii=False, indent=2))
+    print(f'{len(changes)} field change(s) written to {args.games}')
+
+
+if __name__ == '__main__':
+    main()
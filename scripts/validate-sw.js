@@ -82,6 +82,23 @@ async function main() {
     process.exit(2);
   }
 
+  // precache-manifest.json (tools/content/build_sw_precache.py) maps each URL to its file
+  const precachePath = path.join(dist, 'precache-manifest.json');
+  if (fs.existsSync(precachePath)) {
+    const precache = JSON.parse(fs.readFileSync(precachePath, 'utf8'));
+    const missingFiles = [];
+    const unreachableUrls = [];
+    for (const e of precache.entries) {
+      if (!fileExists(dist, e.file)) missingFiles.push(e.url + ' (' + e.file + ')');
+      if (httpBase && !(await checkHttp(httpBase, e.url))) unreachableUrls.push(e.url);
+    }
+    missingFiles.forEach(m => console.error('Missing precache file:', m));
+    unreachableUrls.forEach(u => console.error(`Unreachable over HTTP at ${httpBase}:`, u));
+    if (missingFiles.length || unreachableUrls.length) process.exit(2);
+    console.log(`All ${precache.entries.length} precache entries (${precache.version}) exist in`, dist, httpBase ? ('and are reachable at ' + httpBase) : '');
+    process.exit(0);
+  }
+
   const entries = readSwPrecache(swPath);
   if (!entries) {
     console.error('Failed to parse cache.addAll(...) from', swPath);
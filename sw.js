@@ -3,29 +3,52 @@
    Version: v2
    ============================================================ */
 
+/* Runtime cache; tools/content/build_sw_precache.py stamps it to poki2-<hash of dist's static files>,
+   so activate drops it whenever one of them changes */
 const CACHE_NAME = 'poki2-v3';
 const STATIC_EXTS = /\.(css|js|png|webp|ico|svg|woff2?|ttf|eot|otf|gif|jpg|jpeg)(\?.*)?$/i;
 
-/* ---- Install: pre-cache shell ---- */
+/* ---- Precache list: [url, revision] pairs written by tools/content/build_sw_precache.py ---- */
+const PRECACHE_VERSION = 'dev';
+const PRECACHE = [['/', ''], ['/css/style.css', ''], ['/js/app.js', ''], ['/manifest.json', '']];
+const PRECACHE_CACHE = 'poki2-precache';
+/* Entries are stored under url?__rev=<revision>, so an unchanged asset is never fetched again */
+const precacheKey = (url, rev) => rev ? url + (url.includes('?') ? '&' : '?') + '__rev=' + rev : url;
+const PRECACHE_KEYS = new Map(PRECACHE.map(([url, rev]) => [url, precacheKey(url, rev)]));
+
+/* ---- Install: fetch only precache entries whose revision is not cached yet ---- */
 self.addEventListener('install', e => {
   self.skipWaiting();
   e.waitUntil(
-    caches.open(CACHE_NAME).then(cache =>
-      cache.addAll(['/', '/index.html', '/css/style.css', '/js/app.js', '/manifest.json'])
-        .catch(() => { /* non-fatal: versioned filenames may differ */ })
+    caches.open(PRECACHE_CACHE).then(cache =>
+      Promise.allSettled(PRECACHE.map(([url, rev]) => {
+        const key = precacheKey(url, rev);
+        return cache.match(key).then(hit => hit || fetch(url, { cache: 'no-cache' }).then(res => {
+          if (!res.ok) throw new Error(url + ' ' + res.status);
+          return cache.put(key, res);
+        }));
+      })).then(results => {
+        const failed = results.filter(r => r.status === 'rejected');
+        if (failed.length) console.warn('[SW] precache ' + PRECACHE_VERSION + ': ' + failed.length + ' entries failed', failed.map(r => String(r.reason)));
+      })
     )
   );
 });
 
-/* ---- Activate: purge old caches ---- */
+/* ---- Activate: drop other caches and precache revisions no longer listed ---- */
 self.addEventListener('activate', e => {
+  const keep = new Set(Array.from(PRECACHE_KEYS.values(), key => new URL(key, self.location.origin).href));
   e.waitUntil(
     caches.keys()
-      .then(keys => Promise.all(keys.filter(k => k !== CACHE_NAME).map(k => caches.delete(k))))
+      .then(keys => Promise.all(keys.filter(k => k !== CACHE_NAME && k !== PRECACHE_CACHE).map(k => caches.delete(k))))
+      .then(() => caches.open(PRECACHE_CACHE))
+      .then(cache => cache.keys().then(reqs => Promise.all(reqs.filter(r => !keep.has(r.url)).map(r => cache.delete(r)))))
       .then(() => clients.claim())
   );
 });
 
+const fromPrecache = path => caches.open(PRECACHE_CACHE).then(c => c.match(PRECACHE_KEYS.get(path)));
+
 /* ---- Fetch strategy ---- */
 self.addEventListener('fetch', e => {
   const req = e.request;
@@ -51,7 +74,8 @@ self.addEventListener('fetch', e => {
   /* Cache-first for static assets (hashed filenames, images, fonts, CSS/JS) */
   if (STATIC_EXTS.test(path) || path.includes('/assets/')) {
     e.respondWith(
-      caches.match(req).then(cached => {
+      (PRECACHE_KEYS.has(path) ? fromPrecache(path) : Promise.resolve())
+        .then(hit => hit || caches.match(req)).then(cached => {
         if (cached) return cached;
         return fetch(req).then(res => {
           if (res.ok && res.status < 300) {
@@ -73,7 +97,7 @@ self.addEventListener('fetch', e => {
           const network = fetch(req).then(res => {
             if (res.ok) cache.put(req, res.clone());
             return res;
-          }).catch(() => cached);
+          }).catch(() => cached || fromPrecache(PRECACHE_KEYS.has(path) ? path : PRECACHE_KEYS.has('/offline') ? '/offline' : '/'));
           return cached || network;
         })
       )
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Synthetic corpus for the tools/bench harness.
+
+Usage:
+  python3 tools/bench/corpus.py --out tools/.cache/bench/corpus [--games 300] [--urls 20000]
+      [--page-kb 12] [--bundle-kb 192] [--seed 1]
+
+Writes, deterministically for a given seed:
+  shards/c/<slug>/      index.html (about --page-kb), game.js (about
+                        --bundle-kb of minified-looking code), thumbnail.png
+  site/                 a portal shaped like this repo: index.html, 404.html,
+                        css/, js/, _redirects, _headers and games/<slug>/
+                        (the shard's files, bundles hard-linked)
+  site/sitemap.xml      --urls URLs: every game page, then legacy ?game=
+                        query links up to the count
+  corpus.json           the parameters and file counts
+
+Pages share a header, nav and related-game links, so they look alike the
+way real game pages do; a few percent repeat another page's text (near
+duplicates), link to a game that does not exist, miss an alt text or
+load a third-party script, so every tool has something to report.
+generate() leaves an existing corpus alone when its corpus.json matches.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import struct
+import sys
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.sitemap import SitemapEntry, SitemapWriter
+
+VERSION = 1
+DOMAIN = 'https://poki2.online'
+SHARD = 'c'
+SHARD_DOMAIN = 'https://c.poki2.online'
+
+WORDS = ('jump run race puzzle match block tower defense zombie car drift bike parkour stickman '
+         'merge idle tycoon farm city build craft cube ball color shoot arena battle io snake '
+         'maze escape adventure quest dragon ninja space galaxy rocket planet ocean fish cook '
+         'restaurant dress fashion doctor pet dog cat horse soccer basketball golf pool tennis '
+         'chess sudoku word solitaire mahjong bubble candy fruit slice draw line physics '
+         'level stage coins upgrade unlock skin boss enemy friend online multiplayer player').split()
+CATEGORIES = ('action', 'puzzle', 'racing', 'sports', 'girls', 'io', 'idle', 'shooting', 'casual', 'kids')
+AD_HOSTS = ('https://cdn.adnet.example/tag.js', 'https://stats.example.org/s.js',
+            'https://widgets.example.net/share.js')
+
+
+def png(width, height, rgb):
+    """A solid-colour PNG, enough for the image sniffing in common.images."""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    row = b'\x00' + bytes(rgb) * width
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(row * height, 9)) + chunk(b'IEND', b''))
+
+
+def sentence(rng, n):
+    words = [rng.choice(WORDS) for _ in range(n)]
+    return ' '.join(words).capitalize() + '.'
+
+
+def slug_for(i):
+    return f'{WORDS[i % len(WORDS)]}-{WORDS[(i * 7 + 3) % len(WORDS)]}-{i}'
+
+
+def bundle_pool(rng, chunks=16, chunk_bytes=16384):
+    """Chunks of minified-looking JS; bundles are assembled from them."""
+    pool = []
+    for c in range(chunks):
+        parts = []
+        size = 0
+        while size < chunk_bytes:
+            name = f'_{rng.randrange(1 << 20):x}'
+            if rng.random() < 0.02:
+                line = f'var {name}="{"".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/") for _ in range(160))}";'
+            else:
+                line = (f'function {name}(a,b){{var c=a*{rng.randrange(97)}+b;'
+                        f'if(c>{rng.randrange(1000)})return this.{rng.choice(WORDS)}(c,"{rng.choice(WORDS)}");'
+                        f'return[a,b,c].map(function(d){{return d|{rng.randrange(255)}}})}}')
+            parts.append(line)
+            size += len(line)
+        pool.append(''.join(parts))
+    return pool
+
+
+def game_page(rng, i, slug, title, description, related, page_bytes, broken, third_party, no_alt):
+    head = [
+        '<!doctype html>', '<html lang="en">', '<head>', '<meta charset="utf-8">',
+        '<meta name="viewport" content="width=device-width, initial-scale=1">',
+        f'<title>{title} - Play Free Online</title>',
+        f'<meta name="description" content="{description}">',
+        f'<link rel="canonical" href="{DOMAIN}/games/{slug}/">',
+        '<link rel="stylesheet" href="/css/style.css">',
+        '<script src="/js/app.js" defer></script>',
+    ]
+    if third_party:
+        head.append(f'<script src="{AD_HOSTS[i % len(AD_HOSTS)]}" async></script>')
+    head.append('</head>')
+    body = ['<body>', '<header><a href="/"><img src="/assets/logo.png" alt="Poki2"></a>',
+            '<nav>' + ''.join(f'<a href="/category/{c}/">{c.title()}</a>' for c in CATEGORIES) + '</nav>',
+            '</header>', '<main>', f'<h1>{title}</h1>',
+            '<img src="thumbnail.png" width="64" height="64">' if no_alt
+            else f'<img src="thumbnail.png" alt="{title}" width="64" height="64">',
+            '<canvas id="game"></canvas>', '<script src="game.js"></script>', '<section class="related">']
+    for other_slug, other_title in related:
+        body.append(f'<a href="/games/{other_slug}/"><img src="/games/{other_slug}/thumbnail.png" '
+                    f'alt="{other_title}" loading="lazy">{other_title}</a>')
+    if broken:
+        body.append(f'<a href="/games/removed-game-{i}/">More</a>')
+    body.append('</section>')
+    text = ['<section class="about">', f'<p>{description}</p>']
+    size = sum(len(x) for x in head + body + text) + 200
+    while size < page_bytes:
+        p = '<p>' + ' '.join(sentence(rng, rng.randrange(8, 20)) for _ in range(4)) + '</p>'
+        text.append(p)
+        size += len(p)
+    tail = ['</section>', '</main>', '<footer><a href="/about.html">About</a> <a href="/privacy.html">Privacy</a></footer>',
+            '</body>', '</html>']
+    return '\n'.join(head + body + text + tail) + '\n'
+
+
+def link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def generate(out, games=300, urls=20000, page_kb=12, bundle_kb=192, seed=1, force=False):
+    """Build the corpus under out (or reuse it); returns corpus.json's content."""
+    params = {'version': VERSION, 'games': games, 'urls': urls, 'page_kb': page_kb,
+              'bundle_kb': bundle_kb, 'seed': seed}
+    meta_path = os.path.join(out, 'corpus.json')
+    if not force and os.path.exists(meta_path):
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('params') == params:
+            return meta
+    if os.path.isdir(out):
+        shutil.rmtree(out)
+
+    rng = random.Random(seed)
+    shard = os.path.join(out, 'shards', SHARD)
+    site = os.path.join(out, 'site')
+    pool = bundle_pool(rng)
+    slugs = [slug_for(i) for i in range(games)]
+    titles = [' '.join(w.capitalize() for w in s.split('-')[:2]) + f' {i}' for i, s in enumerate(slugs)]
+    descriptions = [sentence(rng, rng.randrange(14, 26)) for _ in range(games)]
+    thumb = png(64, 64, (40, 120, 200))
+    files = 0
+    total = 0
+
+    for i, slug in enumerate(slugs):
+        # a near duplicate repeats an earlier page's description and text
+        source = rng.randrange(i) if i and rng.random() < 0.04 else i
+        related = [(slugs[j], titles[j]) for j in rng.sample(range(games), min(12, games))]
+        page = game_page(random.Random(seed * 1000003 + source), i, slug, titles[i], descriptions[source],
+                         related, page_kb * 1024,
+                         broken=rng.random() < 0.02, third_party=rng.random() < 0.05,
+                         no_alt=rng.random() < 0.03)
+        n = max(1, bundle_kb * 1024 // len(pool[0]))
+        bundle = ''.join(pool[(i + k * 5) % len(pool)] for k in range(n))
+        game_dir = os.path.join(shard, slug)
+        site_dir = os.path.join(site, 'games', slug)
+        os.makedirs(game_dir)
+        os.makedirs(site_dir)
+        for name, data in (('index.html', page.encode('utf-8')), ('game.js', bundle.encode('utf-8')),
+                           ('thumbnail.png', thumb)):
+            with open(os.path.join(game_dir, name), 'wb') as f:
+                f.write(data)
+            if name == 'index.html':
+                with open(os.path.join(site_dir, name), 'wb') as f:
+                    f.write(data)
+            else:
+                link_or_copy(os.path.join(game_dir, name), os.path.join(site_dir, name))
+            files += 2
+            total += 2 * len(data)
+
+    home = ['<!doctype html>', '<html lang="en">', '<head>', '<meta charset="utf-8">',
+            '<title>Poki2 - Free Online Games</title>', '<link rel="stylesheet" href="/css/style.css">',
+            '<script src="/js/app.js" defer></script>', '</head>', '<body>', '<main>']
+    home += [f'<a href="/games/{s}/"><img src="/games/{s}/thumbnail.png" alt="{t}" loading="lazy">{t}</a>'
+             for s, t in zip(slugs, titles)]
+    home += ['</main>', '</body>', '</html>']
+    css = ''.join(f'.c{k}{{margin:{k % 9}px;color:#{k * 2654435761 % 0xffffff:06x}}}' for k in range(1500))
+    app = ''.join(pool[:4])
+    static = {
+        'index.html': '\n'.join(home) + '\n',
+        '404.html': '<!doctype html><html><head><title>Not found</title></head><body><a href="/">Home</a></body></html>\n',
+        'about.html': f'<!doctype html><html><head><title>About</title></head><body><p>{sentence(rng, 40)}</p></body></html>\n',
+        'privacy.html': f'<!doctype html><html><head><title>Privacy</title></head><body><p>{sentence(rng, 60)}</p></body></html>\n',
+        'css/style.css': css,
+        'js/app.js': app,
+        '_headers': '/*\n  X-Content-Type-Options: nosniff\n/games/*\n  Cache-Control: public, max-age=3600\n',
+        '_redirects': ''.join(f'/play/{s} /games/{s}/ 301\n' for s in slugs[:200])
+                      + '/category/:name/* /category/:name/ 301\n/old/* /games/:splat 301\n',
+    }
+    for c in CATEGORIES:
+        static[f'category/{c}/index.html'] = ('<!doctype html><html><head><title>' + c + '</title></head><body>'
+                                              + ''.join(f'<a href="/games/{s}/">{t}</a>' for s, t in
+                                                        zip(slugs[CATEGORIES.index(c)::len(CATEGORIES)],
+                                                            titles[CATEGORIES.index(c)::len(CATEGORIES)]))
+                                              + '</body></html>\n')
+    static_bin = {'assets/logo.png': png(120, 40, (230, 60, 90))}
+    for rel, data in list(static.items()) + list(static_bin.items()):
+        path = os.path.join(site, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = data.encode('utf-8') if isinstance(data, str) else data
+        with open(path, 'wb') as f:
+            f.write(data)
+        files += 1
+        total += len(data)
+    # policy_scan writes its report to ./tools
+    os.makedirs(os.path.join(site, 'tools'), exist_ok=True)
+
+    writer = SitemapWriter(site, base_url=DOMAIN)
+    count = 0
+    for s in slugs:
+        if count >= urls:
+            break
+        writer.add(SitemapEntry(f'{DOMAIN}/games/{s}/', lastmod='2024-05-01'))
+        count += 1
+    k = 0
+    while count < urls:
+        writer.add(SitemapEntry(f'{DOMAIN}/?game={slugs[k % games]}&ref={k // games}'))
+        count += 1
+        k += 1
+    writer.close()
+
+    meta = {'params': params, 'domain': DOMAIN, 'shard': SHARD, 'shard_domain': SHARD_DOMAIN,
+            'files': files, 'bytes': total, 'sitemap_urls': count}
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=1)
+    return meta
+
+
+def add_corpus_args(parser):
+    parser.add_argument('--games', type=int, default=300, help='Game pages (default 300)')
+    parser.add_argument('--urls', type=int, default=20000, help='Sitemap URLs (default 20000)')
+    parser.add_argument('--page-kb', type=int, default=12, help='Approximate game page size (default 12)')
+    parser.add_argument('--bundle-kb', type=int, default=192, help='Approximate game.js size (default 192)')
+    parser.add_argument('--seed', type=int, default=1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--out', required=True, help='Corpus folder (replaced when the parameters change)')
+    parser.add_argument('--force', action='store_true', help='Regenerate even if the parameters match')
+    add_corpus_args(parser)
+    args = parser.parse_args()
+    meta = generate(args.out, args.games, args.urls, args.page_kb, args.bundle_kb, args.seed, args.force)
+    print(f"Corpus in {args.out}: {meta['params']['games']} games, {meta['sitemap_urls']} sitemap URLs, "
+          f"{meta['files']} files, {meta['bytes'] / 1e6:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
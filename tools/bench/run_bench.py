@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Time the Python content and audit tools on a synthetic corpus.
+
+Usage:
+  python3 tools/bench/run_bench.py [--games 300] [--urls 20000] [--repeat 3]
+      [--tool policy_scan ...] [--out tools/.cache/bench/latest.json]
+      [--compare tools/.cache/bench/baseline.json] [--tolerance 0.15]
+      [--tracemalloc]
+
+The corpus comes from corpus.py (see there for its layout and the size
+options) and is reused while its parameters stay the same. Each tool runs
+--repeat times as a child process, cold (--no-cache) and with its inputs
+reset before every run (apply_seo gets a fresh copy of the shard,
+generate_seo an empty output folder), so runs are independent. Per run
+the child's wall time, user/system CPU and peak RSS (os.wait4 rusage) are
+recorded, along with the phase timings and counters the tool writes
+with --metrics-json (common/metrics.py); a tool's figures are the fastest
+run (and its phases) and the largest RSS.
+--tracemalloc also records the peak of Python allocations (through
+traced.py); it slows the tools down, so such runs are only compared with
+each other.
+
+The JSON result holds the environment, the corpus parameters and every
+run. --compare flags a tool whose time grew by more than --tolerance (and
+--min-delta seconds), or whose RSS grew by more than --rss-tolerance, and
+exits 1 when anything regressed. Runs on a different corpus are not
+compared. Exit codes of the tools are recorded but not judged: several
+exit 1 when they report findings, which the corpus plants on purpose.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows: no rusage, RSS is not reported
+    resource = None
+
+import corpus as synthetic
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+TOOLS_DIR = os.path.dirname(BENCH_DIR)
+CACHE_DIR = os.path.join(TOOLS_DIR, '.cache', 'bench')
+TRACED = os.path.join(BENCH_DIR, 'traced.py')
+
+
+def script(rel):
+    return os.path.join(TOOLS_DIR, rel)
+
+
+def fresh_dir(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.makedirs(path)
+
+
+def copy_shard(src, dst):
+    """Copy of a shard apply_seo may patch: pages copied, everything else hard-linked."""
+    if os.path.isdir(dst):
+        shutil.rmtree(dst)
+
+    def copy(s, d):
+        if s.endswith('.html'):
+            return shutil.copy2(s, d)
+        try:
+            os.link(s, d)
+        except OSError:
+            shutil.copy2(s, d)
+        return d
+    shutil.copytree(src, dst, copy_function=copy)
+
+
+def tool_specs(corpus_dir, meta, work):
+    """name -> (script, args, cwd, prepare); run in this order."""
+    shard = os.path.join(corpus_dir, 'shards', meta['shard'])
+    site = os.path.join(corpus_dir, 'site')
+    seo_out = os.path.join(work, f"dist_seo_{meta['shard']}")
+    target = os.path.join(work, f"target_{meta['shard']}")
+    convert = os.path.join(work, 'convert')
+    generate_args = ['--input', shard, '--domain', meta['shard_domain'], '--output', seo_out, '--no-cache']
+
+    def prepare_apply():
+        if not os.path.isdir(seo_out):
+            subprocess.run([sys.executable, script('content/generate_seo.py')] + generate_args,
+                           cwd=work, stdout=subprocess.DEVNULL, check=True)
+        copy_shard(shard, target)
+
+    def prepare_convert():
+        fresh_dir(convert)
+        shutil.copyfile(os.path.join(site, 'sitemap.xml'), os.path.join(convert, 'sitemap.xml'))
+
+    return {
+        'generate_seo': ('content/generate_seo.py', generate_args, work, lambda: fresh_dir(seo_out)),
+        'apply_seo': ('content/apply_seo.py', ['--source', seo_out, '--target', target,
+                                               '--domain', meta['shard_domain']], work, prepare_apply),
+        'policy_scan': ('legacy/policy_scan.py', ['--no-cache'], site, None),
+        'check_links': ('legacy/check_links.py', ['--no-cache'], site, None),
+        'check_sitemap_local': ('legacy/check_sitemap_local.py',
+                                ['--sitemap', os.path.join(site, 'sitemap.xml'), '--dist', site,
+                                 '--out', os.path.join(work, 'sitemap_local_report.csv')], work, None),
+        'convert_sitemap': ('legacy/convert_sitemap.py', [], convert, prepare_convert),
+        'compile_redirects': ('content/compile_redirects.py',
+                              ['--redirects', os.path.join(site, '_redirects'),
+                               '--out', os.path.join(work, 'redirects.json')], work, None),
+        'page_weight': ('legacy/page_weight.py', ['--dist', site, '--json', os.path.join(work, 'page_weight.json')],
+                        work, None),
+    }
+
+
+def measure(cmd, cwd, log_path):
+    """Run cmd to completion; wall seconds, exit code and the child's rusage (or None)."""
+    env = dict(os.environ, PYTHONHASHSEED='0')
+    with open(log_path, 'wb') as log:
+        t0 = time.perf_counter()
+        proc = subprocess.Popen(cmd, cwd=cwd, stdout=log, stderr=subprocess.STDOUT, env=env)
+        if resource is not None and hasattr(os, 'wait4'):
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+        else:
+            proc.wait()
+            usage = None
+        seconds = time.perf_counter() - t0
+    return seconds, proc.returncode, usage
+
+
+def run_tool(name, spec, work, repeat, traced):
+    rel, args, cwd, prepare = spec
+    runs = []
+    log_path = os.path.join(work, 'logs', name + '.log')
+    for _ in range(repeat):
+        if prepare:
+            prepare()
+        metrics_path = os.path.join(work, 'logs', name + '.metrics.json')
+        cmd = [sys.executable, script(rel)] + args + ['--metrics-json', metrics_path]
+        trace_path = os.path.join(work, 'logs', name + '.trace.json')
+        if traced:
+            cmd = [sys.executable, TRACED, trace_path] + cmd[1:]
+        seconds, code, usage = measure(cmd, cwd, log_path)
+        run = {'seconds': round(seconds, 4), 'returncode': code}
+        if usage is not None:
+            # ru_maxrss is KiB on Linux and bytes on macOS
+            rss = usage.ru_maxrss // 1024 if sys.platform == 'darwin' else usage.ru_maxrss
+            run.update(user=round(usage.ru_utime, 4), sys=round(usage.ru_stime, 4), max_rss_kb=rss)
+        if traced and os.path.exists(trace_path):
+            with open(trace_path, 'r', encoding='utf-8') as f:
+                run['py_peak_kb'] = json.load(f)['peak_bytes'] // 1024
+            os.remove(trace_path)
+        if os.path.exists(metrics_path):
+            with open(metrics_path, 'r', encoding='utf-8') as f:
+                reported = json.load(f)
+            os.remove(metrics_path)
+            run.update(phases=reported['phases'], counters=reported['counters'])
+        runs.append(run)
+    times = sorted(r['seconds'] for r in runs)
+    result = {'seconds': times[0], 'median': times[len(times) // 2], 'returncode': runs[-1]['returncode'],
+              'runs': runs}
+    fastest = min(runs, key=lambda r: r['seconds'])
+    if 'phases' in fastest:
+        result['phases'] = fastest['phases']
+    for key in ('user', 'sys'):
+        if key in runs[0]:
+            result[key] = min(r[key] for r in runs)
+    for key in ('max_rss_kb', 'py_peak_kb'):
+        if key in runs[0]:
+            result[key] = max(r[key] for r in runs)
+    return result
+
+
+def comparable(results, previous):
+    return previous.get('corpus', {}).get('params') == results['corpus']['params'] \
+        and previous.get('tracemalloc') == results['tracemalloc']
+
+
+def compare(results, previous, tolerance, rss_tolerance, min_delta):
+    """[(tool, what, old, new)] for every regression."""
+    regressions = []
+    for name, new in results['tools'].items():
+        old = previous.get('tools', {}).get(name)
+        if not old:
+            continue
+        if new['seconds'] > old['seconds'] * (1 + tolerance) and new['seconds'] - old['seconds'] > min_delta:
+            regressions.append((name, 'seconds', old['seconds'], new['seconds']))
+        if 'max_rss_kb' in new and 'max_rss_kb' in old \
+                and new['max_rss_kb'] > old['max_rss_kb'] * (1 + rss_tolerance) \
+                and new['max_rss_kb'] - old['max_rss_kb'] > 1024:
+            regressions.append((name, 'max_rss_kb', old['max_rss_kb'], new['max_rss_kb']))
+    return regressions
+
+
+def change(old, new):
+    return f'{(new - old) / old:+.0%}' if old else ''
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--corpus', default=os.path.join(CACHE_DIR, 'corpus'), help='Synthetic corpus folder')
+    parser.add_argument('--work', default=os.path.join(CACHE_DIR, 'work'), help='Scratch folder for tool outputs')
+    synthetic.add_corpus_args(parser)
+    parser.add_argument('--tool', action='append', help='Run just this tool (repeatable)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per tool (default 3)')
+    parser.add_argument('--tracemalloc', action='store_true', help='Also record peak Python allocations (slower)')
+    parser.add_argument('--out', default=os.path.join(CACHE_DIR, 'latest.json'), help='Write the results here')
+    parser.add_argument('--compare', help='Earlier results JSON to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='Allowed time growth (default 0.15)')
+    parser.add_argument('--rss-tolerance', type=float, default=0.20, help='Allowed peak RSS growth (default 0.20)')
+    parser.add_argument('--min-delta', type=float, default=0.05,
+                        help='Ignore time growth below this many seconds (default 0.05)')
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    meta = synthetic.generate(args.corpus, args.games, args.urls, args.page_kb, args.bundle_kb, args.seed)
+    print(f"Corpus {args.corpus}: {meta['params']['games']} games, {meta['sitemap_urls']} sitemap URLs, "
+          f"{meta['bytes'] / 1e6:.1f} MB ({time.perf_counter() - t0:.1f}s)")
+    fresh_dir(args.work)
+    os.makedirs(os.path.join(args.work, 'logs'))
+    specs = tool_specs(os.path.abspath(args.corpus), meta, os.path.abspath(args.work))
+    unknown = set(args.tool or ()) - set(specs)
+    if unknown:
+        parser.error(f"unknown tool(s) {', '.join(sorted(unknown))}; choose from {', '.join(specs)}")
+    names = [n for n in specs if not args.tool or n in args.tool]
+
+    results = {'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+               'platform': platform.platform(), 'cpus': os.cpu_count(), 'corpus': meta,
+               'repeat': args.repeat, 'tracemalloc': args.tracemalloc, 'tools': {}}
+    previous = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        if not comparable(results, previous):
+            print(f'warning: {args.compare} used another corpus or tracemalloc setting; not compared')
+            previous = None
+
+    print(f"{'tool':<20} {'seconds':>8} {'median':>8} {'cpu':>8} {'rss MB':>8} {'exit':>4}")
+    for name in names:
+        r = run_tool(name, specs[name], os.path.abspath(args.work), max(1, args.repeat), args.tracemalloc)
+        results['tools'][name] = r
+        cpu = f"{r['user'] + r['sys']:.2f}" if 'user' in r else '-'
+        rss = f"{r['max_rss_kb'] / 1024:.1f}" if 'max_rss_kb' in r else '-'
+        line = f"{name:<20} {r['seconds']:>8.3f} {r['median']:>8.3f} {cpu:>8} {rss:>8} {r['returncode']:>4}"
+        if 'py_peak_kb' in r:
+            line += f"  py peak {r['py_peak_kb'] / 1024:.1f} MB"
+        old = (previous or {}).get('tools', {}).get(name)
+        if old:
+            line += f"  ({change(old['seconds'], r['seconds'])} time"
+            if 'max_rss_kb' in r and 'max_rss_kb' in old:
+                line += f", {change(old['max_rss_kb'], r['max_rss_kb'])} rss"
+            line += ')'
+        print(line)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=1)
+    print('Results written to', args.out, f'(logs in {os.path.join(args.work, "logs")})')
+
+    if previous is not None:
+        regressions = compare(results, previous, args.tolerance, args.rss_tolerance, args.min_delta)
+        if regressions:
+            print(f'\n{len(regressions)} regression(s) against {args.compare}:')
+            for name, what, old, new in regressions:
+                print(f'  {name}: {what} {old} -> {new} ({change(old, new)})')
+            sys.exit(1)
+        else:
+            print(f'No regressions against {args.compare}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Run a Python script under tracemalloc and record its peak traced memory.
+
+Usage:
+  python3 tools/bench/traced.py RESULT.json script.py [args...]
+
+Used by run_bench.py --tracemalloc. The script runs as __main__ with
+sys.argv and sys.path[0] set as if it had been launched directly, and
+RESULT.json gets {"peak_bytes", "current_bytes"} however it exits.
+"""
+import json
+import os
+import runpy
+import sys
+import tracemalloc
+
+
+def main():
+    result, script = sys.argv[1], sys.argv[2]
+    sys.argv = sys.argv[2:]
+    sys.path[0] = os.path.dirname(os.path.abspath(script))
+    tracemalloc.start()
+    try:
+        runpy.run_path(script, run_name='__main__')
+    finally:
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        with open(result, 'w', encoding='utf-8') as f:
+            json.dump({'peak_bytes': peak, 'current_bytes': current}, f)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1 @@
+"""Shared helpers for the Python tools under tools/content and tools/legacy."""
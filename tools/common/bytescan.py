@@ -0,0 +1,125 @@
+"""
+Scan big files in place through mmap instead of decoding them.
+
+Reading a file for a regex scan holds it as bytes, then as str, and for
+case-insensitive checks as a lowercased str too: a 20 MB game bundle costs
+three 20 MB copies. Files of at least --mmap-threshold bytes are mapped
+read-only instead and searched with the bytes twin of each pattern; only
+the matches are decoded (UTF-8, errors ignored, as the reads were).
+
+  with mapped(path) as buf:
+      refs = findall(bytes_regex(ref_re, ignorecase=False), buf)
+      found = present(buf, ['porn', 'full game'])
+
+LoweredText and MappedText give the two paths one interface for scanners
+written against lowercased text: present(needles) and findall(regex),
+with matches lowercased. present() lowercases the map a chunk at a time,
+overlapping the chunks by the longest needle, which is several times faster
+than one re.IGNORECASE search per needle. bytes_regex() compiles with
+re.IGNORECASE by default; the patterns must be ASCII, and in bytes
+patterns \\s and \\w only match ASCII.
+
+While a file is scanned its pages count towards RSS, but they are clean
+page cache the kernel can drop, unlike decoded copies, so memory no longer
+grows with the size of the biggest bundle.
+"""
+import mmap
+import re
+from contextlib import contextmanager
+from functools import lru_cache
+
+MMAP_THRESHOLD = 4 << 20
+CHUNK = 1 << 20
+
+
+def add_mmap_args(parser):
+    parser.add_argument('--mmap-threshold', type=int, default=MMAP_THRESHOLD, metavar='BYTES',
+                        help=f'Scan files of at least this size in place through mmap (default {MMAP_THRESHOLD})')
+
+
+@contextmanager
+def mapped(path):
+    """Read-only mmap of path (b'' for an empty file, which cannot be mapped)."""
+    with open(path, 'rb') as f:
+        try:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            yield b''
+            return
+        with buf:
+            if hasattr(buf, 'madvise'):
+                buf.madvise(mmap.MADV_SEQUENTIAL)
+            yield buf
+
+
+@lru_cache(maxsize=None)
+def bytes_regex(regex, ignorecase=True):
+    """The bytes twin of a compiled ASCII str pattern."""
+    flags = regex.flags & (re.IGNORECASE | re.MULTILINE | re.DOTALL | re.VERBOSE)
+    if ignorecase:
+        flags |= re.IGNORECASE
+    return re.compile(regex.pattern.encode('ascii'), flags)
+
+
+def _decode(data, lower):
+    text = data.decode('utf-8', 'ignore')
+    return text.lower() if lower else text
+
+
+def findall(regex, buf, lower=False):
+    """regex.findall(buf) with every match (or group tuple) decoded to str."""
+    out = []
+    for m in regex.findall(buf):
+        if isinstance(m, tuple):
+            out.append(tuple(_decode(g, lower) for g in m))
+        else:
+            out.append(_decode(m, lower))
+    return out
+
+
+def present(buf, needles):
+    """The lowercase ASCII needles that occur in buf, in any case."""
+    encoded = {n: n.encode('ascii') for n in needles}
+    overlap = max(map(len, encoded.values()), default=1) - 1
+    found = set()
+    tail = b''
+    for start in range(0, len(buf), CHUNK):
+        chunk = tail + buf[start:start + CHUNK].lower()
+        found.update(n for n, e in encoded.items() if n not in found and e in chunk)
+        if len(found) == len(encoded):
+            break
+        tail = chunk[len(chunk) - overlap:] if overlap else b''
+    return found
+
+
+class LoweredText:
+    """A file read into memory and lowercased: the small-file path."""
+
+    def __init__(self, text):
+        self.text = text.lower()
+
+    def __len__(self):
+        return len(self.text)
+
+    def present(self, needles):
+        return {n for n in needles if n in self.text}
+
+    def findall(self, regex, ignorecase=True):
+        return regex.findall(self.text)
+
+
+class MappedText:
+    """A mapped file behind the LoweredText interface; matches come back lowercased."""
+
+    def __init__(self, buf):
+        self.buf = buf
+        self.text = None
+
+    def __len__(self):
+        return len(self.buf)
+
+    def present(self, needles):
+        return present(self.buf, needles)
+
+    def findall(self, regex, ignorecase=True):
+        return findall(bytes_regex(regex, ignorecase), self.buf, lower=True)
@@ -0,0 +1,256 @@
+"""
+games.json loaded once into compact, indexed records.
+
+    from common.catalog import load
+    cat = load()
+    cat.get('2048')
+    cat.select(category='puzzle', platform='mobile', show=True)
+
+Every game becomes a Game (__slots__, file order kept in .index) with its
+slug (last path segment of `link`, as the site's JS derives it) and
+category (first tag). Indexes by slug, tag, category, input type,
+orientation, `avalid` platform, `show` and `featured` are built up front,
+so select() intersects a few precomputed index sets instead of scanning
+the list.
+
+The file is validated on load: structural problems raise CatalogError
+listing every offending entry, while oddities the site tolerates (unknown
+input types, an empty avalid) are kept in Catalog.warnings. A validated
+catalog is pickled to tools/.cache/catalog-snapshot.pickle keyed by the
+SHA-256 of games.json (and of this module), so later runs skip parsing and
+indexing until either changes.
+"""
+import hashlib
+import json
+import os
+import pickle
+from urllib.parse import urlparse
+
+TOOLS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CATALOG_PATH = os.path.join(os.path.dirname(TOOLS_DIR), 'games.json')
+SNAPSHOT_PATH = os.path.join(TOOLS_DIR, '.cache', 'catalog-snapshot.pickle')
+
+
+def _code_digest():
+    # a snapshot pickles Game/Catalog instances, so it is only valid for this code
+    with open(os.path.abspath(__file__), 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+SNAPSHOT_VERSION = _code_digest()
+
+# games.json key -> (Game attribute, expected type)
+FIELDS = {
+    'title': ('title', str),
+    'link': ('link', str),
+    'imgSrc': ('img_src', str),
+    'icons': ('icons', dict),
+    'tags': ('tags', list),
+    'input': ('input', list),
+    'orientation': ('orientation', str),
+    'avalid': ('avalid', list),
+    'show': ('show', bool),
+    'use_overlay_title': ('use_overlay_title', bool),
+    'featured': ('featured', bool),
+    'badge': ('badge', str),
+    'description': ('description', str),
+    'howToPlay': ('how_to_play', str),
+}
+REQUIRED = ('title', 'link', 'tags', 'show')
+ORIENTATIONS = ('portrait', 'landscape', 'both')
+PLATFORMS = ('mobile', 'desktop')
+INPUTS = ('touch', 'keyboard', 'mouse', 'gamepad')
+BADGES = ('', 'none', 'hot', 'popular', 'new')
+
+
+class CatalogError(ValueError):
+    def __init__(self, problems):
+        super().__init__(f'{len(problems)} problem(s) in games.json:\n  ' + '\n  '.join(problems))
+        self.problems = problems
+
+
+def slug_for(link):
+    path = urlparse(link).path.strip('/')
+    return path.split('/')[-1] if path else link
+
+
+class Game:
+    __slots__ = ('index', 'slug', 'category') + tuple(attr for attr, _ in FIELDS.values()) + ('keys', 'extra')
+
+    def __init__(self, index, raw):
+        self.index = index
+        for key, (attr, _) in FIELDS.items():
+            setattr(self, attr, raw.get(key))
+        self.slug = slug_for(self.link)
+        self.category = self.tags[0] if self.tags else None
+        # key order and keys the catalog does not model, so to_dict() round-trips
+        self.keys = tuple(raw)
+        self.extra = {k: v for k, v in raw.items() if k not in FIELDS} or None
+
+    def to_dict(self):
+        """The games.json entry, with its original key order."""
+        return {key: getattr(self, FIELDS[key][0]) if key in FIELDS else self.extra[key] for key in self.keys}
+
+    def __repr__(self):
+        return f'Game({self.slug!r})'
+
+
+def validate(raw):
+    """Return (errors, warnings) for parsed games.json data."""
+    errors, warnings = [], []
+    if not isinstance(raw, list):
+        return ['top level must be a list of games'], warnings
+    seen = {}
+    for i, g in enumerate(raw):
+        if not isinstance(g, dict):
+            errors.append(f'[{i}] is {type(g).__name__}, expected an object')
+            continue
+        where = f"[{i}] {g.get('title', '?')!r}"
+        for key in REQUIRED:
+            if key not in g:
+                errors.append(f'{where}: missing "{key}"')
+        for key, (_, typ) in FIELDS.items():
+            if key in g and not isinstance(g[key], typ):
+                errors.append(f'{where}: "{key}" should be {typ.__name__}, got {type(g[key]).__name__}')
+        for key in ('tags', 'input', 'avalid'):
+            if isinstance(g.get(key), list) and not all(isinstance(v, str) for v in g[key]):
+                errors.append(f'{where}: "{key}" must contain strings only')
+        if isinstance(g.get('link'), str):
+            parsed = urlparse(g['link'])
+            if parsed.scheme not in ('http', 'https') or not parsed.netloc:
+                errors.append(f'{where}: link is not an absolute http(s) URL: {g["link"]!r}')
+            slug = slug_for(g['link'])
+            if slug in seen:
+                errors.append(f'{where}: slug {slug!r} already used by [{seen[slug]}]')
+            seen.setdefault(slug, i)
+        if isinstance(g.get('tags'), list) and not g['tags']:
+            errors.append(f'{where}: tags is empty, the first tag is the category')
+        if 'orientation' in g and g['orientation'] not in ORIENTATIONS:
+            errors.append(f'{where}: orientation {g["orientation"]!r} not in {ORIENTATIONS}')
+        if isinstance(g.get('avalid'), list):
+            bad = [p for p in g['avalid'] if p not in PLATFORMS]
+            if bad:
+                errors.append(f'{where}: unknown avalid platform(s) {bad}')
+            if not g['avalid']:
+                warnings.append(f'{where}: avalid is empty, the site hides it everywhere')
+        elif 'avalid' not in g:
+            warnings.append(f'{where}: no avalid, the site hides it everywhere')
+        if isinstance(g.get('input'), list):
+            odd = [v for v in g['input'] if v not in INPUTS]
+            if odd:
+                warnings.append(f'{where}: unknown input type(s) {odd}')
+        if isinstance(g.get('badge'), str) and g['badge'] not in BADGES:
+            warnings.append(f'{where}: unknown badge {g["badge"]!r}')
+    return errors, warnings
+
+
+class Catalog:
+    def __init__(self, raw, digest=None, warnings=()):
+        self.digest = digest
+        self.warnings = list(warnings)
+        self.games = tuple(Game(i, g) for i, g in enumerate(raw))
+        self.by_slug = {g.slug: g for g in self.games}
+        self.by_tag = self._index(lambda g: g.tags or ())
+        self.by_category = self._index(lambda g: [g.category] if g.category else [])
+        self.by_input = self._index(lambda g: g.input or ())
+        self.by_orientation = self._index(lambda g: [g.orientation] if g.orientation else [])
+        self.by_platform = self._index(lambda g: g.avalid or ())
+        self.by_show = self._index(lambda g: [bool(g.show)])
+        self.by_featured = self._index(lambda g: [bool(g.featured)])
+
+    def _index(self, keys):
+        index = {}
+        for g in self.games:
+            for k in keys(g):
+                index.setdefault(k, set()).add(g.index)
+        return {k: frozenset(v) for k, v in index.items()}
+
+    def __len__(self):
+        return len(self.games)
+
+    def __iter__(self):
+        return iter(self.games)
+
+    def get(self, slug):
+        return self.by_slug.get(slug)
+
+    def select(self, tag=None, category=None, input=None, orientation=None, platform=None,
+               show=None, featured=None):
+        """Games matching every given criterion, in catalog order.
+
+        select(category='puzzle', platform='mobile', show=True) is "all
+        visible puzzle games for mobile".
+        """
+        sets = []
+        for index, key in ((self.by_tag, tag), (self.by_category, category), (self.by_input, input),
+                           (self.by_orientation, orientation), (self.by_platform, platform),
+                           (self.by_show, show), (self.by_featured, featured)):
+            if key is not None:
+                sets.append(index.get(key, frozenset()))
+        if not sets:
+            return list(self.games)
+        sets.sort(key=len)
+        hits = sets[0].intersection(*sets[1:])
+        return [self.games[i] for i in sorted(hits)]
+
+    def categories(self):
+        """category -> games in catalog order, categories in order of first appearance."""
+        order = sorted(self.by_category, key=lambda c: min(self.by_category[c]))
+        return {c: [self.games[i] for i in sorted(self.by_category[c])] for c in order}
+
+    def to_list(self):
+        return [g.to_dict() for g in self.games]
+
+
+def _read_snapshot(path, digest):
+    try:
+        with open(path, 'rb') as f:
+            version, snap_digest, catalog = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError, TypeError, AttributeError, ImportError):
+        return None
+    if version != SNAPSHOT_VERSION or snap_digest != digest:
+        return None
+    return catalog
+
+
+def _write_snapshot(path, catalog):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump((SNAPSHOT_VERSION, catalog.digest, catalog), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError:
+        pass  # the snapshot is only an accelerator
+
+
+def load(path=CATALOG_PATH, snapshot=True, snapshot_path=SNAPSHOT_PATH):
+    """Load, validate and index games.json; raises CatalogError if it is invalid."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+    if snapshot:
+        catalog = _read_snapshot(snapshot_path, digest)
+        if catalog is not None:
+            return catalog
+    raw = json.loads(data.decode('utf-8'))
+    errors, warnings = validate(raw)
+    if errors:
+        raise CatalogError(errors)
+    catalog = Catalog(raw, digest=digest, warnings=warnings)
+    if snapshot:
+        _write_snapshot(snapshot_path, catalog)
+    return catalog
+
+
+if __name__ == '__main__':
+    import sys
+    try:
+        cat = load(sys.argv[1] if len(sys.argv) > 1 else CATALOG_PATH, snapshot=False)
+    except CatalogError as e:
+        print(e)
+        raise SystemExit(1)
+    for w in cat.warnings:
+        print('warning:', w)
+    print(f'{len(cat)} games, {len(cat.by_category)} categories, '
+          f'{len(cat.select(show=True))} shown, {len(cat.select(featured=True))} featured')
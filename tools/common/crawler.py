@@ -0,0 +1,209 @@
+"""
+Polite, resumable URL crawler shared by the sitemap audit tools.
+
+On top of common.httpclient it adds:
+
+- a token-bucket rate limiter (--rate requests/second, bursts up to
+  --concurrency)
+- retries with exponential backoff on connection errors, 429 and 5xx,
+  honouring a numeric Retry-After
+- conditional requests: ETag / Last-Modified of every 200 are persisted
+  in tools/.cache/crawl-etags.json and replayed as If-None-Match /
+  If-Modified-Since, so an unchanged page costs a 304 and keeps its
+  previous status and body hash
+- a JSONL checkpoint per tool; after an interruption --resume skips every
+  URL already recorded there. The checkpoint is removed once a run finishes.
+
+Results are plain dicts (see _record) returned in input order.
+"""
+import asyncio
+import json
+import os
+import random
+import time
+
+from .httpclient import ConnectionPool, fetch
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.cache')
+ETAG_STORE = os.path.join(CACHE_DIR, 'crawl-etags.json')
+RETRY_STATUS = {429, 500, 502, 503, 504}
+MAX_BACKOFF = 30.0
+
+
+def add_crawl_args(parser):
+    parser.add_argument('--concurrency', type=int, default=32, help='Requests in flight overall')
+    parser.add_argument('--per-host', type=int, default=8, help='Open connections per host')
+    parser.add_argument('--timeout', type=float, default=20.0, help='Seconds per request')
+    parser.add_argument('--rate', type=float, default=10.0, help='Requests per second (0 = unlimited)')
+    parser.add_argument('--retries', type=int, default=3, help='Retries on errors, 429 and 5xx')
+    parser.add_argument('--no-conditional', action='store_true',
+                        help='Do not send If-None-Match/If-Modified-Since from the ETag store')
+    parser.add_argument('--resume', action='store_true', help='Skip URLs recorded in the last checkpoint')
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = max(1.0, float(burst))
+        self.tokens = self.capacity
+        self.stamp = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+                self.stamp = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def _record(url, resp, attempts):
+    return {
+        'url': url,
+        'status': resp.status,
+        'effective_url': resp.url if resp.status else '',
+        'redirects': len(resp.chain),
+        'sha256': resp.sha256,
+        'size': resp.size,
+        'etag': resp.headers.get('etag', ''),
+        'last_modified': resp.headers.get('last-modified', ''),
+        'not_modified': False,
+        'attempts': attempts,
+        'error': resp.error,
+    }
+
+
+class Crawler:
+    def __init__(self, name, concurrency=32, per_host=8, timeout=20.0, rate=10.0, retries=3,
+                 backoff=0.5, conditional=True, resume=False, store_path=ETAG_STORE, cache_dir=None):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.bucket = TokenBucket(rate, concurrency)
+        self.retries = retries
+        self.backoff = backoff
+        self.conditional = conditional
+        self.resume = resume
+        self.store_path = store_path
+        self.cache_dir = cache_dir or CACHE_DIR
+        self.checkpoint_path = os.path.join(self.cache_dir, f'crawl-{name}.checkpoint.jsonl')
+        self.stats = {'fetched': 0, 'not_modified': 0, 'resumed': 0, 'retries': 0, 'errors': 0}
+
+    @classmethod
+    def from_args(cls, name, args):
+        return cls(name, concurrency=args.concurrency, per_host=args.per_host, timeout=args.timeout,
+                   rate=args.rate, retries=args.retries, conditional=not args.no_conditional,
+                   resume=args.resume)
+
+    def _load_store(self):
+        try:
+            with open(self.store_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_store(self, store):
+        os.makedirs(os.path.dirname(self.store_path), exist_ok=True)
+        tmp = self.store_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(store, f, sort_keys=True)
+        os.replace(tmp, self.store_path)
+
+    def _load_checkpoint(self):
+        done = {}
+        if not self.resume or not os.path.exists(self.checkpoint_path):
+            return done
+        with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue  # torn last line from an interrupted write
+                done[rec['url']] = rec
+        return done
+
+    def _headers_for(self, url, store):
+        prev = store.get(url) if self.conditional else None
+        if not prev:
+            return None
+        headers = {}
+        if prev.get('etag'):
+            headers['If-None-Match'] = prev['etag']
+        if prev.get('last_modified'):
+            headers['If-Modified-Since'] = prev['last_modified']
+        return headers or None
+
+    async def _fetch_one(self, pool, url, store):
+        headers = self._headers_for(url, store)
+        attempt = 0
+        while True:
+            await self.bucket.acquire()
+            resp = await fetch(pool, url, headers=headers)
+            if not (resp.error or resp.status in RETRY_STATUS) or attempt >= self.retries:
+                break
+            delay = min(MAX_BACKOFF, self.backoff * (2 ** attempt))
+            retry_after = resp.headers.get('retry-after', '')
+            if retry_after.isdigit():
+                delay = min(MAX_BACKOFF, float(retry_after))
+            attempt += 1
+            self.stats['retries'] += 1
+            await asyncio.sleep(delay * (1 + random.random() / 2))
+        rec = _record(url, resp, attempt + 1)
+        if resp.status == 304 and url in store:
+            # the stored entry describes the unchanged final response
+            prev = store[url]
+            for k in ('status', 'effective_url', 'redirects', 'sha256', 'size', 'etag', 'last_modified'):
+                rec[k] = prev[k]
+            rec['not_modified'] = True
+        return rec
+
+    async def _run(self, urls, on_result):
+        store = self._load_store()
+        done = self._load_checkpoint()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        results = {}
+        pool = ConnectionPool(per_host=self.per_host, timeout=self.timeout)
+        gate = asyncio.Semaphore(self.concurrency)
+
+        with open(self.checkpoint_path, 'a' if done else 'w', encoding='utf-8') as ckpt:
+            if done:
+                ckpt.write('\n')  # never append onto a torn line; blank lines are skipped
+            async def one(u):
+                if u in done:
+                    rec = done[u]
+                    self.stats['resumed'] += 1
+                else:
+                    async with gate:
+                        rec = await self._fetch_one(pool, u, store)
+                    ckpt.write(json.dumps(rec) + '\n')
+                    ckpt.flush()
+                    self.stats['not_modified' if rec['not_modified'] else 'fetched'] += 1
+                    if rec['error']:
+                        self.stats['errors'] += 1
+                results[u] = rec
+                if on_result:
+                    on_result(rec)
+
+            try:
+                await asyncio.gather(*(one(u) for u in dict.fromkeys(urls)))
+            finally:
+                await pool.close()
+                for u, rec in results.items():
+                    if rec['status'] == 200 and (rec['etag'] or rec['last_modified']):
+                        store[u] = {k: rec[k] for k in ('status', 'effective_url', 'redirects', 'sha256',
+                                                        'size', 'etag', 'last_modified')}
+                    elif rec['status']:
+                        store.pop(u, None)
+                self._save_store(store)
+        os.remove(self.checkpoint_path)
+        return [results[u] for u in urls]
+
+    def run(self, urls, on_result=None):
+        """Crawl urls and return one record per input URL, in input order."""
+        return asyncio.run(self._run(urls, on_result))
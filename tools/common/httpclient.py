@@ -0,0 +1,267 @@
+"""
+Minimal asyncio HTTP/1.1 client for the URL audit tools (stdlib only).
+
+- keep-alive connections pooled per (scheme, host, port)
+- a per-host cap on open connections on top of the caller's global limit
+- one request per URL: redirects are followed on pooled connections, the
+  chain is recorded and only the final body is streamed through SHA-256
+  without ever being held in memory
+- the timeout covers connecting and each request/response exchange, not
+  the time a request waits for one of its host's per_host slots
+
+Works against plain http:// too, so the tools can be pointed at a local
+stand-in server (python3 -m http.server) for offline runs.
+"""
+import asyncio
+import hashlib
+import ssl
+from collections import defaultdict, deque
+from urllib.parse import urljoin, urlsplit
+
+USER_AGENT = 'poki2-audit/1.0'
+REDIRECT_CODES = {301, 302, 303, 307, 308}
+CHUNK = 64 * 1024
+
+
+class HttpError(Exception):
+    pass
+
+
+class Response:
+    __slots__ = ('requested', 'url', 'status', 'headers', 'chain', 'sha256', 'size', 'error', 'body')
+
+    def __init__(self, url):
+        self.requested = url
+        self.url = url
+        self.status = 0
+        self.headers = {}
+        self.chain = []       # [(status, url)] for every hop before the final one
+        self.sha256 = hashlib.sha256(b'').hexdigest()
+        self.size = 0
+        self.error = ''
+        self.body = None
+
+
+class _Conn:
+    __slots__ = ('reader', 'writer', 'reused')
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.reused = False
+
+
+class ConnectionPool:
+    def __init__(self, per_host=4, timeout=20.0, verify=True):
+        self.per_host = per_host
+        self.timeout = timeout
+        self._idle = defaultdict(deque)
+        self._slots = defaultdict(lambda: asyncio.Semaphore(self.per_host))
+        self._ssl = ssl.create_default_context()
+        if not verify:
+            self._ssl.check_hostname = False
+            self._ssl.verify_mode = ssl.CERT_NONE
+
+    async def acquire(self, key):
+        """A pooled or new connection; only connecting is timed, not waiting for a slot."""
+        await self._slots[key].acquire()
+        idle = self._idle[key]
+        while idle:
+            conn = idle.pop()
+            if not conn.reader.at_eof():
+                conn.reused = True
+                return conn
+            conn.writer.close()
+        scheme, host, port = key
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port, ssl=self._ssl if scheme == 'https' else None,
+                                        server_hostname=host if scheme == 'https' else None,
+                                        limit=CHUNK * 4),
+                self.timeout)
+        except BaseException:
+            self._slots[key].release()
+            raise
+        return _Conn(reader, writer)
+
+    def release(self, key, conn, reusable):
+        if reusable:
+            self._idle[key].append(conn)
+        else:
+            conn.writer.close()
+        self._slots[key].release()
+
+    async def close(self):
+        for idle in self._idle.values():
+            while idle:
+                conn = idle.pop()
+                conn.writer.close()
+                try:
+                    await conn.writer.wait_closed()
+                except Exception:
+                    pass
+
+
+def _key(url):
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme not in ('http', 'https'):
+        raise HttpError(f'unsupported scheme: {url}')
+    port = parts.port or (443 if scheme == 'https' else 80)
+    return (scheme, parts.hostname, port), parts
+
+
+async def _read_head(reader):
+    raw = await reader.readuntil(b'\r\n\r\n')
+    lines = raw.decode('latin-1').split('\r\n')
+    status_line = lines[0].split(' ', 2)
+    if len(status_line) < 2 or not status_line[0].startswith('HTTP/'):
+        raise HttpError(f'bad status line: {lines[0]!r}')
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            k, v = line.split(':', 1)
+            headers[k.strip().lower()] = v.strip()
+    return status_line[0], int(status_line[1]), headers
+
+
+async def _stream_body(reader, headers, sink):
+    """Feed the body to sink(bytes); return True if the connection can be reused."""
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size_line = await reader.readuntil(b'\r\n')
+            size = int(size_line.split(b';', 1)[0].strip(), 16)
+            if size == 0:
+                # trailers end with an empty line
+                while (await reader.readuntil(b'\r\n')) != b'\r\n':
+                    pass
+                return True
+            while size:
+                data = await reader.readexactly(min(size, CHUNK))
+                sink(data)
+                size -= len(data)
+            await reader.readexactly(2)
+    if 'content-length' in headers:
+        remaining = int(headers['content-length'])
+        while remaining:
+            data = await reader.readexactly(min(remaining, CHUNK))
+            sink(data)
+            remaining -= len(data)
+        return True
+    while True:
+        data = await reader.read(CHUNK)
+        if not data:
+            return False
+        sink(data)
+
+
+async def _exchange(conn, payload, method, sink):
+    """Send one request on conn and read the response; returns (status, headers, reusable)."""
+    conn.writer.write(payload)
+    await conn.writer.drain()
+    version, status, headers = await _read_head(conn.reader)
+    if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+        reusable = True
+    else:
+        reusable = await _stream_body(conn.reader, headers, sink(status, headers))
+    if version == 'HTTP/1.0' or headers.get('connection', '').lower() == 'close':
+        reusable = False
+    return status, headers, reusable
+
+
+async def _request_once(pool, url, method, extra_headers, sink):
+    """One hop. sink(status, headers) is called once per attempt and must
+    return a fresh feed, so a retried attempt does not see the first one's data."""
+    key, parts = _key(url)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    host = parts.netloc.rsplit('@', 1)[-1]
+    lines = [f'{method} {path} HTTP/1.1', f'Host: {host}', f'User-Agent: {USER_AGENT}',
+             'Accept-Encoding: identity', 'Connection: keep-alive']
+    lines += [f'{k}: {v}' for k, v in (extra_headers or {}).items()]
+    payload = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+    for attempt in (0, 1):
+        conn = await pool.acquire(key)
+        reusable = False
+        try:
+            status, headers, reusable = await asyncio.wait_for(_exchange(conn, payload, method, sink), pool.timeout)
+            return status, headers
+        except (asyncio.IncompleteReadError, ConnectionResetError, BrokenPipeError):
+            # a pooled keep-alive socket the server already dropped: retry once fresh
+            if not conn.reused or attempt:
+                raise
+        finally:
+            pool.release(key, conn, reusable)
+
+
+async def fetch(pool, url, method='GET', headers=None, max_redirects=10, keep_body=False):
+    """Fetch url following redirects; never raises, errors land in Response.error.
+
+    The final body is hashed while streaming. With keep_body=True the final
+    response (not intermediate redirect bodies) is also returned as .body.
+    """
+    resp = Response(url)
+    current = url
+    got = {}
+    try:
+        for _ in range(max_redirects + 1):
+            got = {}
+
+            def sink(status, hdrs):
+                # a new digest/size/body per attempt: a retry must not add to a dropped one
+                got.clear()
+                if status in REDIRECT_CODES and 'location' in hdrs:
+                    return lambda data: None
+                digest = hashlib.sha256()
+                body = bytearray() if keep_body else None
+                got.update(digest=digest, size=0, body=body)
+
+                def feed(data):
+                    digest.update(data)
+                    got['size'] += len(data)
+                    if body is not None:
+                        body.extend(data)
+                return feed
+
+            status, hdrs = await _request_once(pool, current, method, headers, sink)
+            if status in REDIRECT_CODES and 'location' in hdrs:
+                resp.chain.append((status, current))
+                current = urljoin(current, hdrs['location'])
+                continue
+            resp.status = status
+            resp.headers = hdrs
+            if got:
+                resp.sha256 = got['digest'].hexdigest()
+                resp.size = got['size']
+            break
+        else:
+            resp.error = 'too many redirects'
+    except asyncio.TimeoutError:
+        resp.error = 'timeout'
+    except (OSError, HttpError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError) as e:
+        resp.error = f'{type(e).__name__}: {e}'
+    resp.url = current
+    if keep_body:
+        resp.body = bytes(got.get('body') or b'')
+    return resp
+
+
+async def fetch_all(urls, concurrency=16, per_host=4, timeout=20.0, on_result=None, **kw):
+    """Fetch every URL with at most `concurrency` requests in flight; results
+    come back in input order. on_result(resp) is called as each one finishes."""
+    pool = ConnectionPool(per_host=per_host, timeout=timeout)
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(u):
+        async with gate:
+            r = await fetch(pool, u, **kw)
+        if on_result:
+            on_result(r)
+        return r
+
+    try:
+        return await asyncio.gather(*(one(u) for u in urls))
+    finally:
+        await pool.close()
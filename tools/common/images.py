@@ -0,0 +1,82 @@
+"""
+Preview-image lookup and header-only dimension sniffing (stdlib only).
+
+find_preview_image() is the lookup generate_seo has always used for a game
+folder. image_size() reads just enough of a PNG, GIF, JPEG or WebP file to
+return (width, height), so manifests can carry dimensions even where Pillow
+is not installed.
+"""
+import os
+import struct
+
+PREVIEW_CANDIDATES = ('thumbnail.jpg', 'thumbnail.png', 'preview.jpg', 'preview.png', 'images/thumbnail.jpg')
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.webp')
+
+
+def find_preview_image(dirpath):
+    """Path of the game's preview image relative to dirpath, or None."""
+    # common locations
+    for c in PREVIEW_CANDIDATES:
+        if os.path.exists(os.path.join(dirpath, c)):
+            return c
+    # try any image in images/
+    imgdir = os.path.join(dirpath, 'images')
+    if os.path.isdir(imgdir):
+        for f in os.listdir(imgdir):
+            if f.lower().endswith(IMAGE_EXTS):
+                return os.path.join('images', f)
+    return None
+
+
+def _jpeg_size(f):
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        while marker and marker[0] == 0xFF and marker[1] == 0xFF:  # fill bytes
+            marker = marker[1:] + f.read(1)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        if code in (0xD8, 0x01) or 0xD0 <= code <= 0xD7:
+            continue  # standalone markers carry no length
+        seg = f.read(2)
+        if len(seg) < 2:
+            return None
+        length = struct.unpack('>H', seg)[0]
+        # SOF0..SOF15 except DHT (C4), JPG (C8) and DAC (CC)
+        if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            data = f.read(5)
+            if len(data) < 5:
+                return None
+            height, width = struct.unpack('>HH', data[1:5])
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def image_size(path):
+    """(width, height) from the file header, or None if unknown/unreadable."""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(32)
+            if head.startswith(b'\x89PNG\r\n\x1a\n') and head[12:16] == b'IHDR':
+                return struct.unpack('>II', head[16:24])
+            if head[:6] in (b'GIF87a', b'GIF89a'):
+                return struct.unpack('<HH', head[6:10])
+            if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+                chunk = head[12:16]
+                if chunk == b'VP8X':
+                    w = int.from_bytes(head[24:27], 'little') + 1
+                    h = int.from_bytes(head[27:30], 'little') + 1
+                    return w, h
+                if chunk == b'VP8L':
+                    bits = int.from_bytes(head[21:25], 'little')
+                    return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+                if chunk == b'VP8 ':
+                    w, h = struct.unpack('<HH', head[26:30])
+                    return w & 0x3FFF, h & 0x3FFF
+                return None
+            if head[:2] == b'\xff\xd8':
+                return _jpeg_size(f)
+    except (OSError, struct.error):
+        pass
+    return None
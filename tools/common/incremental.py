@@ -0,0 +1,75 @@
+"""
+Skip-unchanged output helpers.
+
+write_if_changed() only touches a file when the SHA-256 of the new content
+differs from what is on disk, so unchanged pages keep their mtime, ETag
+and CDN/service-worker cache entries. ChangeManifest collects the paths
+that did change and writes them one per line: as URLs when a base URL is
+known (ready for tools/deploy/purge-cloudflare.sh --file-list), otherwise
+as paths relative to the output root.
+"""
+import hashlib
+import os
+
+
+def sha256_file(path):
+    h = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+    except OSError:
+        return None
+    return h.hexdigest()
+
+
+def write_if_changed(path, data):
+    """Write data (str as UTF-8, or bytes) to path unless identical; return True if written."""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    if hashlib.sha256(data).hexdigest() == sha256_file(path):
+        return False
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return True
+
+
+def default_manifest_path(out_dir):
+    return os.path.normpath(out_dir) + '.changed.txt'
+
+
+class ChangeManifest:
+    def __init__(self, root, base_url=None):
+        self.root = root
+        self.base_url = base_url.rstrip('/') if base_url else None
+        self.paths = []
+        self.bytes = 0
+
+    def add(self, path):
+        self.paths.append(path)
+        try:
+            self.bytes += os.path.getsize(path)
+        except OSError:
+            pass
+
+    def __len__(self):
+        return len(self.paths)
+
+    def entries(self):
+        out = []
+        for p in self.paths:
+            rel = os.path.relpath(p, self.root).replace(os.sep, '/')
+            if self.base_url:
+                # pages are served as directory URLs
+                if rel == 'index.html' or rel.endswith('/index.html'):
+                    rel = rel[:-len('index.html')]
+                out.append(f'{self.base_url}/{rel}')
+            else:
+                out.append(rel)
+        return out
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for entry in self.entries():
+                f.write(entry + '\n')
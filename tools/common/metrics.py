@@ -0,0 +1,130 @@
+"""
+Phase timings, counters and profiling for the tools/ scripts.
+
+  parser = argparse.ArgumentParser()
+  add_metrics_args(parser)                 # --profile, --metrics-json
+  args = parser.parse_args()
+  metrics = Metrics.from_args('generate_seo', args)
+  with metrics.phase('walk'):
+      ...
+  metrics.mark('render')                   # or: time since the last phase/mark
+  metrics.count('files')
+  metrics.count('bytes', len(data))
+  metrics.finish()                         # prints "Timing: walk 0.012s, ...",
+                                           # writes --profile / --metrics-json
+
+A phase name that repeats accumulates. A dotted name ('extract.read')
+is a part of the phase before the dot, so phases can nest. Work done in
+pool workers is timed with a Metrics of their own whose snapshot() the
+parent merge()s; such phases add up time across workers and can exceed
+the wall time with --jobs.
+
+--profile PATH runs the tool under cProfile from from_args() to finish(),
+writes the stats to PATH (browse with `python3 -m pstats PATH`) and prints
+the top functions by cumulative time. --metrics-json PATH writes tool,
+argv, wall and CPU seconds, peak RSS, phases and counters (plus whatever
+the tool passes to finish()) as JSON.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROFILE_TOP = 25
+
+
+def add_metrics_args(parser):
+    parser.add_argument('--profile', metavar='PATH', help='Run under cProfile and write the stats here')
+    parser.add_argument('--metrics-json', metavar='PATH', help='Write phase timings and counters here as JSON')
+
+
+def max_rss_kb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+class Metrics:
+    def __init__(self, tool=None, profile=None, metrics_json=None, argv=None):
+        self.tool = tool
+        self.argv = list(sys.argv[1:] if argv is None else argv)
+        self.profile_path = profile
+        self.json_path = metrics_json
+        self.phases = {}
+        self.counters = {}
+        self.started = time.perf_counter()
+        self._cpu = time.process_time()
+        self._last = self.started
+        self._profiler = None
+        if profile:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    @classmethod
+    def from_args(cls, tool, args, argv=None):
+        return cls(tool, getattr(args, 'profile', None), getattr(args, 'metrics_json', None), argv)
+
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def mark(self, phase):
+        """Charge the time since the previous mark (or phase end) to phase."""
+        now = time.perf_counter()
+        self.add(phase, now - self._last)
+        self._last = now
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self._last = time.perf_counter()
+            self.add(name, self._last - start)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self):
+        return {'phases': self.phases, 'counters': self.counters}
+
+    def merge(self, snapshot):
+        for name, seconds in snapshot['phases'].items():
+            self.add(name, seconds)
+        for name, n in snapshot['counters'].items():
+            self.count(name, n)
+
+    def summary(self):
+        return ', '.join(f'{k} {v:.3f}s' for k, v in self.phases.items())
+
+    def finish(self, **extra):
+        """Print the timing line, stop profiling, write --profile/--metrics-json; returns the metrics dict."""
+        data = {'tool': self.tool, 'argv': self.argv, 'wall_seconds': round(time.perf_counter() - self.started, 4),
+                'cpu_seconds': round(time.process_time() - self._cpu, 4), 'max_rss_kb': max_rss_kb(),
+                'phases': {k: round(v, 4) for k, v in self.phases.items()}, 'counters': dict(self.counters)}
+        data.update(extra)
+        if self.phases:
+            print(f'Timing: {self.summary()}')
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.dump_stats(self.profile_path)
+            out = io.StringIO()
+            pstats.Stats(self._profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_TOP)
+            print(out.getvalue().rstrip())
+            print('Profile written to', self.profile_path)
+            self._profiler = None
+        if self.json_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.json_path)), exist_ok=True)
+            with open(self.json_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=1)
+        return data
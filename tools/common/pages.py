@@ -0,0 +1,235 @@
+"""
+In-process model of how Cloudflare Pages serves a built folder.
+
+PagesSite.resolve(url) answers a request without a server:
+
+  1. `_redirects` 3xx rules, first match wins (common.redirects trie);
+  2. the static asset, with Pages' default HTML handling:
+       /a/        -> a/index.html
+       /a         -> a.html, or 308 to /a/ when only a/index.html exists
+       /a.html    -> 308 to /a, /a/index.html -> 308 to /a/
+  3. `_redirects` 200 rewrites and 404 rules, for paths no asset answered;
+  4. the nearest 404.html with status 404, or index.html with 200 when the
+     site has no top-level 404.html (Pages' SPA mode).
+
+Redirects to this site's own domains are followed (up to MAX_HOPS) and
+each one counts as a hop. `_headers` blocks matching the final URL are
+merged in file order (a repeated header name is joined with ", ", and
+`! Name` drops one). The result records the file that would be sent, so
+fallbacks to index.html show up as such without comparing bodies.
+"""
+import os
+import re
+
+from .redirects import MAX_HOPS, RedirectTrie, parse as parse_redirects, site_path
+
+HTML_REDIRECT = 308
+
+
+class HeaderRule:
+    __slots__ = ('line', 'pattern', 'regex', 'set', 'unset')
+
+    def __init__(self, line, pattern):
+        self.line = line
+        self.pattern = pattern
+        self.regex = _pattern_regex(pattern)
+        self.set = []      # [(name, value)]
+        self.unset = []    # [name]
+
+
+def _pattern_regex(pattern):
+    out = []
+    for token in re.split(r'(\*|:[A-Za-z_]\w*)', pattern):
+        if token == '*':
+            out.append('.*')
+        elif token.startswith(':') and len(token) > 1:
+            out.append('[^/]+')
+        else:
+            out.append(re.escape(token))
+    return re.compile(''.join(out) + r'\Z')
+
+
+def parse_headers(text):
+    """Parse _headers text -> (rules, problems); problems are (line, message)."""
+    rules = []
+    problems = []
+    current = None
+    for lineno, raw in enumerate(text.splitlines(), 1):
+        line = raw.strip()
+        if not line or line.startswith('#'):
+            continue
+        if raw[0] in ' \t':
+            if current is None:
+                problems.append((lineno, f'header outside a URL block: {line}'))
+            elif line.startswith('!'):
+                current.unset.append(line[1:].strip().lower())
+            elif ':' in line:
+                name, value = line.split(':', 1)
+                current.set.append((name.strip(), value.strip()))
+            else:
+                problems.append((lineno, f'expected "Name: value": {line}'))
+            continue
+        if any(c.isspace() for c in line):
+            problems.append((lineno, f'URL pattern contains spaces (a comment needs "#"): {line}'))
+            current = None
+            continue
+        current = HeaderRule(lineno, line)
+        rules.append(current)
+    return [r for r in rules if r.set or r.unset], problems
+
+
+def apply_headers(rules, path, url=None):
+    """Merged {lowercase name: (name, value)} for a response to path."""
+    headers = {}
+    for rule in rules:
+        subject = url if url and '://' in rule.pattern else path
+        if subject is None or not rule.regex.match(subject):
+            continue
+        for name in rule.unset:
+            headers.pop(name, None)
+        for name, value in rule.set:
+            key = name.lower()
+            if key in headers:
+                headers[key] = (headers[key][0], headers[key][1] + ', ' + value)
+            else:
+                headers[key] = (name, value)
+    return headers
+
+
+class Response:
+    __slots__ = ('url', 'status', 'path', 'file', 'hops', 'headers', 'size', 'note', 'location')
+
+    def __init__(self, url):
+        self.url = url
+        self.status = None
+        self.path = None       # final request path on this site
+        self.file = None       # served file relative to the root, if any
+        self.hops = []         # [(status, location, why)]
+        self.headers = {}
+        self.size = None
+        self.note = ''
+        self.location = None   # off-site redirect target
+
+    def header(self, name, default=''):
+        return self.headers.get(name.lower(), (name, default))[1]
+
+
+class PagesSite:
+    def __init__(self, root, domains=(), redirects_path=None, headers_path=None):
+        self.root = root
+        self.domains = frozenset(domains)
+        self.problems = []
+        self.files = {}
+        for dirpath, dirs, names in os.walk(root):
+            dirs.sort()
+            rel_dir = os.path.relpath(dirpath, root).replace(os.sep, '/')
+            prefix = '' if rel_dir == '.' else rel_dir + '/'
+            for name in names:
+                self.files[prefix + name] = os.path.join(dirpath, name)
+        redirects_path = redirects_path or os.path.join(root, '_redirects')
+        headers_path = headers_path or os.path.join(root, '_headers')
+        rules = []
+        if os.path.exists(redirects_path):
+            with open(redirects_path, 'r', encoding='utf-8') as f:
+                rules, problems = parse_redirects(f.read())
+            self.problems += [('_redirects', n, m) for n, m in problems]
+        self.redirects = RedirectTrie(rules)
+        self.header_rules = []
+        if os.path.exists(headers_path):
+            with open(headers_path, 'r', encoding='utf-8') as f:
+                self.header_rules, problems = parse_headers(f.read())
+            self.problems += [('_headers', n, m) for n, m in problems]
+        self.spa = '404.html' not in self.files
+
+    def asset(self, path):
+        """(file, None) when path is served as-is, (None, location) for an HTML redirect, else (None, None)."""
+        rel = path.lstrip('/')
+        if rel.endswith('/') or rel == '':
+            if rel + 'index.html' in self.files:
+                return rel + 'index.html', None
+            if rel and rel[:-1] + '.html' in self.files:
+                return None, '/' + rel[:-1]
+            return None, None
+        if rel.endswith('/index.html') or rel == 'index.html':
+            if rel in self.files:
+                return None, '/' + rel[:-len('index.html')]
+        elif rel.endswith('.html'):
+            if rel in self.files:
+                return None, '/' + rel[:-len('.html')]
+        if rel in self.files:
+            return rel, None
+        if rel + '.html' in self.files:
+            return rel + '.html', None
+        if rel + '/index.html' in self.files:
+            return None, '/' + rel + '/'
+        return None, None
+
+    def not_found(self, path):
+        if self.spa:
+            return 200, 'index.html'
+        rel = path.lstrip('/')
+        parts = rel.split('/')[:-1]
+        while True:
+            candidate = '/'.join(parts + ['404.html'])
+            if candidate in self.files:
+                return 404, candidate
+            if not parts:
+                return 404, None
+            parts.pop()
+
+    def resolve(self, url):
+        res = Response(url)
+        location = url
+        seen = set()
+        while True:
+            path = site_path(location, self.domains)
+            if path is None:
+                res.location = location
+                res.status = res.hops[-1][0] if res.hops else None
+                res.note = 'external'
+                return res
+            path = path.split('?', 1)[0].split('#', 1)[0] or '/'
+            if path in seen or len(res.hops) >= MAX_HOPS:
+                res.status = res.hops[-1][0]
+                res.note = 'loop'
+                return res
+            seen.add(path)
+            res.path = path
+            hit = self.redirects.lookup(path)
+            if hit is not None and hit[0].is_redirect:
+                res.hops.append((hit[0].status, hit[1], f'_redirects line {hit[0].line}'))
+                location = hit[1]
+                continue
+            served, moved = self.asset(path)
+            if moved is not None:
+                res.hops.append((HTML_REDIRECT, moved, 'html handling'))
+                location = moved
+                continue
+            status = 200
+            if served is None and hit is not None:
+                rule, target = hit
+                target_path = site_path(target, self.domains)
+                if target_path is None:
+                    res.status, res.location, res.note = rule.status, target, 'proxied'
+                    return res
+                target_path = target_path.split('?', 1)[0]
+                # a rewrite serves the target file itself, without HTML-handling redirects
+                served = target_path.lstrip('/') if target_path.lstrip('/') in self.files \
+                    else self.asset(target_path)[0]
+                status = rule.status
+            if served is None:
+                status, served = self.not_found(path)
+            res.status = status
+            res.file = served
+            if served is not None:
+                res.size = os.path.getsize(self.files[served])
+            res.headers = apply_headers(self.header_rules, path, location if '://' in location else None)
+            if status == 404:
+                res.note = 'not_found'
+            elif served == 'index.html' and path not in ('/', '/index.html'):
+                res.note = 'served_index'
+            elif res.hops:
+                res.note = 'redirect'
+            else:
+                res.note = 'ok'
+            return res
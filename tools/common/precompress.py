@@ -0,0 +1,228 @@
+"""
+Incremental precompression of a static output folder.
+
+Every text file (the extensions scripts/precompress.cjs handles) gets
+`.gz` and `.br` siblings, and `.zst` on request, encoded in a process
+pool. gzip is stdlib and written with mtime=0 so identical input gives
+identical bytes. Brotli uses the `brotli` package, or Node's zlib (the
+encoder scripts/precompress.cjs uses) when only `node` is installed; with
+neither, precompress_dir() raises MissingEncoder rather than silently
+publishing without .br, unless the caller passes want_brotli=False. zstd
+needs the `zstandard` package (or Python 3.14's compression.zstd) and is
+skipped with a notice when missing.
+
+A JSON manifest (default under tools/.cache, keyed by the folder's path)
+remembers each file's size, mtime and SHA-256 and what was written for it;
+hashing and writes go through common/incremental.py, so an unchanged
+manifest or sibling is not rewritten.
+Files whose size and mtime match are skipped without being read; a changed
+mtime with the same hash only refreshes the entry. A sibling is only kept
+when it saves at least MIN_SAVING of the original; otherwise any old one
+is removed so servers fall back to the plain file. Siblings of files that
+disappeared are removed too.
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .incremental import sha256_file, write_if_changed
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    try:
+        from compression import zstd as zstandard  # Python 3.14+
+    except ImportError:
+        zstandard = None
+
+TOOLS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(TOOLS_DIR, '.cache')
+TEXT_EXTS = ('.html', '.js', '.css', '.json', '.svg', '.txt', '.xml', '.webmanifest', '.map')
+SIBLING_EXTS = ('.gz', '.br', '.zst')
+MIN_SIZE = 256        # below this a compressed response is not worth the header overhead
+MIN_SAVING = 0.10     # keep a sibling only if it is at least 10% smaller
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+ZSTD_LEVEL = 19
+NODE = shutil.which('node')
+# stdin -> stdout at BROTLI_QUALITY, the same settings as scripts/precompress.cjs
+NODE_BROTLI = ("const z=require('zlib'),c=[];process.stdin.on('data',d=>c.push(d)).on('end',()=>"
+               "process.stdout.write(z.brotliCompressSync(Buffer.concat(c),"
+               "{params:{[z.constants.BROTLI_PARAM_QUALITY]:%d}})))" % BROTLI_QUALITY)
+
+
+class MissingEncoder(RuntimeError):
+    pass
+
+
+def available_encodings(want_zstd=False, want_brotli=True):
+    encs = ['gz']
+    if want_brotli and (brotli is not None or NODE):
+        encs.append('br')
+    if want_zstd and zstandard is not None:
+        encs.append('zst')
+    return encs
+
+
+def missing_encodings(want_zstd=False, want_brotli=True):
+    missing = []
+    if want_brotli and brotli is None and not NODE:
+        missing.append('br (pip install brotli, or install node)')
+    if want_zstd and zstandard is None:
+        missing.append('zst (pip install zstandard)')
+    return missing
+
+
+def _encode(enc, data):
+    if enc == 'gz':
+        return gzip.compress(data, GZIP_LEVEL, mtime=0)
+    if enc == 'br':
+        if brotli is None:
+            return subprocess.run([NODE, '-e', NODE_BROTLI], input=data, stdout=subprocess.PIPE,
+                                  check=True).stdout
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    if hasattr(zstandard, 'ZstdCompressor'):
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return zstandard.compress(data, level=ZSTD_LEVEL)
+
+
+def default_manifest_path(root):
+    key = hashlib.blake2b(os.path.abspath(root).encode('utf-8'), digest_size=6).hexdigest()
+    return os.path.join(CACHE_DIR, f'precompress-{key}.json')
+
+
+def _compress_file(task):
+    """Worker: (path, encodings, known sha256 or None) -> entry plus timings."""
+    path, encs, known = task
+    st = os.stat(path)
+    digest = sha256_file(path)
+    entry = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': digest, 'out': {}}
+    timings = {}
+    if known is not None and known.get('sha256') == digest and \
+            all(os.path.exists(path + '.' + e) == (known['out'].get(e, 0) > 0) for e in encs):
+        # touched but identical: keep what is on disk
+        entry['out'] = {e: known['out'].get(e, 0) for e in encs}
+        return path, entry, timings, False
+    with open(path, 'rb') as f:
+        data = f.read()
+    for enc in encs:
+        sibling = path + '.' + enc
+        t0 = time.perf_counter()
+        packed = _encode(enc, data) if len(data) >= MIN_SIZE else None
+        timings[enc] = time.perf_counter() - t0
+        if packed is not None and len(packed) <= len(data) * (1 - MIN_SAVING):
+            write_if_changed(sibling, packed)
+            os.utime(sibling, ns=(st.st_atime_ns, st.st_mtime_ns))
+            entry['out'][enc] = len(packed)
+        else:
+            if os.path.exists(sibling):
+                os.remove(sibling)
+            entry['out'][enc] = 0
+    # a sibling in an encoding this run does not write would now be stale
+    for ext in SIBLING_EXTS:
+        if ext[1:] not in encs and os.path.exists(path + ext):
+            os.remove(path + ext)
+    return path, entry, timings, True
+
+
+def _load(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def precompress_dir(root, jobs=1, want_zstd=False, manifest_path=None, force=False, want_brotli=True):
+    """Precompress everything under root; returns a stats dict (see report())."""
+    if want_brotli and 'br' not in available_encodings(want_brotli=True):
+        raise MissingEncoder('.br requested but neither the brotli package nor node is available; '
+                             'pip install brotli, or pass want_brotli=False (--no-brotli) to skip it')
+    encs = available_encodings(want_zstd, want_brotli)
+    manifest_path = manifest_path or default_manifest_path(root)
+    saved = _load(manifest_path)
+    if saved.get('encodings') != encs or force:
+        saved = {}
+    files_prev = saved.get('files', {})
+
+    sources = []
+    for dirpath, dirs, files in os.walk(root):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(TEXT_EXTS):
+                sources.append(os.path.join(dirpath, name))
+
+    entries = {}
+    tasks = []
+    unchanged = 0
+    for path in sources:
+        rel = os.path.relpath(path, root).replace(os.sep, '/')
+        prev = files_prev.get(rel)
+        st = os.stat(path)
+        if prev and prev['size'] == st.st_size and prev['mtime_ns'] == st.st_mtime_ns and \
+                all(os.path.exists(path + '.' + e) == (prev['out'].get(e, 0) > 0) for e in encs):
+            entries[rel] = prev
+            unchanged += 1
+            continue
+        tasks.append((path, encs, prev))
+
+    stats = {'encodings': encs, 'files': len(sources), 'unchanged': unchanged, 'encoded': 0,
+             'by_ext': {}, 'removed': 0}
+    if jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(_compress_file, tasks, chunksize=max(1, len(tasks) // (jobs * 8))))
+    else:
+        results = [_compress_file(t) for t in tasks]
+    for path, entry, timings, encoded in results:
+        rel = os.path.relpath(path, root).replace(os.sep, '/')
+        entries[rel] = entry
+        if not encoded:
+            unchanged += 1
+            continue
+        stats['encoded'] += 1
+        ext = os.path.splitext(rel)[1].lower()
+        row = stats['by_ext'].setdefault(ext, {'files': 0, 'bytes': 0, 'out': {}, 'seconds': {}})
+        row['files'] += 1
+        row['bytes'] += entry['size']
+        for enc in encs:
+            row['out'][enc] = row['out'].get(enc, 0) + (entry['out'][enc] or entry['size'])
+            row['seconds'][enc] = row['seconds'].get(enc, 0.0) + timings.get(enc, 0.0)
+    stats['unchanged'] = unchanged
+
+    # siblings of sources that are gone
+    for rel in set(files_prev) - set(entries):
+        for enc in SIBLING_EXTS:
+            sibling = os.path.join(root, rel) + enc
+            if os.path.exists(sibling):
+                os.remove(sibling)
+                stats['removed'] += 1
+
+    write_if_changed(manifest_path, json.dumps({'root': os.path.abspath(root), 'encodings': encs, 'files': entries},
+                                               sort_keys=True))
+    return stats
+
+
+def report(stats):
+    """Per-extension table of what this run encoded: size after each encoding and time spent."""
+    encs = stats['encodings']
+    lines = [f"{stats['files']} files: {stats['encoded']} encoded, {stats['unchanged']} unchanged, "
+             f"{stats['removed']} stale siblings removed"]
+    if stats['by_ext']:
+        head = f"{'ext':14} {'files':>6} {'bytes':>10}" + ''.join(f' {enc + " ratio":>9} {enc + " s":>7}' for enc in encs)
+        lines.append(head)
+        for ext, row in sorted(stats['by_ext'].items()):
+            line = f"{ext:14} {row['files']:6d} {row['bytes']:10d}"
+            for enc in encs:
+                ratio = row['out'][enc] / row['bytes'] if row['bytes'] else 1.0
+                line += f' {ratio:9.1%} {row["seconds"][enc]:7.3f}'
+            lines.append(line)
+    return '\n'.join(lines)
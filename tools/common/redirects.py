@@ -0,0 +1,358 @@
+"""
+Cloudflare Pages `_redirects` parsing, analysis and trie matching.
+
+A rule is `<source> <target> [status]` (status defaults to 302). Rules are
+tried top to bottom and the first match wins. In a source, `:name` matches
+one non-empty path segment and a single `*` matches the rest of the path,
+slashes included; `:name` and `:splat` in the target are substituted.
+Query strings take no part in matching. `{a,b}` alternatives in a source are
+expanded here as the file's author meant them, with a warning, because
+Cloudflare does not document brace syntax.
+
+RedirectTrie compiles the rules into a segment trie: a lookup walks the
+path's segments once, trying the literal child, the placeholder child and
+any splat rule hung on the way, and keeps the lowest rule index, so the
+result is the same as the linear first-match scan (match_linear) in
+O(path length) instead of O(rules). to_json() gives the same trie as plain
+JSON for a Worker to load.
+
+analyze() reports dead rules (exact duplicates, conflicting duplicates and
+rules shadowed by an earlier pattern), redirect chains and loops, and
+resolves every chain to its final location so it can be collapsed into one
+hop.
+"""
+import re
+from urllib.parse import urlsplit
+
+REDIRECT_STATUSES = frozenset((301, 302, 303, 307, 308))
+PERMANENT = frozenset((301, 308))
+DEFAULT_STATUS = 302
+MAX_HOPS = 10
+# Cloudflare Pages limits per project
+MAX_STATIC_RULES = 2000
+MAX_DYNAMIC_RULES = 100
+MAX_LINE_CHARS = 1000
+
+BRACE_RE = re.compile(r'\{([^{}]*)\}')
+PLACEHOLDER_RE = re.compile(r':([A-Za-z_]\w*)')
+
+
+class Rule:
+    __slots__ = ('index', 'line', 'source', 'target', 'status', 'segments', 'splat', 'names', 'text')
+
+    def __init__(self, index, line, source, target, status, text=''):
+        self.index = index
+        self.line = line
+        self.source = source
+        self.target = target
+        self.status = status
+        self.text = text
+        self.names = []
+        # segments before the splat; splat is None or a list of (prefix, suffix)
+        self.segments, self.splat = _compile_source(source, self.names)
+
+    @property
+    def dynamic(self):
+        return self.splat is not None or bool(self.names)
+
+    @property
+    def is_redirect(self):
+        return self.status in REDIRECT_STATUSES
+
+    def __repr__(self):
+        return f'Rule(line {self.line}: {self.source} {self.target} {self.status})'
+
+
+def expand_braces(text):
+    """'a.{x,y}' -> ['a.x', 'a.y']; nested groups expand left to right."""
+    m = BRACE_RE.search(text)
+    if not m:
+        return [text]
+    out = []
+    for alt in m.group(1).split(','):
+        out.extend(expand_braces(text[:m.start()] + alt + text[m.end():]))
+    return out
+
+
+def _compile_source(source, names):
+    star = source.find('*')
+    head = source if star < 0 else source[:star]
+    parts = head[1:].split('/')
+    segments = []
+    for part in parts[:-1] if star >= 0 else parts:
+        if part.startswith(':') and PLACEHOLDER_RE.fullmatch(part):
+            names.append(part[1:])
+            segments.append(None)  # any one segment
+        else:
+            segments.append(part)
+    if star < 0:
+        return segments, None
+    prefix = parts[-1]
+    return segments, [(prefix, suffix) for suffix in expand_braces(source[star + 1:])]
+
+
+def parse(text):
+    """Parse _redirects text -> (rules, problems); problems are (line, message)."""
+    rules = []
+    problems = []
+    for lineno, raw in enumerate(text.splitlines(), 1):
+        line = raw.strip()
+        if not line or line.startswith('#'):
+            continue
+        fields = line.split()
+        if len(fields) < 2 or len(fields) > 3:
+            problems.append((lineno, f'expected "<source> <target> [status]": {line}'))
+            continue
+        source, target = fields[0], fields[1]
+        status = DEFAULT_STATUS
+        if len(fields) == 3:
+            if not fields[2].isdigit():
+                problems.append((lineno, f'status is not a number: {line}'))
+                continue
+            status = int(fields[2])
+        if not source.startswith('/'):
+            problems.append((lineno, f'source must be a path: {source}'))
+            continue
+        if source.count('*') > 1:
+            problems.append((lineno, f'only one * is allowed per source: {source}'))
+            continue
+        if len(raw) > MAX_LINE_CHARS:
+            problems.append((lineno, f'longer than {MAX_LINE_CHARS} characters'))
+        if BRACE_RE.search(source):
+            problems.append((lineno, f'{{...}} alternatives are not Cloudflare syntax and may match literally: {source}'))
+        rules.append(Rule(len(rules), lineno, source, target, status, raw))
+    static = sum(1 for r in rules if not r.dynamic)
+    if static > MAX_STATIC_RULES:
+        problems.append((0, f'{static} static rules, Cloudflare allows {MAX_STATIC_RULES}'))
+    if len(rules) - static > MAX_DYNAMIC_RULES:
+        problems.append((0, f'{len(rules) - static} dynamic rules, Cloudflare allows {MAX_DYNAMIC_RULES}'))
+    return rules, problems
+
+
+def load(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return parse(f.read())
+
+
+def substitute(target, params, splat):
+    for name, value in params.items():
+        target = target.replace(':' + name, value)
+    if splat is not None:
+        target = target.replace(':splat', splat)
+    return target
+
+
+def _match_rule(rule, parts):
+    segs = rule.segments
+    if rule.splat is None:
+        if len(parts) != len(segs):
+            return None
+    elif len(parts) <= len(segs):
+        return None
+    values = []
+    for want, got in zip(segs, parts):
+        if want is None:
+            if not got:
+                return None
+            values.append(got)
+        elif want != got:
+            return None
+    splat = None
+    if rule.splat is not None:
+        rest = '/'.join(parts[len(segs):])
+        for prefix, suffix in rule.splat:
+            if len(rest) >= len(prefix) + len(suffix) and rest.startswith(prefix) and rest.endswith(suffix):
+                splat = rest[len(prefix):len(rest) - len(suffix)]
+                break
+        else:
+            return None
+    return dict(zip(rule.names, values)), splat
+
+
+def split_path(path):
+    return path.split('?', 1)[0].split('#', 1)[0][1:].split('/')
+
+
+def match_linear(rules, path):
+    """First matching rule as (rule, resolved target), or None; the reference scan."""
+    parts = split_path(path)
+    for rule in rules:
+        m = _match_rule(rule, parts)
+        if m is not None:
+            return rule, substitute(rule.target, *m)
+    return None
+
+
+class RedirectTrie:
+    """Segment trie over the rules; lookup() equals match_linear()."""
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self.root = self._node()
+        for rule in self.rules:
+            node = self.root
+            for seg in rule.segments:
+                if seg is None:
+                    node['p'] = node['p'] or self._node()
+                    node = node['p']
+                else:
+                    node = node['c'].setdefault(seg, self._node())
+            if rule.splat is None:
+                if node['e'] is None:
+                    node['e'] = rule.index  # later duplicates can never win
+            else:
+                for prefix, suffix in rule.splat:
+                    node['g'].append((prefix, suffix, rule.index))
+        self._by_index = {r.index: r for r in self.rules}
+
+    @staticmethod
+    def _node():
+        return {'c': {}, 'p': None, 'g': [], 'e': None}
+
+    def _walk(self, node, parts, i, values, best):
+        # best is (rule index, values, splat); anything at or above it cannot win
+        if node['e'] is not None and i == len(parts) and (best is None or node['e'] < best[0]):
+            best = (node['e'], values, None)
+        if i < len(parts):
+            if node['g']:
+                rest = '/'.join(parts[i:])
+                for prefix, suffix, index in node['g']:
+                    if (best is None or index < best[0]) and len(rest) >= len(prefix) + len(suffix) \
+                            and rest.startswith(prefix) and rest.endswith(suffix):
+                        best = (index, values, rest[len(prefix):len(rest) - len(suffix)])
+            child = node['c'].get(parts[i])
+            if child is not None:
+                best = self._walk(child, parts, i + 1, values, best)
+            if node['p'] is not None and parts[i]:
+                best = self._walk(node['p'], parts, i + 1, values + (parts[i],), best)
+        return best
+
+    def lookup(self, path):
+        """(rule, resolved target) for the first rule matching path, or None."""
+        best = self._walk(self.root, split_path(path), 0, (), None)
+        if best is None:
+            return None
+        rule = self._by_index[best[0]]
+        return rule, substitute(rule.target, dict(zip(rule.names, best[1])), best[2])
+
+    def to_json(self, targets=None):
+        """Plain-JSON form: {"v", "rules": [[status, target, [names]]], "trie"}.
+
+        Trie nodes use short keys and omit empty ones: c (literal children),
+        p (placeholder child), g ([prefix, suffix, rule] splat rules), e (rule
+        ending here). Rule numbers index "rules" and are in file order, so a
+        lookup keeps the smallest one it meets. targets optionally overrides
+        rule targets by rule index (collapsed chains).
+        """
+        targets = targets or {}
+
+        def dump(node):
+            out = {}
+            if node['c']:
+                out['c'] = {k: dump(v) for k, v in sorted(node['c'].items())}
+            if node['p'] is not None:
+                out['p'] = dump(node['p'])
+            if node['g']:
+                out['g'] = [list(g) for g in node['g']]
+            if node['e'] is not None:
+                out['e'] = node['e']
+            return out
+
+        rules = [[r.status, targets.get(r.index, r.target), r.names] for r in self.rules]
+        return {'v': 1, 'rules': rules, 'trie': dump(self.root)}
+
+
+def probes(rule):
+    """Sample paths the rule's source matches, used to test for shadowing."""
+    base = '/' + '/'.join('x0' if s is None else s for s in rule.segments)
+    if rule.splat is None:
+        return [base]
+    if rule.segments:
+        base += '/'
+    return [base + prefix + fill + suffix for prefix, suffix in rule.splat for fill in ('', 'x1', 'x1/x2')]
+
+
+def site_path(url, domains):
+    """Path of a same-site target (relative path or URL on one of domains), else None."""
+    if url.startswith('/') and not url.startswith('//'):
+        return url
+    parts = urlsplit(url)
+    if parts.scheme in ('http', 'https') and parts.hostname in domains:
+        return (parts.path or '/') + ('?' + parts.query if parts.query else '')
+    return None
+
+
+def follow(trie, location, domains, max_hops=MAX_HOPS):
+    """Follow redirects from location -> (final location, [rules hit], loop?)."""
+    hops = []
+    seen = set()
+    while len(hops) < max_hops:
+        path = site_path(location, domains)
+        if path is None:
+            break
+        key = path.split('?', 1)[0]
+        if key in seen:
+            return location, hops, True
+        seen.add(key)
+        hit = trie.lookup(path)
+        if hit is None or not hit[0].is_redirect:
+            break
+        hops.append(hit[0])
+        location = hit[1]
+    return location, hops, False
+
+
+def analyze(rules, domains=()):
+    """Find dead rules, chains and loops.
+
+    Returns a dict:
+      duplicates  [(rule, first)]  same source, same target and status
+      conflicts   [(rule, first)]  same source, different target or status
+      shadowed    [(rule, by)]     every probe of rule is answered by an earlier rule
+      chains      [(rule, final, hops)]  redirect whose target redirects again
+      loops       [(rule, hops)]
+      collapsed   {rule index: final target} for chains safe to collapse
+                  (all hops permanent, or all temporary)
+    """
+    trie = RedirectTrie(rules)
+    first_by_source = {}
+    report = {'duplicates': [], 'conflicts': [], 'shadowed': [], 'chains': [], 'loops': [], 'collapsed': {}}
+    dead = set()
+    for rule in rules:
+        first = first_by_source.setdefault(rule.source, rule)
+        if first is not rule:
+            same = (first.target, first.status) == (rule.target, rule.status)
+            report['duplicates' if same else 'conflicts'].append((rule, first))
+            dead.add(rule.index)
+            continue
+        winners = {hit[0].index for hit in map(trie.lookup, probes(rule)) if hit is not None}
+        if winners and rule.index not in winners:
+            by = trie.lookup(probes(rule)[0])[0]
+            report['shadowed'].append((rule, by))
+            dead.add(rule.index)
+
+    for rule in rules:
+        if rule.index in dead or not rule.is_redirect or ':' in rule.target.split('//', 1)[-1]:
+            continue  # dynamic targets depend on the request
+        final, hops, loop = follow(trie, rule.target, domains)
+        if loop or len(hops) >= MAX_HOPS:
+            report['loops'].append((rule, hops))
+        elif hops:
+            report['chains'].append((rule, final, hops))
+            kinds = {s in PERMANENT for s in [rule.status] + [h.status for h in hops]}
+            if len(kinds) == 1:
+                report['collapsed'][rule.index] = final
+    report['dead'] = dead
+    return report
+
+
+def parse_redirect_map(text):
+    """Lines of `old -> new` (convert_sitemap.py's redirects-old-query.txt) -> [(line, old, new)]."""
+    out = []
+    for lineno, line in enumerate(text.splitlines(), 1):
+        if '->' not in line:
+            continue
+        old, new = (s.strip() for s in line.split('->', 1))
+        if old and new:
+            out.append((lineno, old, new))
+    return out
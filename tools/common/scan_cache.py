@@ -0,0 +1,163 @@
+"""
+Incremental, content-addressed cache of per-file scan results.
+
+Entries live in a small SQLite file (tools/.cache/scan-cache.sqlite) keyed by
+(namespace, path). A lookup first compares mtime and size; if either changed
+the file's content hash decides whether the cached facts still apply, so a
+fresh checkout (new mtimes, same bytes) does not trigger a rescan.
+
+Facts are any JSON-serialisable value; tuples come back as lists. A second
+table memoizes derived values under caller-chosen keys (e.g. a similarity
+score keyed by the two content fingerprints it was computed from).
+
+A tool's namespace should cover everything its facts depend on; passing
+source_digest() of the scanning modules catches edits to patterns and
+constants a hand-picked list would miss. prune() drops entries for files
+that no longer exist, and memo entries the tool no longer needs.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+
+TOOLS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PATH = os.path.join(TOOLS_DIR, '.cache', 'scan-cache.sqlite')
+
+
+def file_digest(path):
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def source_digest(*paths):
+    """Digest of the given source files (e.g. a tool's __file__), for namespace()."""
+    h = hashlib.blake2b(digest_size=8)
+    for path in paths:
+        with open(os.path.abspath(path), 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def namespace(tool, *config):
+    """Namespace for `tool` that changes whenever `config` changes, so editing
+    a keyword list or bumping an extractor invalidates old entries."""
+    digest = hashlib.blake2b(repr(config).encode('utf-8'), digest_size=6).hexdigest()
+    return f'{tool}:{digest}'
+
+
+def add_cache_args(parser):
+    parser.add_argument('--no-cache', action='store_true', help='Do not read or write the scan cache')
+    parser.add_argument('--rebuild-cache', action='store_true', help='Ignore cached entries and rewrite them')
+
+
+class ScanCache:
+    def __init__(self, namespace, path=DEFAULT_PATH, enabled=True, rebuild=False):
+        self.namespace = namespace
+        self.enabled = enabled
+        self.rebuild = rebuild
+        self.hits = 0
+        self.misses = 0
+        self._pending = {}
+        self._db = None
+        if not enabled:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path)
+        self._db.execute('''CREATE TABLE IF NOT EXISTS facts (
+            namespace TEXT NOT NULL,
+            path TEXT NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            digest TEXT NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (namespace, path))''')
+        self._db.execute('''CREATE TABLE IF NOT EXISTS memo (
+            namespace TEXT NOT NULL,
+            key TEXT NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (namespace, key))''')
+        if rebuild:
+            self._db.execute('DELETE FROM facts WHERE namespace = ?', (namespace,))
+            self._db.execute('DELETE FROM memo WHERE namespace = ?', (namespace,))
+
+    @classmethod
+    def from_args(cls, namespace, args):
+        return cls(namespace, enabled=not args.no_cache, rebuild=args.rebuild_cache)
+
+    def get(self, path):
+        """Return the cached facts for `path`, or None if it must be rescanned."""
+        if self._db is None:
+            return None
+        key = os.path.realpath(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        row = self._db.execute('SELECT mtime_ns, size, digest, data FROM facts WHERE namespace = ? AND path = ?',
+                               (self.namespace, key)).fetchone()
+        if row and row[0] == st.st_mtime_ns and row[1] == st.st_size:
+            self.hits += 1
+            return json.loads(row[3])
+        digest = file_digest(path) if row and row[1] == st.st_size else None
+        if digest is not None and digest == row[2]:
+            # touched but unchanged: refresh the stat key, keep the facts
+            self._db.execute('UPDATE facts SET mtime_ns = ? WHERE namespace = ? AND path = ?',
+                             (st.st_mtime_ns, self.namespace, key))
+            self.hits += 1
+            return json.loads(row[3])
+        self._pending[key] = (st, digest)
+        self.misses += 1
+        return None
+
+    def put(self, path, facts):
+        if self._db is None:
+            return
+        key = os.path.realpath(path)
+        st, digest = self._pending.pop(key, (None, None))
+        try:
+            st = st or os.stat(path)
+            digest = digest or file_digest(path)
+        except OSError:
+            return
+        self._db.execute('INSERT OR REPLACE INTO facts VALUES (?, ?, ?, ?, ?, ?)',
+                         (self.namespace, key, st.st_mtime_ns, st.st_size, digest, json.dumps(facts)))
+
+    def memo_get(self, key):
+        if self._db is None:
+            return None
+        row = self._db.execute('SELECT data FROM memo WHERE namespace = ? AND key = ?',
+                               (self.namespace, key)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def memo_put(self, key, value):
+        if self._db is None:
+            return
+        self._db.execute('INSERT OR REPLACE INTO memo VALUES (?, ?, ?)', (self.namespace, key, json.dumps(value)))
+
+    def prune(self, memo_keep=None):
+        """Delete this namespace's facts for files that no longer exist and, if
+        memo_keep is given, the memo entries whose key it rejects; returns the
+        number of rows deleted."""
+        if self._db is None:
+            return 0
+        gone = [(self.namespace, path) for (path,) in
+                self._db.execute('SELECT path FROM facts WHERE namespace = ?', (self.namespace,))
+                if not os.path.exists(path)]
+        self._db.executemany('DELETE FROM facts WHERE namespace = ? AND path = ?', gone)
+        stale = []
+        if memo_keep is not None:
+            stale = [(self.namespace, key) for (key,) in
+                     self._db.execute('SELECT key FROM memo WHERE namespace = ?', (self.namespace,))
+                     if not memo_keep(key)]
+            self._db.executemany('DELETE FROM memo WHERE namespace = ? AND key = ?', stale)
+        return len(gone) + len(stale)
+
+    def close(self):
+        if self._db is None:
+            return
+        self._db.commit()
+        self._db.close()
+        self._db = None
@@ -0,0 +1,284 @@
+"""
+Streaming sitemap reader and sharded writer.
+
+Reading uses iterparse and clears every <url>/<sitemap> element once it has
+been turned into a SitemapEntry, so memory stays flat however large the
+file is. Both urlset and sitemapindex documents are accepted, plain or
+.gz. image:image children are parsed; any other child of a <url> (e.g.
+xhtml:link alternates, video:video) is kept as serialized XML in
+entry.extra and written back out unchanged.
+
+Writing streams entries straight to disk. Once a file would exceed the
+protocol limits (50,000 URLs or 50 MB uncompressed) the writer starts a new
+shard and closes with a sitemapindex pointing at all shards. A run that
+fits in one file produces a plain urlset under the requested name, exactly
+as before. Shards are written under temporary names and only renamed into
+place by close(); abort() (or leaving the `with` block on an exception)
+deletes them, so a failed run never replaces a good sitemap. close() also
+removes numbered shards left over from an earlier, bigger run.
+"""
+import gzip
+import os
+import re
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+
+NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+IMAGE_NS = 'http://www.google.com/schemas/sitemap-image/1.1'
+MAX_URLS = 50000
+MAX_BYTES = 50 * 1024 * 1024
+
+# prefixes used when extension elements are serialized into entry.extra
+for _prefix, _uri in (('image', IMAGE_NS), ('xhtml', 'http://www.w3.org/1999/xhtml'),
+                      ('video', 'http://www.google.com/schemas/sitemap-video/1.1'),
+                      ('news', 'http://www.google.com/schemas/sitemap-news/0.9')):
+    ET.register_namespace(_prefix, _uri)
+
+
+class SitemapEntry:
+    __slots__ = ('kind', 'loc', 'lastmod', 'changefreq', 'priority', 'images', 'extra')
+
+    def __init__(self, loc, lastmod=None, changefreq=None, priority=None, images=None, kind='url', extra=None):
+        self.kind = kind          # 'url' (urlset) or 'sitemap' (sitemapindex)
+        self.loc = loc
+        self.lastmod = lastmod
+        self.changefreq = changefreq
+        self.priority = priority
+        self.images = images or []  # [(image_loc, image_title)]
+        self.extra = extra or []    # other child elements, as XML strings
+
+    def __repr__(self):
+        return f'SitemapEntry({self.kind}, {self.loc!r})'
+
+
+def _open(path, mode):
+    if str(path).endswith('.gz'):
+        # mtime=0 keeps gzip output byte-identical across runs
+        return gzip.GzipFile(path, mode, mtime=0)
+    return open(path, mode)
+
+
+def _local(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def iter_entries(source):
+    """Yield a SitemapEntry per <url> or <sitemap> in source (path or file)."""
+    fh = _open(source, 'rb') if isinstance(source, (str, os.PathLike)) else source
+    try:
+        context = ET.iterparse(fh, events=('start', 'end'))
+        root = None
+        for event, elem in context:
+            if root is None:
+                root = elem
+                continue
+            if event != 'end':
+                continue
+            tag = _local(elem.tag)
+            if tag not in ('url', 'sitemap'):
+                continue
+            entry = SitemapEntry(None, kind=tag)
+            for child in elem:
+                name = _local(child.tag)
+                if name == 'image':
+                    img_loc = img_title = None
+                    for sub in child:
+                        if _local(sub.tag) == 'loc':
+                            img_loc = (sub.text or '').strip()
+                        elif _local(sub.tag) == 'title':
+                            img_title = (sub.text or '').strip()
+                    entry.images.append((img_loc, img_title))
+                elif name in ('loc', 'lastmod', 'changefreq', 'priority'):
+                    setattr(entry, name, (child.text or '').strip())
+                else:
+                    child.tail = None
+                    entry.extra.append(ET.tostring(child, encoding='unicode').strip())
+            # drop the finished element and anything the root still references
+            elem.clear()
+            root.clear()
+            if entry.loc:
+                yield entry
+    finally:
+        if fh is not source:
+            fh.close()
+
+
+def iter_locs(source):
+    for entry in iter_entries(source):
+        yield entry.loc
+
+
+def _url_block(entry):
+    parts = ['  <url>\n', f'    <loc>{escape(entry.loc)}</loc>\n']
+    if entry.lastmod:
+        parts.append(f'    <lastmod>{entry.lastmod}</lastmod>\n')
+    if entry.changefreq:
+        parts.append(f'    <changefreq>{entry.changefreq}</changefreq>\n')
+    if entry.priority:
+        parts.append(f'    <priority>{entry.priority}</priority>\n')
+    for img_loc, img_title in entry.images:
+        parts.append('    <image:image>\n')
+        parts.append(f'      <image:loc>{escape(img_loc)}</image:loc>\n')
+        if img_title:
+            parts.append(f'      <image:title>{escape(img_title)}</image:title>\n')
+        parts.append('    </image:image>\n')
+    for xml in entry.extra:
+        parts.append(f'    {xml}\n')
+    parts.append('  </url>\n')
+    return ''.join(parts)
+
+
+def remove_stale_shards(out_dir, name, ext, keep):
+    """Delete <name>-<n><ext> files in out_dir that are not in keep; returns their paths."""
+    shard_re = re.compile(re.escape(name) + r'-\d+' + re.escape(ext) + '$')
+    keep = {os.path.abspath(p) for p in keep}
+    removed = []
+    for fname in sorted(os.listdir(out_dir)):
+        path = os.path.join(out_dir, fname)
+        if shard_re.match(fname) and os.path.abspath(path) not in keep:
+            os.remove(path)
+            removed.append(path)
+    return removed
+
+
+def write_index(path, entries):
+    """Write a sitemapindex; entries are SitemapEntry or (loc, lastmod) pairs."""
+    with _open(path, 'wb') as f:
+        f.write(b'<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write(f'<sitemapindex xmlns="{NS}">\n'.encode('utf-8'))
+        for e in entries:
+            loc, lastmod = (e.loc, e.lastmod) if isinstance(e, SitemapEntry) else e
+            f.write(b'  <sitemap>\n')
+            f.write(f'    <loc>{escape(loc)}</loc>\n'.encode('utf-8'))
+            if lastmod:
+                f.write(f'    <lastmod>{lastmod}</lastmod>\n'.encode('utf-8'))
+            f.write(b'  </sitemap>\n')
+        f.write(b'</sitemapindex>\n')
+
+
+class SitemapWriter:
+    """Stream urlset entries into one or more sitemap files.
+
+    with SitemapWriter(out_dir, base_url='https://c.poki2.online') as w:
+        w.add(SitemapEntry(loc, lastmod=today, changefreq='monthly', priority='0.7'))
+    w.files  -> paths written; w.index -> index path or None;
+    w.removed -> stale shards deleted from out_dir
+
+    Shards are named <name>-1.xml, <name>-2.xml, ...; base_url is where they
+    will be served from and is only needed once the output actually shards.
+    The index lists `lastmod` for every shard, or each shard's newest entry
+    lastmod when it is None.
+    """
+
+    def __init__(self, out_dir, name='sitemap', base_url=None, gzip_output=False, images=False,
+                 max_urls=MAX_URLS, max_bytes=MAX_BYTES, lastmod=None):
+        self.out_dir = out_dir
+        self.name = name
+        self.base_url = base_url.rstrip('/') if base_url else None
+        self.ext = '.xml.gz' if gzip_output else '.xml'
+        self.images = images
+        self.max_urls = max_urls
+        self.max_bytes = max_bytes
+        self.lastmod = lastmod
+        self.files = []
+        self.index = None
+        self.removed = []
+        self.count = 0
+        self._closed = False
+        self._fh = None
+        self._shard_urls = 0
+        self._shard_bytes = 0
+        self._shard_lastmods = []
+        ns = f'<urlset xmlns="{NS}"'
+        if images:
+            ns += f'\n        xmlns:image="{IMAGE_NS}"'
+        self._header = ('<?xml version="1.0" encoding="UTF-8"?>\n' + ns + '>\n').encode('utf-8')
+        self._footer = b'</urlset>\n'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _shard_path(self, n):
+        return os.path.join(self.out_dir, f'{self.name}-{n}{self.ext}')
+
+    def _tmp_path(self, n):
+        # the extension stays last so _open() still picks gzip for .xml.gz
+        return os.path.join(self.out_dir, f'.{self.name}-{n}.tmp{self.ext}')
+
+    def _open_shard(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        path = self._tmp_path(len(self.files) + 1)
+        self.files.append(path)
+        self._fh = _open(path, 'wb')
+        self._fh.write(self._header)
+        self._shard_lastmods.append(None)
+        self._shard_urls = 0
+        self._shard_bytes = len(self._header) + len(self._footer)
+
+    def _close_shard(self):
+        self._fh.write(self._footer)
+        self._fh.close()
+        self._fh = None
+
+    def add(self, entry):
+        if entry.images and not self.images:
+            raise ValueError('entry has image:image data; create the writer with images=True')
+        block = _url_block(entry).encode('utf-8')
+        if self._fh is not None and (self._shard_urls >= self.max_urls or
+                                     self._shard_bytes + len(block) > self.max_bytes):
+            self._close_shard()
+        if self._fh is None:
+            self._open_shard()
+        self._fh.write(block)
+        self._shard_urls += 1
+        self._shard_bytes += len(block)
+        if entry.lastmod and (self._shard_lastmods[-1] or '') < entry.lastmod:
+            self._shard_lastmods[-1] = entry.lastmod
+        self.count += 1
+
+    def abort(self):
+        """Discard everything written so far; the previous output stays in place."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        for path in self.files:
+            if os.path.exists(path):
+                os.remove(path)
+        self.files = []
+
+    def close(self):
+        if self._closed:
+            return self.files
+        if self._fh is None and not self.files:
+            self._open_shard()  # an empty urlset is still a valid sitemap
+        if self._fh is not None:
+            self._close_shard()
+        single = os.path.join(self.out_dir, self.name + self.ext)
+        if len(self.files) > 1 and not self.base_url:
+            self.abort()
+            raise ValueError('sitemap needs sharding but no base_url was given for the index')
+        self._closed = True
+        if len(self.files) == 1:
+            os.replace(self.files[0], single)
+            self.files = [single]
+        else:
+            tmps, self.files = self.files, [self._shard_path(n) for n in range(1, len(self.files) + 1)]
+            for tmp, path in zip(tmps, self.files):
+                os.replace(tmp, path)
+            shards = [(f'{self.base_url}/{os.path.basename(p)}', self.lastmod or newest)
+                      for p, newest in zip(self.files, self._shard_lastmods)]
+            tmp = self._tmp_path('index')
+            write_index(tmp, shards)
+            os.replace(tmp, single)
+            self.index = single
+        self.removed = remove_stale_shards(self.out_dir, self.name, self.ext, self.files)
+        return self.files
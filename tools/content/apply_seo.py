@@ -7,13 +7,26 @@ Usage:
 
 This will, for each directory present in `--source`, extract the <head>...</head>
 from the generated landing page and replace the <head> in the target's
-`index.html`. A backup is created at `index.html.seo.bak`.
+`index.html`, adding the top ad slot and ad loader if missing. Both pages are
+read with html.parser, stopping at <body>, and the result is assembled in one
+pass. A backup is created at `index.html.seo.bak`.
+
+Pages whose result is byte-identical to what is already there are left
+untouched (no write, no backup), and the files that did change are listed in
+`--changed-manifest` (default `<target>.changed.txt`), as URLs when
+`--domain` is given, for a targeted CDN purge. --metrics-json / --profile
+record the read, rewrite and write phases (see common/metrics.py).
 """
 import argparse
 import os
-import re
 import shutil
+import sys
 from glob import glob
+from html.parser import HTMLParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.incremental import ChangeManifest, default_manifest_path
+from common.metrics import Metrics, add_metrics_args
 
 
 def read(path):
@@ -26,61 +39,162 @@ def write(path, data):
         f.write(data)
 
 
-def extract_head(html):
-    m = re.search(r'<head[\s\S]*?>[\s\S]*?</head>', html, re.IGNORECASE)
-    if m:
-        return m.group(0)
-    return None
+AD_SLOT = '\n  <div id="ad-slot-top" class="ad-slot" aria-hidden="true"></div>\n'
+# lightweight generic loader; swap src to your real ad library (e.g., AdSense) and add publisher id
+AD_LOADER = ('\n  <script data-seo-ad-loader>\n'
+             "    (function(){\n"
+             "      try{\n"
+             "        var s=document.createElement('script');\n"
+             "        s.src='https://cdn.example-ads/publisher.js';\n"
+             "        s.async=true;\n"
+             "        document.head.appendChild(s);\n"
+             "      }catch(e){}\n"
+             "    })();\n"
+             '  </script>\n')
+SCAN_CHUNK = 64 * 1024
+
+
+class _Done(Exception):
+    pass
+
+
+class HeadScanner(HTMLParser):
+    """Record where <head>, </head>, <body> and canonical links sit in a page.
+
+    Offsets index into the original string. Feeding happens in growing
+    chunks and stops as soon as the <body> start tag has been seen, so the bulk of a
+    large inlined game page is never tokenised. Script/style contents are
+    opaque to the parser, so markup inside JS strings is never mistaken for
+    the real head.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.head_start = None      # offset of '<head'
+        self.head_open_end = None   # just past the <head ...> tag
+        self.head_end = None        # just past '</head>'
+        self.body_start = None      # offset of '<body'
+        self.body_open_end = None   # just past the <body ...> tag
+        self.canonicals = []        # [(start, end)] of <link rel=canonical> inside the head
+        self._html = ''
+        self._line_starts = [0]
+
+    def _offset(self):
+        line, col = self.getpos()
+        starts = self._line_starts
+        while len(starts) < line:
+            starts.append(self._html.index('\n', starts[-1]) + 1)
+        return starts[line - 1] + col
+
+    def _start_tag_span(self):
+        start = self._offset()
+        return start, start + len(self.get_starttag_text())
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'head' and self.head_start is None and self.body_start is None:
+            self.head_start, self.head_open_end = self._start_tag_span()
+        elif tag == 'link' and self.head_open_end is not None and self.head_end is None:
+            if any(k == 'rel' and (v or '').lower() == 'canonical' for k, v in attrs):
+                self.canonicals.append(self._start_tag_span())
+        elif tag == 'body':
+            self.body_start, self.body_open_end = self._start_tag_span()
+            raise _Done
+
+    handle_startendtag = handle_starttag
+
+    def handle_endtag(self, tag):
+        if tag == 'head' and self.head_open_end is not None and self.head_end is None:
+            self.head_end = self._html.index('>', self._offset()) + 1
 
+    def scan(self, html):
+        self._html = html
+        # chunks double in size: the parser re-searches its unconsumed buffer
+        # (e.g. an unterminated inline <script>) on every feed
+        pos, size = 0, SCAN_CHUNK
+        try:
+            while pos < len(html):
+                self.feed(html[pos:pos + size])
+                pos += size
+                size *= 2
+            self.close()
+        except _Done:
+            pass
+        return self
+
+
+def extract_head(html, canonical_href=None):
+    """Return the page's <head>...</head>, with every canonical link pointing
+    at canonical_href (one is added before </head> when there is none)."""
+    sc = HeadScanner().scan(html)
+    if sc.head_end is None:
+        return None
+    if canonical_href is None:
+        return html[sc.head_start:sc.head_end]
+    link = f'<link rel="canonical" href="{canonical_href}">'
+    parts = []
+    pos = sc.head_start
+    for start, end in sc.canonicals:
+        parts += [html[pos:start], link]
+        pos = end
+    close = html.rindex('</', pos, sc.head_end)
+    parts.append(html[pos:close])
+    if not sc.canonicals:
+        parts.append(f'  {link}\n')
+    parts.append(html[close:sc.head_end])
+    return ''.join(parts)
 
-def replace_head(target_html, new_head):
-    if re.search(r'<head[\s\S]*?>[\s\S]*?</head>', target_html, re.IGNORECASE):
-        return re.sub(r'<head[\s\S]*?>[\s\S]*?</head>', new_head, target_html, flags=re.IGNORECASE)
-    # if no head, insert before <body>
-    if '<body' in target_html.lower():
-        return re.sub(r'(<body[\s\S]*?>)', new_head + '\n\1', target_html, count=1, flags=re.IGNORECASE)
-    # fallback: prepend
-    return new_head + '\n' + target_html
 
+def rewrite_page(target_html, new_head):
+    """Swap in new_head and make sure the top ad slot and the ad loader are
+    present, building the result in a single join.
 
-def ensure_ad_placeholder_and_inject(html, name):
-    """Ensure a top ad placeholder exists and inject a small ad-loader script into the head.
-    The ad loader is intentionally generic; replace the URL with your real ad vendor snippet.
+    The head replaced is the page's own <head> up to </head>, or up to
+    <body> when the closing tag is missing. Without a head to replace,
+    new_head goes just before <body>, or is prepended when there is none.
     """
-    # inject simple ad placeholder after opening <body>
-    body_open = re.search(r'<body[\s\S]*?>', html, re.IGNORECASE)
-    if body_open:
-        insert_pos = body_open.end()
-        if 'id="ad-slot-top"' not in html:
-            placeholder = '\n  <div id="ad-slot-top" class="ad-slot" aria-hidden="true"></div>\n'
-            html = html[:insert_pos] + placeholder + html[insert_pos:]
-
-    # ensure ad loader script in head
-    head_open = re.search(r'<head[\s\S]*?>', html, re.IGNORECASE)
-    if head_open and 'data-seo-ad-loader' not in html:
-        # lightweight generic loader; swap src to your real ad library (e.g., AdSense) and add publisher id
-        ad_loader = ('\n  <script data-seo-ad-loader>\n'
-                     "    (function(){\n"
-                     "      try{\n"
-                     "        var s=document.createElement('script');\n"
-                     "        s.src='https://cdn.example-ads/publisher.js';\n"
-                     "        s.async=true;\n"
-                     "        document.head.appendChild(s);\n"
-                     "      }catch(e){}\n"
-                     "    })();\n"
-                     '  </script>\n')
-        insert_pos = head_open.end()
-        html = html[:insert_pos] + ad_loader + html[insert_pos:]
-
-    return html
-
-
-def main():
+    sc = HeadScanner().scan(target_html)
+    if sc.head_end is not None:
+        before, after = target_html[:sc.head_start], target_html[sc.head_end:]
+    elif sc.head_start is not None and sc.body_start is not None:
+        before, after = target_html[:sc.head_start], target_html[sc.body_start:]
+        new_head += '\n'
+    elif sc.body_start is not None:
+        before, after = target_html[:sc.body_start], target_html[sc.body_start:]
+        new_head += '\n'
+    else:
+        before, after = '', target_html
+        new_head += '\n'
+
+    need_slot = not any('id="ad-slot-top"' in t for t in (before, new_head, after))
+    need_loader = not any('data-seo-ad-loader' in t for t in (before, new_head, after))
+
+    # the loader goes right after the new head's own <head ...> tag
+    parts = [before]
+    if need_loader:
+        open_end = new_head.index('>') + 1
+        parts += [new_head[:open_end], AD_LOADER, new_head[open_end:]]
+    else:
+        parts.append(new_head)
+    body_open_end = sc.body_open_end
+    if need_slot and body_open_end is not None:
+        split = body_open_end - (len(target_html) - len(after))
+        parts += [after[:split], AD_SLOT, after[split:]]
+    else:
+        parts.append(after)
+    return ''.join(parts)
+
+
+def main(argv=None):
+    """Run with argv (default sys.argv); returns a stats dict, or None if a folder is missing."""
     parser = argparse.ArgumentParser()
     parser.add_argument('--source', required=True, help='Generated SEO folder (e.g., dist_seo_c)')
     parser.add_argument('--target', required=True, help='Real shards folder (e.g., /path/to/shards/c)')
     parser.add_argument('--commit', action='store_true', help='Commit changes to git')
-    args = parser.parse_args()
+    parser.add_argument('--domain', help='Public base URL of the target (e.g., https://c.poki2.online); '
+                        'makes the changed manifest list URLs instead of paths')
+    parser.add_argument('--changed-manifest', help='Where to list changed files (default: <target>.changed.txt)')
+    add_metrics_args(parser)
+    args = parser.parse_args(argv)
 
     src = args.source
     tgt = args.target
@@ -95,7 +209,10 @@ def main():
         print('target not found:', tgt)
         return
 
+    metrics = Metrics.from_args('apply_seo', args, argv)
     modified = []
+    unchanged = 0
+    manifest = ChangeManifest(tgt, base_url=args.domain)
 
     for name in sorted(os.listdir(src)):
         src_index = os.path.join(src, name, 'index.html')
@@ -106,46 +223,46 @@ def main():
             print('target index.html missing, skipping:', tgt_index)
             continue
 
-        gen_html = read(src_index)
-        new_head = extract_head(gen_html)
+        # canonical points at the main site so search engines prefer the canonical origin
+        with metrics.phase('read'):
+            gen_html = read(src_index)
+            orig_html = read(tgt_index)
+        metrics.count('files_read', 2)
+        metrics.count('chars_read', len(gen_html) + len(orig_html))
+        with metrics.phase('rewrite'):
+            new_head = extract_head(gen_html, MAIN_CANONICAL_PREFIX + name + '/')
+            new_html = rewrite_page(orig_html, new_head) if new_head else None
         if not new_head:
             print('no head in generated for', name)
             continue
 
-        # rewrite canonical to point to the main site so search engines prefer the canonical origin
-        try:
-            canonical_href = MAIN_CANONICAL_PREFIX + name + '/'
-            # replace existing canonical if present
-            if re.search(r'<link[^>]+rel=["\']canonical["\'][^>]*>', new_head, re.IGNORECASE):
-                new_head = re.sub(r'<link[^>]+rel=["\']canonical["\'][^>]*>', f'<link rel="canonical" href="{canonical_href}">', new_head, flags=re.IGNORECASE)
-            else:
-                # inject before </head>
-                new_head = new_head.replace('</head>', f'  <link rel="canonical" href="{canonical_href}">\n</head>')
-        except Exception:
-            pass
-
-        orig_html = read(tgt_index)
-        new_html = replace_head(orig_html, new_head)
-
-        # ensure ad placeholder and lightweight ad loader are present
-        new_html = ensure_ad_placeholder_and_inject(new_html, name)
+        if new_html == orig_html:
+            unchanged += 1
+            continue
 
         # backup
-        bak = tgt_index + '.seo.bak'
-        if not os.path.exists(bak):
-            shutil.copy2(tgt_index, bak)
-
-        write(tgt_index, new_html)
+        with metrics.phase('write'):
+            bak = tgt_index + '.seo.bak'
+            if not os.path.exists(bak):
+                shutil.copy2(tgt_index, bak)
+            write(tgt_index, new_html)
         modified.append(tgt_index)
+        manifest.add(tgt_index)
         print('patched', tgt_index)
 
-    print(f'Patched {len(modified)} files')
+    manifest_path = args.changed_manifest or default_manifest_path(tgt)
+    manifest.write(manifest_path)
+    print(f'Patched {len(modified)} files, {unchanged} already up to date; changed files listed in {manifest_path}')
 
     if args.commit and modified:
         import subprocess
         subprocess.run(['git', 'add'] + modified)
         subprocess.run(['git', 'commit', '-m', 'chore(seo): inject meta/og/json-ld into game pages'])
         print('Committed changes')
+    metrics.count('patched', len(modified))
+    metrics.count('bytes_written', manifest.bytes)
+    metrics.finish()
+    return {'patched': len(modified), 'unchanged': unchanged, 'bytes_written': manifest.bytes}
 
 
 if __name__ == '__main__':
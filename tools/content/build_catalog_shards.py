@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Split games.json into small per-platform and per-tag catalog shards.
+
+Usage:
+  python3 tools/content/build_catalog_shards.py --out dist/catalog [--bench]
+
+Shards hold only the games the grid would show (show=true and the platform
+in avalid, exactly as canShow() in js/app.js decides) and only the fields
+it renders: title, link, icons, badge. Written to shards/ per platform
+(`mobile.<hash>.json`) and per tag and platform
+(`tag-<tag>.mobile.<hash>.json`, for tags with enough games to get a tag
+page); the SHA-256 prefix in the name lets them be cached as immutable.
+manifest.json (next to shards/) maps every shard to its file, size and game count; it is
+the only file that has to be revalidated.
+
+Unchanged shards are not rewritten and shards no longer in the manifest are
+removed. --bench compares shard sizes (raw and gzip) and parse times against
+the monolithic games.json.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.catalog import CATALOG_PATH, PLATFORMS, load
+from common.incremental import write_if_changed
+from common.metrics import Metrics, add_metrics_args
+
+SHARD_FIELDS = ('title', 'link', 'icons', 'badge')
+# same threshold as MIN_GAMES in scripts/generate-tag-pages.cjs: smaller tags get no page
+MIN_TAG_GAMES = 5
+MANIFEST = 'manifest.json'
+# shards sit in their own folder so _headers can mark just them immutable
+SHARD_DIR = 'shards'
+# <stem>.<8 hex>.json, the same revved-name shape scripts/hash-assets.cjs skips
+SHARD_RE = re.compile(r'^[\w.-]+\.[0-9a-f]{8}\.json$')
+
+
+def tag_slug(tag):
+    return re.sub(r'[^a-z0-9]+', '-', tag.strip().lower()).strip('-') or 'tag'
+
+
+def encode(games):
+    """Compact JSON for a shard; games keep catalog order."""
+    rows = [{k: v for k, v in g.to_dict().items() if k in SHARD_FIELDS} for g in games]
+    return json.dumps(rows, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def build(catalog, min_tag_games=MIN_TAG_GAMES):
+    """Yield (manifest key, file stem, games) for every non-empty shard."""
+    for platform in PLATFORMS:
+        yield f'platform/{platform}', platform, catalog.select(show=True, platform=platform)
+    for tag in sorted(catalog.by_tag):
+        if len(catalog.select(tag=tag, show=True)) < min_tag_games:
+            continue
+        for platform in PLATFORMS:
+            games = catalog.select(tag=tag, show=True, platform=platform)
+            if games:
+                yield f'tag/{tag}/{platform}', f'tag-{tag_slug(tag)}.{platform}', games
+
+
+def write_shards(catalog, out, min_tag_games=MIN_TAG_GAMES):
+    shard_dir = os.path.join(out, SHARD_DIR)
+    os.makedirs(shard_dir, exist_ok=True)
+    shards = {}
+    written = 0
+    for key, stem, games in build(catalog, min_tag_games):
+        data = encode(games)
+        digest = hashlib.sha256(data).hexdigest()
+        name = f'{stem}.{digest[:8]}.json'
+        if write_if_changed(os.path.join(shard_dir, name), data):
+            written += 1
+        shards[key] = {'file': f'{SHARD_DIR}/{name}', 'bytes': len(data), 'games': len(games)}
+    manifest = {'source': catalog.digest[:16], 'fields': list(SHARD_FIELDS), 'shards': shards}
+    write_if_changed(os.path.join(out, MANIFEST),
+                     json.dumps(manifest, ensure_ascii=False, separators=(',', ':')) + '\n')
+
+    # drop shards from older builds
+    keep = {s['file'].rsplit('/', 1)[-1] for s in shards.values()}
+    removed = 0
+    for name in os.listdir(shard_dir):
+        if SHARD_RE.match(name) and name not in keep:
+            os.remove(os.path.join(shard_dir, name))
+            removed += 1
+    return shards, written, removed
+
+
+def _parse_ms(data, rounds=50):
+    times = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        json.loads(data)
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1000
+
+
+def bench(games_path, out, shards):
+    with open(games_path, 'rb') as f:
+        full = f.read()
+    with open(os.path.join(out, MANIFEST), 'rb') as f:
+        rows = [('games.json (all)', full), ('manifest.json', f.read())]
+    for platform in PLATFORMS:
+        with open(os.path.join(out, shards[f'platform/{platform}']['file']), 'rb') as f:
+            rows.append((f'{platform} shard', f.read()))
+    tag_keys = [k for k in shards if k.startswith('tag/') and k.endswith('/mobile')]
+    if tag_keys:
+        median_key = sorted(tag_keys, key=lambda k: shards[k]['bytes'])[len(tag_keys) // 2]
+        largest_key = max(tag_keys, key=lambda k: shards[k]['bytes'])
+        for label, key in (('median tag shard', median_key), ('largest tag shard', largest_key)):
+            with open(os.path.join(out, shards[key]['file']), 'rb') as f:
+                rows.append((f'{label} ({key.split("/")[1]}, mobile)', f.read()))
+    base_raw, base_gz = len(full), len(gzip.compress(full, 9))
+    print(f"\n{'payload':40} {'bytes':>9} {'gzip':>8} {'vs full':>8} {'parse ms':>9}")
+    for label, data in rows:
+        gz = len(gzip.compress(data, 9))
+        print(f'{label:40} {len(data):9d} {gz:8d} {gz / base_gz:8.1%} {_parse_ms(data):9.3f}')
+    print(f'(gzip ratio is against games.json gzip = {base_gz} bytes; raw {base_raw})')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--games', default=CATALOG_PATH, help='Catalog to shard (default: repo games.json)')
+    parser.add_argument('--out', default='dist/catalog', help='Output folder for shards and manifest.json')
+    parser.add_argument('--min-tag-games', type=int, default=MIN_TAG_GAMES,
+                        help='Only shard tags with at least this many visible games')
+    parser.add_argument('--bench', action='store_true', help='Compare shard sizes/parse times to games.json')
+    add_metrics_args(parser)
+    args = parser.parse_args()
+
+    metrics = Metrics.from_args('build_catalog_shards', args)
+    with metrics.phase('load'):
+        catalog = load(args.games)
+    with metrics.phase('shard'):
+        shards, written, removed = write_shards(catalog, args.out, args.min_tag_games)
+    metrics.count('shards', len(shards))
+    metrics.count('files_written', written)
+    print(f'{len(shards)} shards in {args.out} ({written} written, {len(shards) - written} unchanged, '
+          f'{removed} stale removed)')
+    if args.bench:
+        with metrics.phase('bench'):
+            bench(args.games, args.out, shards)
+    metrics.finish()
+
+
+if __name__ == '__main__':
+    main()
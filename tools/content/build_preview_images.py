@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Resize game preview images into web variants and 1200x630 OG crops.
+
+Usage:
+  python3 tools/content/build_preview_images.py --input shards/c [--jobs 0]
+
+For every game folder under --input the preview image is located once (same
+rules generate_seo always used) and turned into:
+
+  preview/<w>w.webp and preview/<w>w.avif  for each width in --widths that
+                                           is smaller than the source
+  preview/og-1200x630.jpg                  centre crop to 1.91:1, for og:image
+
+written next to the game (under --output/<game>/, default the input
+itself, so the URLs resolve the same way as the original image). Work is
+spread over a process pool.
+
+preview-images.json in --output records, per game, the source path and
+SHA-256, its dimensions and every variant with its size. It doubles as the
+cache: a game whose source hash and settings are unchanged and whose outputs
+still exist is not re-encoded. generate_seo --image-manifest reads it to
+point og:image at the crop and emit og:image:width/height.
+
+Encoding needs Pillow (AVIF additionally needs Pillow built with AVIF
+support; it is skipped otherwise). Without Pillow only the source
+dimensions are recorded, which still gives the landing pages correct
+og:image:width/height.
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.images import find_preview_image, image_size
+from common.incremental import sha256_file, write_if_changed
+from common.metrics import Metrics, add_metrics_args
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+MANIFEST_NAME = 'preview-images.json'
+VARIANT_DIR = 'preview'
+OG_SIZE = (1200, 630)
+DEFAULT_WIDTHS = (320, 640)
+WEBP_QUALITY = 80
+AVIF_QUALITY = 55
+JPEG_QUALITY = 85
+
+
+def settings_key(widths):
+    """Changes whenever the outputs for an unchanged source would differ."""
+    encoder = 'pillow' if Image is not None else 'none'
+    return f'{encoder}:{",".join(map(str, widths))}:{OG_SIZE[0]}x{OG_SIZE[1]}:' \
+           f'{WEBP_QUALITY}/{AVIF_QUALITY}/{JPEG_QUALITY}'
+
+
+def og_crop(img):
+    """Centre crop to the OG aspect ratio, then scale to OG_SIZE."""
+    return ImageOps.fit(img, OG_SIZE, method=Image.LANCZOS, centering=(0.5, 0.5))
+
+
+def encode(task):
+    """Worker: build one game's variants; returns its manifest entry."""
+    name, game_dir, out_dir, source, digest, widths = task
+    src_path = os.path.join(game_dir, source)
+    entry = {'source': source.replace(os.sep, '/'), 'sha256': digest, 'size': image_size(src_path),
+             'variants': [], 'og': None}
+    if Image is None:
+        return name, entry
+
+    variant_dir = os.path.join(out_dir, VARIANT_DIR)
+    os.makedirs(variant_dir, exist_ok=True)
+    with Image.open(src_path) as img:
+        img = ImageOps.exif_transpose(img)
+        entry['size'] = list(img.size)
+        rgb = img.convert('RGBA' if img.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        for width in widths:
+            if width >= img.width:
+                continue
+            height = round(img.height * width / img.width)
+            resized = rgb.resize((width, height), Image.LANCZOS)
+            for fmt, ext, quality in (('WEBP', 'webp', WEBP_QUALITY), ('AVIF', 'avif', AVIF_QUALITY)):
+                rel = f'{VARIANT_DIR}/{width}w.{ext}'
+                try:
+                    resized.save(os.path.join(out_dir, rel), fmt, quality=quality)
+                except (KeyError, OSError, ValueError):
+                    continue  # this Pillow build cannot write the format
+                entry['variants'].append({'file': rel, 'format': ext, 'width': width, 'height': height})
+        rel = f'{VARIANT_DIR}/og-{OG_SIZE[0]}x{OG_SIZE[1]}.jpg'
+        og_crop(rgb.convert('RGB')).save(os.path.join(out_dir, rel), 'JPEG', quality=JPEG_QUALITY,
+                                         optimize=True, progressive=True)
+        entry['og'] = {'file': rel, 'width': OG_SIZE[0], 'height': OG_SIZE[1]}
+    return name, entry
+
+
+def outputs_exist(out_dir, entry):
+    files = [v['file'] for v in entry.get('variants', [])]
+    if entry.get('og'):
+        files.append(entry['og']['file'])
+    return all(os.path.exists(os.path.join(out_dir, f)) for f in files)
+
+
+def load_manifest(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--input', required=True, help='Folder of game folders (e.g., shards/c)')
+    parser.add_argument('--output', help='Where variants and the manifest go (default: --input)')
+    parser.add_argument('--manifest', help=f'Manifest path (default: <output>/{MANIFEST_NAME})')
+    parser.add_argument('--widths', default=','.join(map(str, DEFAULT_WIDTHS)),
+                        help='Comma-separated preview widths to produce')
+    parser.add_argument('--jobs', type=int, default=0, help='Worker processes (0 = one per CPU)')
+    parser.add_argument('--force', action='store_true', help='Re-encode even when the cache says unchanged')
+    add_metrics_args(parser)
+    args = parser.parse_args()
+
+    metrics = Metrics.from_args('build_preview_images', args)
+    inp = args.input
+    out = args.output or inp
+    manifest_path = args.manifest or os.path.join(out, MANIFEST_NAME)
+    widths = tuple(sorted({int(w) for w in args.widths.split(',') if w.strip()}))
+    settings = settings_key(widths)
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    if Image is None:
+        print('Pillow is not installed: recording source dimensions only, no variants are encoded')
+
+    previous = load_manifest(manifest_path)
+    prev_games = previous.get('games', {}) if previous.get('settings') == settings else {}
+    games = {}
+    tasks = []
+    missing = 0
+    for name in sorted(os.listdir(inp)):
+        game_dir = os.path.join(inp, name)
+        if not os.path.isdir(game_dir):
+            continue
+        source = find_preview_image(game_dir)
+        if source is None:
+            missing += 1
+            continue
+        digest = sha256_file(os.path.join(game_dir, source))
+        out_dir = os.path.join(out, name)
+        prev = prev_games.get(name)
+        if (not args.force and prev and prev.get('sha256') == digest
+                and prev.get('source') == source.replace(os.sep, '/') and outputs_exist(out_dir, prev)):
+            games[name] = prev
+            continue
+        tasks.append((name, game_dir, out_dir, source, digest, widths))
+    metrics.mark('scan')
+
+    if tasks:
+        if jobs > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                results = list(pool.map(encode, tasks, chunksize=max(1, len(tasks) // (jobs * 4))))
+        else:
+            results = [encode(t) for t in tasks]
+        games.update(results)
+        metrics.mark('encode')
+
+    manifest = {'settings': settings, 'games': {k: games[k] for k in sorted(games)}}
+    os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+    write_if_changed(manifest_path, json.dumps(manifest, indent=1, sort_keys=False) + '\n')
+    metrics.mark('write')
+    metrics.count('games', len(games))
+    metrics.count('encoded', len(tasks))
+    print(f'{len(games)} preview images: {len(tasks)} processed, {len(games) - len(tasks)} unchanged; '
+          f'{missing} games without one. Manifest: {manifest_path}')
+    metrics.finish()
+
+
+if __name__ == '__main__':
+    main()
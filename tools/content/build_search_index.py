@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Build a prebuilt inverted search index for the game catalog.
+
+Usage:
+  python3 tools/content/build_search_index.py --out dist/search-index.json
+  python3 tools/content/build_search_index.py --bench 10000
+
+title, tags, howToPlay and description of every shown game are tokenised
+(lowercase, split on non-word characters, stopwords dropped from the prose
+fields) into a sorted term list with one postings list per term. A query is
+then answered from the postings of its words instead of by scanning every
+game's text, so the cost follows the number of matches.
+
+Serialized layout (compact JSON, `v` is the format version):
+
+  docs     [[slug, title, platform bits (1 mobile, 2 desktop)], ...]
+  terms    sorted term list
+  postings one flat list per term: doc id deltas interleaved with weights,
+           [d0, w0, d1 - d0, w1, ...]
+  prefix   two-letter prefix -> [first, end) range in `terms`, so the
+           word being typed is expanded by scanning only its slice
+  tags     tag -> sorted doc ids, for exact tag filters
+
+Every word but the last must match a whole term; the last one matches as a
+prefix (a lone single letter only matches exactly). Results are ranked by
+summed field weight, then catalog order.
+--bench builds a synthetic catalog of N games and compares query latency
+against the brute-force substring scan js/app.js does today.
+"""
+import argparse
+import bisect
+import gzip
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.catalog import CATALOG_PATH, Catalog, load
+from common.metrics import Metrics, add_metrics_args
+
+FORMAT_VERSION = 1
+TOKEN_RE = re.compile(r'\w+')
+FIELD_WEIGHTS = (('title', 8), ('tags', 4), ('how_to_play', 1), ('description', 1))
+STOPWORDS = frozenset('''
+a an and are as at be but by can for from has have in into is it its of on or so
+that the their them then there these they this to up use was we when where which
+while will with you your
+'''.split())
+PLATFORM_BITS = {'mobile': 1, 'desktop': 2}
+PREFIX_LEN = 2
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+def game_terms(g):
+    """term -> summed field weight for one game."""
+    weights = {}
+    for attr, weight in FIELD_WEIGHTS:
+        value = getattr(g, attr)
+        if attr == 'tags':
+            tokens = [t for tag in (value or ()) for t in tokenize(tag)]
+        else:
+            tokens = tokenize(value)
+        prose = weight == 1
+        for tok in set(tokens):
+            if prose and (tok in STOPWORDS or len(tok) < 2):
+                continue
+            weights[tok] = weights.get(tok, 0) + weight
+    return weights
+
+
+def build_index(catalog):
+    games = catalog.select(show=True)
+    docs = []
+    inverted = {}
+    tags = {}
+    for doc_id, g in enumerate(games):
+        bits = 0
+        for p in g.avalid or ():
+            bits |= PLATFORM_BITS.get(p, 0)
+        docs.append([g.slug, g.title, bits])
+        for term, weight in game_terms(g).items():
+            inverted.setdefault(term, []).append((doc_id, weight))
+        for tag in g.tags or ():
+            tags.setdefault(tag.strip().lower(), []).append(doc_id)
+
+    terms = sorted(inverted)
+    postings = []
+    prefix = {}
+    for i, term in enumerate(terms):
+        flat = []
+        prev = 0
+        for doc_id, weight in inverted[term]:
+            flat += [doc_id - prev, weight]
+            prev = doc_id
+        postings.append(flat)
+        key = term[:PREFIX_LEN]
+        if key in prefix:
+            prefix[key][1] = i + 1
+        else:
+            prefix[key] = [i, i + 1]
+    return {'v': FORMAT_VERSION, 'docs': docs, 'terms': terms, 'postings': postings,
+            'prefix': prefix, 'tags': tags}
+
+
+def serialize(index):
+    return json.dumps(index, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class SearchIndex:
+    """Query side of the index, the same algorithm the front end would run."""
+
+    def __init__(self, index):
+        self.docs = index['docs']
+        self.terms = index['terms']
+        self.postings = index['postings']
+        self.prefix = index['prefix']
+        self.tags = index['tags']
+        self._term_ids = {t: i for i, t in enumerate(self.terms)}
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls(json.loads(f.read()))
+
+    def _decode(self, term_id, scores):
+        doc_id = 0
+        flat = self.postings[term_id]
+        for i in range(0, len(flat), 2):
+            doc_id += flat[i]
+            scores[doc_id] = scores.get(doc_id, 0) + flat[i + 1]
+
+    def _prefix_terms(self, word, narrowed=False):
+        if len(word) < PREFIX_LEN:
+            if not narrowed:
+                # on its own a single letter would expand to most of the vocabulary
+                return [self._term_ids[word]] if word in self._term_ids else []
+            lo = bisect.bisect_left(self.terms, word)
+            return range(lo, bisect.bisect_left(self.terms, word + '\uffff', lo))
+        span = self.prefix.get(word[:PREFIX_LEN])
+        if not span:
+            return []
+        lo = bisect.bisect_left(self.terms, word, span[0], span[1])
+        hi = bisect.bisect_left(self.terms, word + '\uffff', lo, span[1])
+        return range(lo, hi)
+
+    def search(self, query, platform=None, tag=None, limit=None):
+        """[(slug, title, score)] best first."""
+        words = tokenize(query)
+        if not words:
+            return []
+        result = None
+        for n, word in enumerate(words):
+            scores = {}
+            if n == len(words) - 1:
+                for term_id in self._prefix_terms(word, narrowed=n > 0):
+                    self._decode(term_id, scores)
+            elif word in self._term_ids:
+                self._decode(self._term_ids[word], scores)
+            if result is None:
+                result = scores
+            else:
+                result = {d: s + scores[d] for d, s in result.items() if d in scores}
+            if not result:
+                return []
+        if platform:
+            bit = PLATFORM_BITS[platform]
+            result = {d: s for d, s in result.items() if self.docs[d][2] & bit}
+        if tag:
+            allowed = set(self.tags.get(tag.lower(), ()))
+            result = {d: s for d, s in result.items() if d in allowed}
+        ranked = sorted(result.items(), key=lambda kv: (-kv[1], kv[0]))
+        if limit:
+            ranked = ranked[:limit]
+        return [(self.docs[d][0], self.docs[d][1], s) for d, s in ranked]
+
+
+def synthetic_catalog(n, seed=7):
+    rnd = random.Random(seed)
+    syllables = ['ka', 'zu', 'mi', 'ro', 'ta', 'ne', 'shi', 'po', 'ki', 'lu', 'ba', 'do', 'ri', 'go', 'ven', 'tor']
+    vocab = sorted({''.join(rnd.choice(syllables) for _ in range(rnd.randint(2, 4))) for _ in range(6000)})
+    tag_pool = ['puzzle', 'action', 'racing', 'idle', 'shooting', 'sports', 'strategy', 'arcade',
+                'adventure', 'multiplayer', 'skill', 'singleplayer', 'pixel', 'jump', 'ninja']
+    raw = []
+    for i in range(n):
+        title = ' '.join(rnd.choice(vocab).capitalize() for _ in range(rnd.randint(1, 3)))
+        prose = lambda k: ' '.join(rnd.choice(vocab) if rnd.random() < 0.6 else rnd.choice(sorted(STOPWORDS))
+                                   for _ in range(k))
+        raw.append({'title': title, 'link': f'https://x.poki2.online/g{i}/',
+                    'tags': rnd.sample(tag_pool, rnd.randint(1, 4)), 'show': True,
+                    'avalid': rnd.choice([['mobile', 'desktop'], ['desktop'], ['mobile']]),
+                    'description': prose(rnd.randint(20, 45)), 'howToPlay': prose(rnd.randint(8, 20))})
+    return Catalog(raw), raw, vocab
+
+
+def brute_force(raw, query):
+    # js/app.js showSearch(): substring match on title and tags for every game
+    q = query.lower()
+    return [g for g in raw if g['show'] and (q in g['title'].lower() or any(q in t.lower() for t in g['tags']))]
+
+
+def brute_force_text(raw, query):
+    # the same scan extended to description/howToPlay, what the index covers
+    q = query.lower()
+    return [g for g in raw if g['show'] and (q in g['title'].lower() or any(q in t.lower() for t in g['tags'])
+                                             or q in g['description'].lower() or q in g['howToPlay'].lower())]
+
+
+def _latency(fn, queries):
+    times = []
+    for q in queries:
+        t0 = time.perf_counter()
+        fn(q)
+        times.append((time.perf_counter() - t0) * 1000)
+    times.sort()
+    return statistics.median(times), times[int(len(times) * 0.95) - 1]
+
+
+def bench(n):
+    t0 = time.perf_counter()
+    catalog, raw, vocab = synthetic_catalog(n)
+    t1 = time.perf_counter()
+    index = build_index(catalog)
+    data = serialize(index)
+    t2 = time.perf_counter()
+    search = SearchIndex(json.loads(data))
+    rnd = random.Random(11)
+    # prefixes being typed, whole words, and a word plus a partial second word
+    queries = ([rnd.choice(vocab)[:rnd.randint(2, 5)] for _ in range(100)] +
+               [rnd.choice(vocab) for _ in range(100)] +
+               [f'{rnd.choice(vocab)} {rnd.choice(vocab)[:3]}' for _ in range(100)])
+    print(f'synthetic catalog: {n} games generated in {t1 - t0:.2f}s')
+    print(f'index: {len(index["terms"])} terms, {len(data)} bytes ({len(gzip.compress(data, 9))} gzip), '
+          f'built+serialized in {(t2 - t1) * 1000:.0f} ms')
+    print(f"\n{'query path':36} {'p50 ms':>8} {'p95 ms':>8}")
+    for label, fn in (('index (prefix on last word)', search.search),
+                      ('brute force title+tags (app.js)', lambda q: brute_force(raw, q)),
+                      ('brute force all text fields', lambda q: brute_force_text(raw, q))):
+        p50, p95 = _latency(fn, queries)
+        print(f'{label:36} {p50:8.3f} {p95:8.3f}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--games', default=CATALOG_PATH, help='Catalog to index (default: repo games.json)')
+    parser.add_argument('--out', default='dist/search-index.json', help='Where to write the index')
+    parser.add_argument('--query', help='Run one query against the built index and print the hits')
+    parser.add_argument('--bench', type=int, metavar='N',
+                        help='Benchmark against a synthetic N-game catalog instead of building')
+    add_metrics_args(parser)
+    args = parser.parse_args()
+
+    metrics = Metrics.from_args('build_search_index', args)
+    if args.bench:
+        with metrics.phase('bench'):
+            bench(args.bench)
+        metrics.finish()
+        return
+
+    t0 = time.perf_counter()
+    with metrics.phase('load'):
+        catalog = load(args.games)
+    with metrics.phase('index'):
+        index = build_index(catalog)
+    with metrics.phase('serialize'):
+        data = serialize(index)
+    with metrics.phase('write'):
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, 'wb') as f:
+            f.write(data)
+    elapsed = time.perf_counter() - t0
+    metrics.count('games', len(index['docs']))
+    metrics.count('terms', len(index['terms']))
+    metrics.count('bytes_written', len(data))
+    print(f'Indexed {len(index["docs"])} games, {len(index["terms"])} terms -> {args.out}: '
+          f'{len(data)} bytes ({len(gzip.compress(data, 9))} gzip) in {elapsed * 1000:.0f} ms')
+    if args.query:
+        with metrics.phase('query'):
+            hits = SearchIndex(index).search(args.query, limit=20)
+        for slug, title, score in hits:
+            print(f'{score:4d}  {slug:28} {title}')
+    metrics.finish()
+
+
+if __name__ == '__main__':
+    main()
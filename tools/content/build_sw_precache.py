@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Pick the service worker's precache set from dist/ and stamp it into sw.js.
+
+Usage:
+  python3 tools/content/build_sw_precache.py --dist dist [--config tools/sw-precache.json]
+
+The config lists route groups in priority order, each a set of fnmatch
+patterns over paths in dist/, plus exclusions and a size budget:
+
+  {"budget_bytes": 1500000, "max_entry_bytes": 400000,
+   "exclude": ["*.map", ...],
+   "routes": [{"name": "shell", "required": true, "match": ["index.html", ...]},
+              {"name": "icons", "match": ["assets/icon/*"]}]}
+
+Required groups always go in (a warning is printed if that alone breaks
+the budget). The other groups fill the remaining budget in order; a file
+that does not fit, or is bigger than max_entry_bytes, is skipped and
+listed. Sizes are uncompressed, which is what Cache Storage holds. Copies
+made by hash-assets (the values of rev-manifest.json) are left out, as
+pages reference the plain names.
+
+Every entry gets a revision (SHA-256 prefix of its content) and the set a
+version derived from all of them. The worker's runtime cache is named
+poki2-<runtime version>, a hash over every static file its cache-first
+branch can serve (STATIC_RE, mirroring STATIC_EXTS in sw.js), precached or
+not, so files left out of the precache are purged when their content
+changes instead of being served stale for good. HTML files are listed under the URL Pages
+serves them at (`/`, `/offline`), so install never caches a redirect.
+Written:
+  <dist>/precache-manifest.json   version, runtime_version, entries (url,
+                                  file, revision, bytes) and what was skipped
+  <dist>/sw.js                    the --template with CACHE_NAME,
+                                  PRECACHE_VERSION and PRECACHE filled in
+The worker stores each entry under url?__rev=<revision>, so after a deploy
+clients fetch only the entries whose content changed.
+"""
+import argparse
+import fnmatch
+import hashlib
+import json
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.incremental import sha256_file, write_if_changed
+from common.metrics import Metrics, add_metrics_args
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_CONFIG = os.path.join(REPO_ROOT, 'tools', 'sw-precache.json')
+MANIFEST = 'precache-manifest.json'
+REVISION_LEN = 12
+VERSION_RE = re.compile(r"const PRECACHE_VERSION = '[^']*';")
+CACHE_NAME_RE = re.compile(r"const CACHE_NAME = '[^']*';")
+# mirrors STATIC_EXTS and the /assets/ check in sw.js's cache-first branch
+STATIC_RE = re.compile(r'\.(css|js|png|webp|ico|svg|woff2?|ttf|eot|otf|gif|jpg|jpeg)$', re.I)
+LIST_RE = re.compile(r'const PRECACHE = \[[\s\S]*?\];')
+
+
+def url_for(rel):
+    """URL Pages serves rel at (see common/pages.py): index.html -> dir/, x.html -> x."""
+    if rel == 'index.html' or rel.endswith('/index.html'):
+        return '/' + rel[:-len('index.html')]
+    if rel.endswith('.html'):
+        return '/' + rel[:-len('.html')]
+    return '/' + rel
+
+
+def list_files(dist, exclude):
+    skip = set()
+    rev_path = os.path.join(dist, 'rev-manifest.json')
+    if os.path.exists(rev_path):
+        with open(rev_path, 'r', encoding='utf-8') as f:
+            skip = {v.replace(os.sep, '/') for v in json.load(f).values()}
+    files = []
+    for dirpath, dirs, names in os.walk(dist):
+        dirs.sort()
+        for name in sorted(names):
+            rel = os.path.relpath(os.path.join(dirpath, name), dist).replace(os.sep, '/')
+            if rel in skip or any(fnmatch.fnmatch(rel, pat) for pat in exclude):
+                continue
+            files.append(rel)
+    return files
+
+
+def select(dist, config):
+    """(entries, skipped, used bytes) following the config's routes and budget."""
+    budget = config.get('budget_bytes')
+    max_entry = config.get('max_entry_bytes')
+    files = list_files(dist, config.get('exclude', []))
+    taken = set()
+    entries = []
+    skipped = []
+    used = 0
+    for route in config.get('routes', []):
+        required = route.get('required', False)
+        for pattern in route['match']:
+            for rel in files:
+                if rel in taken or not fnmatch.fnmatch(rel, pattern):
+                    continue
+                taken.add(rel)
+                size = os.path.getsize(os.path.join(dist, rel))
+                if not required:
+                    if max_entry is not None and size > max_entry:
+                        skipped.append({'file': rel, 'bytes': size, 'route': route['name'], 'reason': 'max_entry_bytes'})
+                        continue
+                    if budget is not None and used + size > budget:
+                        skipped.append({'file': rel, 'bytes': size, 'route': route['name'], 'reason': 'budget'})
+                        continue
+                used += size
+                entries.append({'url': url_for(rel), 'file': rel, 'route': route['name'], 'bytes': size,
+                                'revision': sha256_file(os.path.join(dist, rel))[:REVISION_LEN]})
+            if required and not any(fnmatch.fnmatch(rel, pattern) for rel in files):
+                print(f'warning: required pattern {pattern!r} ({route["name"]}) matches nothing in {dist}')
+    return entries, skipped, used
+
+
+def version_of(entries):
+    h = hashlib.sha256()
+    for e in sorted(entries, key=lambda e: e['url']):
+        h.update(f"{e['url']} {e['revision']}\n".encode('utf-8'))
+    return h.hexdigest()[:REVISION_LEN]
+
+
+def runtime_version(dist, exclude, entries):
+    """Hash over every static file the worker caches at runtime, precached or not."""
+    known = {e['file']: e['revision'] for e in entries}
+    h = hashlib.sha256()
+    for rel in list_files(dist, exclude):
+        if STATIC_RE.search(rel) or rel.startswith('assets/') or '/assets/' in rel:
+            rev = known.get(rel) or sha256_file(os.path.join(dist, rel))[:REVISION_LEN]
+            h.update(f'{rel} {rev}\n'.encode('utf-8'))
+    return h.hexdigest()[:REVISION_LEN]
+
+
+def stamp(template, version, entries, runtime=None):
+    pairs = ', '.join(f"['{e['url']}', '{e['revision']}']" for e in entries)
+    if not VERSION_RE.search(template) or not LIST_RE.search(template) or not CACHE_NAME_RE.search(template):
+        raise ValueError('template has no CACHE_NAME / PRECACHE_VERSION / PRECACHE declarations')
+    out = CACHE_NAME_RE.sub(lambda m: f"const CACHE_NAME = 'poki2-{runtime or version}';", template, count=1)
+    out = VERSION_RE.sub(lambda m: f"const PRECACHE_VERSION = '{version}';", out, count=1)
+    return LIST_RE.sub(lambda m: f'const PRECACHE = [{pairs}];', out, count=1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dist', default='dist', help='Built site folder')
+    parser.add_argument('--config', default=DEFAULT_CONFIG, help='Routes and budget (JSON)')
+    parser.add_argument('--template', default=os.path.join(REPO_ROOT, 'sw.js'), help='Service worker template')
+    parser.add_argument('--out', help='Where to write the stamped worker (default: <dist>/sw.js)')
+    add_metrics_args(parser)
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.dist):
+        print('dist not found at', args.dist, '- run the build first')
+        sys.exit(1)
+    with open(args.config, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    metrics = Metrics.from_args('build_sw_precache', args)
+    with metrics.phase('select'):
+        entries, skipped, used = select(args.dist, config)
+    metrics.count('entries', len(entries))
+    metrics.count('bytes', used)
+    version = version_of(entries)
+    with metrics.phase('runtime'):
+        runtime = runtime_version(args.dist, config.get('exclude', []), entries)
+    budget = config.get('budget_bytes')
+
+    manifest = {'version': version, 'runtime_version': runtime, 'bytes': used, 'budget_bytes': budget,
+                'entries': entries, 'skipped': skipped}
+    with metrics.phase('write'):
+        write_if_changed(os.path.join(args.dist, MANIFEST), json.dumps(manifest, indent=1) + '\n')
+        with open(args.template, 'r', encoding='utf-8') as f:
+            template = f.read()
+        out = args.out or os.path.join(args.dist, 'sw.js')
+        write_if_changed(out, stamp(template, version, entries, runtime))
+
+    print(f'Precache {version} (runtime cache poki2-{runtime}): {len(entries)} entries, {used} bytes'
+          + (f' of {budget} budget' if budget is not None else '') + f' -> {out}')
+    if budget is not None and used > budget:
+        print(f'warning: required routes alone exceed the budget by {used - budget} bytes')
+    for s in skipped:
+        print(f"  skipped {s['file']} ({s['bytes']} bytes, {s['route']}): {s['reason']}")
+    metrics.finish()
+
+
+if __name__ == '__main__':
+    main()
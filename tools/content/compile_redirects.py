@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Check `_redirects` (plus convert_sitemap's redirect map) and compile it to a trie.
+
+Usage:
+  python3 tools/content/compile_redirects.py [--map redirects-old-query.txt] [--out dist/redirects.json]
+  python3 tools/content/compile_redirects.py --write _redirects      # drop dead rules, collapse chains
+  python3 tools/content/compile_redirects.py --match /games/2048 --match /play/x
+  python3 tools/content/compile_redirects.py --bench
+
+Reports, with line numbers:
+  duplicate  the same source again with the same target (never reached)
+  conflict   the same source again with a different target (never reached)
+  shadowed   every path the rule matches is taken by an earlier rule
+  chain      a redirect whose target is redirected again; each hop costs the
+             visitor a round trip, so it is resolved to the final location
+  loop       a redirect that comes back to itself
+and problems Cloudflare would reject (bad lines, rule/line limits).
+
+The redirect map (`old -> new` lines) is resolved through the rules too, so
+query-style URLs that the Worker sends to /games/<slug>/ end up pointing
+straight at /game/<c>/<slug>/.
+
+--out writes the rules as a segment trie (see common/redirects.py) with
+chains already collapsed, plus a "query" table for the map, for the Worker
+to look up in O(path length). --write rewrites the rules file in place of
+the input, keeping comments and order. --strict exits non-zero on any
+finding.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.incremental import write_if_changed
+from common.metrics import Metrics, add_metrics_args
+from common.redirects import RedirectTrie, analyze, follow, load, match_linear, parse_redirect_map, probes, site_path
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_DOMAINS = ('poki2.online', 'play.poki2.online')
+
+
+def rewrite(path, rules, report):
+    """The rules file with dead rules removed and collapsed chains pointing at their final target."""
+    by_line = {r.line: r for r in rules}
+    out = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for lineno, raw in enumerate(f.read().splitlines(), 1):
+            rule = by_line.get(lineno)
+            if rule is not None and rule.index in report['dead']:
+                continue
+            if rule is not None and rule.index in report['collapsed']:
+                # keep the line's spacing: [source, ws, target, ...], after an indent if any
+                fields = re.split(r'(\s+)', raw)
+                fields[4 if fields[0] == '' else 2] = report['collapsed'][rule.index]
+                raw = ''.join(fields)
+            out.append(raw)
+    return '\n'.join(out) + '\n'
+
+
+def resolve_map(entries, trie, domains):
+    """[(line, old, new, final, hops)] plus conflicting duplicates [(line, old, first line)]."""
+    resolved = []
+    seen = {}
+    conflicts = []
+    for lineno, old, new in entries:
+        if old in seen:
+            if seen[old][1] != new:
+                conflicts.append((lineno, old, seen[old][0]))
+            continue
+        seen[old] = (lineno, new)
+        final, hops, _ = follow(trie, new, domains)
+        resolved.append((lineno, old, new, final, hops))
+    return resolved, conflicts
+
+
+def bench(rules, trie, rounds=20):
+    rnd = random.Random(3)
+    paths = [p for r in rules for p in probes(r)]
+    paths += [f'/nope/{rnd.randint(0, 999)}/x' for _ in range(len(paths) // 4)]
+    for label, fn in (('linear scan', lambda p: match_linear(rules, p)), ('trie', trie.lookup)):
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            for p in paths:
+                fn(p)
+        per = (time.perf_counter() - t0) / (rounds * len(paths)) * 1e6
+        print(f'{label:12} {per:8.2f} us/lookup over {len(paths)} paths x {rounds}')
+    mismatched = [p for p in paths if match_linear(rules, p) != trie.lookup(p)]
+    print(f'trie and linear scan disagree on {len(mismatched)} paths' + (f': {mismatched[:5]}' if mismatched else ''))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--redirects', default=os.path.join(REPO_ROOT, '_redirects'), help='Rules file')
+    parser.add_argument('--map', help='Redirect map of "old -> new" lines (convert_sitemap.py output)')
+    parser.add_argument('--domain', action='append',
+                        help=f'Host whose URLs count as this site (repeatable; default: {", ".join(DEFAULT_DOMAINS)})')
+    parser.add_argument('--out', help='Write the compiled trie JSON here (e.g., dist/redirects.json)')
+    parser.add_argument('--write', metavar='PATH', help='Write the cleaned rules file here (may be the input)')
+    parser.add_argument('--map-out', help='Write the redirect map with every entry resolved to its final URL')
+    parser.add_argument('--match', action='append', default=[], metavar='PATH', help='Look up a path and print the hop chain')
+    parser.add_argument('--strict', action='store_true', help='Exit 1 if anything is reported')
+    parser.add_argument('--bench', action='store_true', help='Time trie lookups against the linear scan')
+    add_metrics_args(parser)
+    args = parser.parse_args()
+    domains = frozenset(args.domain or DEFAULT_DOMAINS)
+
+    metrics = Metrics.from_args('compile_redirects', args)
+    with metrics.phase('parse'):
+        rules, problems = load(args.redirects)
+    with metrics.phase('analyze'):
+        report = analyze(rules, domains)
+    with metrics.phase('compile'):
+        live = [r for r in rules if r.index not in report['dead']]
+        trie = RedirectTrie(live)
+    metrics.count('rules', len(rules))
+
+    for lineno, msg in problems:
+        print(f'{args.redirects}:{lineno}: {msg}' if lineno else f'{args.redirects}: {msg}')
+    for kind in ('duplicates', 'conflicts'):
+        for rule, first in report[kind]:
+            print(f'{args.redirects}:{rule.line}: {kind[:-1]} of line {first.line}: {rule.source}')
+    for rule, by in report['shadowed']:
+        print(f'{args.redirects}:{rule.line}: shadowed by line {by.line} ({by.source}): {rule.source}')
+    for rule, final, hops in report['chains']:
+        path = ' -> '.join([rule.source, rule.target] + [h.target for h in hops[:-1]] + [final])
+        note = '' if rule.index in report['collapsed'] else ' (mixes permanent and temporary, not collapsed)'
+        print(f'{args.redirects}:{rule.line}: {len(hops) + 1}-hop chain {path}{note}')
+    for rule, hops in report['loops']:
+        print(f'{args.redirects}:{rule.line}: redirect loop via lines {", ".join(str(h.line) for h in hops)}')
+
+    query = {}
+    findings = len(problems) + len(report['dead']) + len(report['chains']) + len(report['loops'])
+    resolved = []
+    if args.map:
+        with metrics.phase('map'), open(args.map, 'r', encoding='utf-8') as f:
+            resolved, map_conflicts = resolve_map(parse_redirect_map(f.read()), trie, domains)
+        metrics.count('map_entries', len(resolved))
+        for lineno, old, first in map_conflicts:
+            print(f'{args.map}:{lineno}: conflicting duplicate of line {first}: {old}')
+        chained = 0
+        for lineno, old, new, final, hops in resolved:
+            if hops:
+                chained += 1
+                print(f'{args.map}:{lineno}: {len(hops) + 1}-hop chain {old} -> {new} -> {final}')
+            key = site_path(old, domains)
+            if key is not None:
+                query[key] = final
+        findings += len(map_conflicts) + chained
+        if args.map_out:
+            write_if_changed(args.map_out, ''.join(f'{old} -> {final}\n' for _, old, _, final, _ in resolved))
+
+    print(f'{len(rules)} rules ({sum(r.dynamic for r in rules)} dynamic): {len(report["dead"])} dead, '
+          f'{len(report["chains"])} chains ({len(report["collapsed"])} collapsible), {len(report["loops"])} loops'
+          + (f'; map: {len(resolved)} entries' if args.map else ''))
+
+    if args.out:
+        with metrics.phase('write'):
+            compiled = trie.to_json(report['collapsed'])
+            if query:
+                compiled['query'] = dict(sorted(query.items()))
+            write_if_changed(args.out, json.dumps(compiled, ensure_ascii=False, separators=(',', ':')))
+        print(f'Wrote {args.out}')
+    if args.write:
+        if write_if_changed(args.write, rewrite(args.redirects, rules, report)):
+            print(f'Wrote {args.write}')
+        else:
+            print(f'{args.write} unchanged')
+    for path in args.match:
+        final, hops, loop = follow(trie, path, domains)
+        hit = trie.lookup(path)
+        if hit is None:
+            print(f'{path}: no rule')
+        elif not hops:
+            print(f'{path}: line {hit[0].line} {hit[0].status} -> {hit[1]}')
+        else:
+            print(f'{path}: ' + ' -> '.join(f'{h.status} (line {h.line})' for h in hops) + f' -> {final}'
+                  + (' LOOP' if loop else ''))
+    if args.bench:
+        with metrics.phase('bench'):
+            bench(live, trie)
+    metrics.count('findings', findings)
+    metrics.finish()
+    if args.strict and findings:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,19 +3,40 @@
 Generate sample SEO landing pages, sitemap.xml and robots.txt for a games folder.
 
 Usage:
-  python3 tools/generate_seo.py --input shards/c --domain https://c.poki2.online --output dist_seo_c
+  python3 tools/generate_seo.py --input shards/c --domain https://c.poki2.online --output dist_seo_c [--jobs 0]
 
 This scans immediate subdirectories for `index.html` and creates a small
 landing HTML (with meta, OG, JSON-LD) into the output folder, plus a
 sitemap.xml and robots.txt referencing the sitemap.
+
+With --jobs, extraction and rendering run in a process pool; a per-phase
+timing summary (scan, extract split into read/regex/image, render, write)
+is printed at the end, and --metrics-json / --profile record it (see
+common/metrics.py).
+--precompress also writes .gz/.br siblings for new or changed output.
 """
 import argparse
+import json
 import os
 import re
+import shutil
 import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date
 from urllib.parse import urljoin
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.images import find_preview_image
+from common.scan_cache import ScanCache, add_cache_args, namespace, source_digest
+from common.incremental import ChangeManifest, default_manifest_path, write_if_changed
+from common.metrics import Metrics, add_metrics_args
+from common.precompress import missing_encodings, precompress_dir, report
+from common.sitemap import SitemapEntry, SitemapWriter, iter_entries, remove_stale_shards
+
+DESC_RE = re.compile(r'<meta\s+name=["\']description["\']\s+content=["\']([^"\']+)["\']', re.IGNORECASE)
+TITLE_RE = re.compile(r'<title>(.*?)</title>', re.IGNORECASE | re.DOTALL)
+
 
 def read_file(path):
     try:
@@ -30,32 +51,62 @@ def slugify(name):
 
 
 def extract_title(html, fallback):
-    m = re.search(r'<title>(.*?)</title>', html, re.IGNORECASE | re.DOTALL)
+    m = TITLE_RE.search(html)
     if m:
         return m.group(1).strip()
     return fallback
 
 
-def find_preview_image(dirpath):
-    # common locations
-    candidates = ['thumbnail.jpg', 'thumbnail.png', 'preview.jpg', 'preview.png', 'images/thumbnail.jpg']
-    for c in candidates:
-        p = os.path.join(dirpath, c)
-        if os.path.exists(p):
-            return c
-    # try any image in images/
-    imgs = []
-    imgdir = os.path.join(dirpath, 'images')
-    if os.path.isdir(imgdir):
-        for f in os.listdir(imgdir):
-            if f.lower().endswith(('.png', '.jpg', '.jpeg', '.webp')):
-                imgs.append(os.path.join('images', f))
-    if imgs:
-        return imgs[0]
-    return None
-
-
-def make_landing(domain, rel_url, title, description, image):
+def extract_description(html):
+    m = DESC_RE.search(html)
+    if m:
+        return m.group(1).strip()
+    return ''
+
+
+def page_facts(index, cache):
+    """Title and meta description of a game page, served from the scan cache
+    when index.html is unchanged. A missing <title> is stored as None."""
+    facts = cache.get(index)
+    if facts is None:
+        html = read_file(index)
+        facts = {'title': extract_title(html, None), 'description': extract_description(html)}
+        cache.put(index, facts)
+    return facts
+
+
+# The page skeleton is assembled once at import time; make_landing only
+# substitutes per-game values into it.
+LANDING_TEMPLATE = """<!doctype html>
+<html lang="en">
+<head>
+  <meta charset="utf-8">
+  <meta name="viewport" content="width=device-width,initial-scale=1">
+  <title>{title}</title>
+  <meta name="description" content="{desc}">
+  <link rel="canonical" href="{full_url}">
+  <meta property="og:type" content="game">
+  <meta property="og:title" content="{title}">
+  <meta property="og:description" content="{desc}">
+  <meta property="og:url" content="{full_url}">
+  {og_image}
+  <meta name="twitter:card" content="summary_large_image">
+  <script type="application/ld+json">{ld_json}</script>
+</head>
+<body>
+  <h1>{title}</h1>
+  <p>{desc}</p>
+  <p><a href="{full_url}" target="_blank" rel="noopener">Open game page</a></p>
+</body>
+</html>
+"""
+OG_IMAGE_TEMPLATE = '<meta property="og:image" content="{}">'
+OG_IMAGE_SIZE_TEMPLATE = ('\n  <meta property="og:image:width" content="{}">'
+                          '\n  <meta property="og:image:height" content="{}">')
+RENDER_BATCH = 64
+
+
+def make_landing(domain, rel_url, title, description, image, image_size=None):
     full_url = urljoin(domain.rstrip('/') + '/', rel_url.lstrip('/'))
     image_url = urljoin(full_url, image) if image else ''
     desc = description or f"Play {title} free on {domain}"
@@ -70,92 +121,209 @@ def make_landing(domain, rel_url, title, description, image):
         "applicationCategory": "Game"
     }
     ld_json = str(ld).replace("'", '"')
+    og_image = OG_IMAGE_TEMPLATE.format(image_url) if image_url else ''
+    if image_url and image_size:
+        og_image += OG_IMAGE_SIZE_TEMPLATE.format(*image_size)
+    return LANDING_TEMPLATE.format(title=title, desc=desc, full_url=full_url, og_image=og_image, ld_json=ld_json)
 
-    head = f"""<head>
-  <meta charset="utf-8">
-  <meta name="viewport" content="width=device-width,initial-scale=1">
-  <title>{title}</title>
-  <meta name="description" content="{desc}">
-  <link rel="canonical" href="{full_url}">
-  <meta property="og:type" content="game">
-  <meta property="og:title" content="{title}">
-  <meta property="og:description" content="{desc}">
-  <meta property="og:url" content="{full_url}">
-  {('<meta property="og:image" content="%s">' % image_url) if image_url else ''}
-  <meta name="twitter:card" content="summary_large_image">
-  <script type="application/ld+json">{ld_json}</script>
-</head>"""
 
-    body = f"""<body>
-  <h1>{title}</h1>
-  <p>{desc}</p>
-  <p><a href="{full_url}" target="_blank" rel="noopener">Open game page</a></p>
-</body>"""
+def extract_page(task):
+    """Worker: facts for one game dir (None when served from the cache) plus
+    its preview image, which depends on the directory and is never cached;
+    skipped when the image manifest already names it. Also returns the
+    worker's timings for the parent's Metrics."""
+    index, path, need_facts, need_image = task
+    metrics = Metrics()
+    facts = None
+    image = None
+    if need_facts:
+        with metrics.phase('extract.read'):
+            html = read_file(index)
+        with metrics.phase('extract.regex'):
+            facts = {'title': extract_title(html, None), 'description': extract_description(html)}
+        metrics.count('files_read')
+        metrics.count('chars_read', len(html))
+        metrics.count('regex_matches', (facts['title'] is not None) + bool(facts['description']))
+    if need_image:
+        with metrics.phase('extract.image'):
+            image = find_preview_image(path)
+    return facts, image, metrics.snapshot()
+
 
-    return f"<!doctype html>\n<html lang=\"en\">\n{head}\n{body}\n</html>\n"
+def render_batch(batch):
+    """Worker: render a batch of (name, title, desc, image, size) into (name, html)."""
+    domain, items = batch
+    return [(name, make_landing(domain, f"/{name}/", title, desc, image, size))
+            for name, title, desc, image, size in items]
 
 
-def main():
+def load_image_manifest(path):
+    """name -> (image path relative to the game, (width, height) or None)
+    from build_preview_images.py's manifest, preferring the OG crop."""
+    with open(path, 'r', encoding='utf-8') as f:
+        games = json.load(f).get('games', {})
+    images = {}
+    for name, entry in games.items():
+        if entry.get('og'):
+            images[name] = (entry['og']['file'], (entry['og']['width'], entry['og']['height']))
+        else:
+            images[name] = (entry['source'], tuple(entry['size']) if entry.get('size') else None)
+    return images
+
+
+def read_lastmods(out, sitemap_name):
+    """loc -> lastmod from the sitemap (or sitemapindex + shards) already in out."""
+    path = os.path.join(out, sitemap_name)
+    lastmods = {}
+    if not os.path.exists(path):
+        return lastmods
+    try:
+        for entry in iter_entries(path):
+            if entry.kind == 'sitemap':
+                shard = os.path.join(out, entry.loc.rsplit('/', 1)[-1])
+                if os.path.exists(shard):
+                    lastmods.update((e.loc, e.lastmod) for e in iter_entries(shard))
+            else:
+                lastmods[entry.loc] = entry.lastmod
+    except Exception as e:
+        print('could not read previous sitemap, using today for every lastmod:', e)
+    return lastmods
+
+
+def main(argv=None):
+    """Run with argv (default sys.argv); returns a stats dict for tools/content/seo_batch.py."""
     parser = argparse.ArgumentParser()
     parser.add_argument('--input', required=True, help='Input folder (e.g., shards/c)')
     parser.add_argument('--domain', required=True, help='Base domain (e.g., https://c.poki2.online)')
     parser.add_argument('--output', required=True, help='Output folder to write generated files')
-    args = parser.parse_args()
+    parser.add_argument('--gzip-sitemap', action='store_true', help='Write sitemap.xml.gz (and gzipped shards)')
+    parser.add_argument('--changed-manifest', help='Where to list changed output URLs '
+                        '(default: <output>.changed.txt, one URL per line for purge-cloudflare.sh --file-list)')
+    parser.add_argument('--image-manifest', help='preview-images.json from build_preview_images.py: og:image '
+                        'uses its OG crop (or the source) with og:image:width/height')
+    parser.add_argument('--precompress', action='store_true',
+                        help='Write .gz/.br siblings for changed output files (see tools/content/precompress.py)')
+    parser.add_argument('--jobs', type=int, default=1, help='Extract and render in N worker processes (0 = one per CPU)')
+    add_cache_args(parser)
+    add_metrics_args(parser)
+    args = parser.parse_args(argv)
+    if args.jobs <= 0:
+        args.jobs = os.cpu_count() or 1
+    if args.precompress and missing_encodings():
+        parser.error('--precompress cannot write ' + ', '.join(missing_encodings()))
 
     inp = args.input
     domain = args.domain.rstrip('/')
     out = args.output
     os.makedirs(out, exist_ok=True)
 
-    urls = []
+    metrics = Metrics.from_args('generate_seo', args, argv)
+    cache = ScanCache.from_args(namespace('generate_seo', source_digest(__file__)), args)
+    pool = ProcessPoolExecutor(max_workers=args.jobs) if args.jobs > 1 else None
+
+    def run(fn, tasks):
+        if pool is None:
+            return map(fn, tasks)
+        return pool.map(fn, tasks, chunksize=max(1, len(tasks) // (args.jobs * 8)))
 
+    # scan: game dirs that have an index.html
+    pages = []
     for name in sorted(os.listdir(inp)):
         path = os.path.join(inp, name)
-        if not os.path.isdir(path):
-            continue
         index = os.path.join(path, 'index.html')
-        if not os.path.exists(index):
-            continue
-        html = read_file(index)
-        title = extract_title(html, name)
-        desc = ''
-        m = re.search(r'<meta\s+name=["\']description["\']\s+content=["\']([^"\']+)["\']', html, re.IGNORECASE)
-        if m:
-            desc = m.group(1).strip()
-        image = find_preview_image(path)
-        rel_url = f"/{name}/"
-        landing = make_landing(domain, rel_url, title, desc, image)
-        out_dir = os.path.join(out, name)
-        os.makedirs(out_dir, exist_ok=True)
-        landing_path = os.path.join(out_dir, 'index.html')
-        with open(landing_path, 'w', encoding='utf-8') as f:
-            f.write(landing)
-        urls.append((rel_url, title))
-
-    # sitemap
-    sitemap_path = os.path.join(out, 'sitemap.xml')
+        if os.path.isdir(path) and os.path.exists(index):
+            pages.append((name, path, index))
+    metrics.mark('scan')
+
+    # extract: title/description (cached) and preview image
+    images = load_image_manifest(args.image_manifest) if args.image_manifest else {}
+    cached = [cache.get(index) for _, _, index in pages]
+    tasks = [(index, path, facts is None, name not in images)
+             for (name, path, index), facts in zip(pages, cached)]
+    items = []
+    for (name, _, index), facts, (fresh, image, timings) in zip(pages, cached, run(extract_page, tasks)):
+        metrics.merge(timings)
+        if facts is None:
+            facts = fresh
+            cache.put(index, facts)
+        title = facts['title'] if facts['title'] is not None else name
+        image, size = images.get(name, (image, None))
+        items.append((name, title, facts['description'], image, size))
+    metrics.count('cache_pruned', cache.prune())
+    cache.close()
+    metrics.mark('extract')
+
+    # render, then write each batch as it comes back; files whose content is
+    # unchanged are left alone so their caches stay valid
+    manifest = ChangeManifest(out, base_url=domain)
+    changed = set()
+    batches = [(domain, items[i:i + RENDER_BATCH]) for i in range(0, len(items), RENDER_BATCH)]
+    for rendered in run(render_batch, batches):
+        metrics.mark('render')
+        for name, landing in rendered:
+            landing_path = os.path.join(out, name, 'index.html')
+            if write_if_changed(landing_path, landing):
+                manifest.add(landing_path)
+                changed.add(name)
+        metrics.mark('write')
+    if pool:
+        pool.shutdown()
+    urls = [(name, f"/{name}/", title) for name, title, _, _, _ in items]
+
+    # sitemap (sharded with a sitemapindex once it outgrows the protocol limits);
+    # unchanged pages keep the lastmod they already had
     today = date.today().isoformat()
-    with open(sitemap_path, 'w', encoding='utf-8') as f:
-        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
-        f.write('<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
-        for rel, title in urls:
-            loc = domain + rel
-            f.write('  <url>\n')
-            f.write(f'    <loc>{loc}</loc>\n')
-            f.write(f'    <lastmod>{today}</lastmod>\n')
-            f.write('    <changefreq>monthly</changefreq>\n')
-            f.write('    <priority>0.7</priority>\n')
-            f.write('  </url>\n')
-        f.write('</urlset>\n')
+    sitemap_name = 'sitemap' + ('.xml.gz' if args.gzip_sitemap else '.xml')
+    prev_lastmod = read_lastmods(out, sitemap_name)
+    tmp = tempfile.mkdtemp(prefix='.sitemap-', dir=out)
+    try:
+        with SitemapWriter(tmp, base_url=domain, gzip_output=args.gzip_sitemap) as sm:
+            for name, rel, title in urls:
+                loc = domain + rel
+                lastmod = today if name in changed else (prev_lastmod.get(loc) or today)
+                sm.add(SitemapEntry(loc, lastmod=lastmod, changefreq='monthly', priority='0.7'))
+        published = []
+        for written in sm.files + ([sm.index] if sm.index else []):
+            dest = os.path.join(out, os.path.basename(written))
+            published.append(dest)
+            with open(written, 'rb') as f:
+                if write_if_changed(dest, f.read()):
+                    manifest.add(dest)
+        # shards from an earlier run that needed more of them
+        for path in remove_stale_shards(out, 'sitemap', sm.ext, published):
+            print('removed stale sitemap shard', path)
+    finally:
+        shutil.rmtree(tmp)
+    metrics.mark('sitemap')
 
     # robots.txt
     robots_path = os.path.join(out, 'robots.txt')
-    with open(robots_path, 'w', encoding='utf-8') as f:
-        f.write('User-agent: *\n')
-        f.write('Allow: /\n')
-        f.write(f'Sitemap: {domain}/sitemap.xml\n')
+    robots = f'User-agent: *\nAllow: /\nSitemap: {domain}/{sitemap_name}\n'
+    if write_if_changed(robots_path, robots):
+        manifest.add(robots_path)
+
+    manifest_path = args.changed_manifest or default_manifest_path(out)
+    manifest.write(manifest_path)
+    metrics.mark('write')
+
+    # .gz/.br siblings; only files that changed since the last run are encoded
+    stats = None
+    if args.precompress:
+        stats = precompress_dir(out, jobs=args.jobs)
+        metrics.mark('compress')
 
     print(f'Wrote {len(urls)} landing pages to {out} (sitemap+robots included)')
+    print(f'{len(changed)} pages changed, {len(manifest)} files rewritten; changed URLs listed in {manifest_path}')
+    if stats:
+        print(report(stats))
+    metrics.count('pages', len(urls))
+    metrics.count('changed', len(changed))
+    metrics.count('files_written', len(manifest))
+    metrics.count('bytes_written', manifest.bytes)
+    metrics.finish(cache_hits=cache.hits, cache_misses=cache.misses)
+    return {'pages': len(urls), 'changed': len(changed), 'files_written': len(manifest),
+            'bytes_written': manifest.bytes, 'sitemap': os.path.join(out, sitemap_name),
+            'phases': metrics.phases}
 
 
 if __name__ == '__main__':
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Write .gz/.br (and optionally .zst) siblings for the text files in a folder.
+
+Usage:
+  python3 tools/content/precompress.py dist_seo_c [--jobs 0] [--zstd] [--no-brotli]
+
+Python counterpart of scripts/precompress.cjs for the folders the Python
+tools write (generate_seo landing pages, sitemaps). Only new or changed
+files are re-encoded, and siblings that do not save at least 10% are not
+kept; see common/precompress.py. Prints the ratio and time per extension.
+.br is written with the brotli package or, failing that, node; if neither
+is installed the run fails unless --no-brotli says .br is not wanted.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.metrics import Metrics, add_metrics_args
+from common.precompress import MissingEncoder, missing_encodings, precompress_dir, report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('root', help='Folder to precompress')
+    parser.add_argument('--jobs', type=int, default=0, help='Worker processes (0 = one per CPU)')
+    parser.add_argument('--zstd', action='store_true', help='Also write .zst siblings')
+    parser.add_argument('--manifest', help='Skip-if-unchanged manifest (default: under tools/.cache)')
+    parser.add_argument('--force', action='store_true', help='Re-encode everything')
+    parser.add_argument('--no-brotli', action='store_true', help='Do not write .br siblings')
+    add_metrics_args(parser)
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.root):
+        print('folder not found:', args.root)
+        raise SystemExit(1)
+    for enc in missing_encodings(args.zstd, want_brotli=False):
+        print('skipping', enc)
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    metrics = Metrics.from_args('precompress', args)
+    try:
+        with metrics.phase('compress'):
+            stats = precompress_dir(args.root, jobs=jobs, want_zstd=args.zstd, manifest_path=args.manifest,
+                                    force=args.force, want_brotli=not args.no_brotli)
+    except MissingEncoder as e:
+        print('error:', e)
+        raise SystemExit(1)
+    # per-encoder time, summed over the worker processes
+    for row in stats['by_ext'].values():
+        metrics.count('bytes_read', row['bytes'])
+        for enc, seconds in row['seconds'].items():
+            metrics.add(f'compress.{enc}', seconds)
+    metrics.count('files', stats['files'])
+    metrics.count('encoded', stats['encoded'])
+    print(report(stats))
+    metrics.finish()
+
+
+if __name__ == '__main__':
+    main()
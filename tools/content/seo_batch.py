@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Run generate_seo + apply_seo for every letter shard on one worker pool.
+
+Usage:
+  python3 tools/content/seo_batch.py --map tools/seo-shards.json [--jobs 0] [--no-apply]
+      [--sitemap-index dist/sitemap-shards.xml] [--summary tools/.cache/seo-batch.json]
+
+The map is JSON, shard -> domain, or shard -> object to override paths:
+
+  {"c": "https://c.poki2.online",
+   "s": {"domain": "https://s.poki2.online", "input": "/data/shards/s", "target": "/data/shards/s"}}
+
+Defaults per shard: input <shards-root>/<shard>, output
+<output-root>/dist_seo_<shard>, target = input. Each shard is one task on a
+process pool of --jobs workers (0 = one per CPU): generate_seo into the
+output, then apply_seo from the output into the target (skipped with
+--no-apply). Both run in-process with their usual flags (--jobs 1 inside a
+worker, the pool already fills the CPUs); each shard's console output goes
+to <output>.log. Shards are queued largest first so a big shard does not
+start last.
+
+--sitemap-index writes one sitemapindex over every shard's sitemap (or over
+its shards when a shard's own sitemap is already an index), each with its
+newest lastmod. The JSON summary has pages, changed pages, files and bytes
+written, phase timings and wall time per shard, plus the totals;
+--metrics-json adds up the shards' generate_seo phases (see
+common/metrics.py).
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.incremental import write_if_changed
+from common.metrics import Metrics, add_metrics_args
+from common.precompress import missing_encodings
+from common.scan_cache import add_cache_args
+from common.sitemap import iter_entries, write_index
+
+import apply_seo
+import generate_seo
+
+
+def load_map(path, shards_root, output_root):
+    with open(path, 'r', encoding='utf-8') as f:
+        raw = json.load(f)
+    jobs = []
+    for shard, spec in sorted(raw.items()):
+        if isinstance(spec, str):
+            spec = {'domain': spec}
+        inp = spec.get('input') or os.path.join(shards_root, shard)
+        jobs.append({'shard': shard, 'domain': spec['domain'].rstrip('/'), 'input': inp,
+                     'output': spec.get('output') or os.path.join(output_root, f'dist_seo_{shard}'),
+                     'target': spec.get('target') or inp})
+    return jobs
+
+
+def shard_size(job):
+    try:
+        return sum(1 for e in os.scandir(job['input']) if e.is_dir())
+    except OSError:
+        return 0
+
+
+def run_shard(job, apply, extra):
+    """Worker: generate (and apply) one shard; returns its stats."""
+    t0 = time.perf_counter()
+    log = io.StringIO()
+    stats = {'shard': job['shard'], 'domain': job['domain'], 'ok': False}
+    try:
+        with contextlib.redirect_stdout(log):
+            gen = generate_seo.main(['--input', job['input'], '--domain', job['domain'],
+                                     '--output', job['output'], '--jobs', '1'] + extra)
+            stats['generate'] = {k: v for k, v in gen.items() if k not in ('sitemap', 'phases')}
+            stats['generate']['phases'] = {k: round(v, 3) for k, v in gen['phases'].items()}
+            stats['sitemap'] = gen['sitemap']
+            t1 = time.perf_counter()
+            stats['generate']['seconds'] = round(t1 - t0, 3)
+            if apply:
+                app = apply_seo.main(['--source', job['output'], '--target', job['target'],
+                                      '--domain', job['domain']])
+                if app is None:
+                    raise RuntimeError(f'apply_seo could not run on {job["target"]}')
+                app['seconds'] = round(time.perf_counter() - t1, 3)
+                stats['apply'] = app
+        stats['ok'] = True
+    except BaseException as e:  # SystemExit from argparse included
+        print(f'error: {e!r}', file=log)
+        stats['error'] = repr(e)
+    stats['seconds'] = round(time.perf_counter() - t0, 3)
+    with open(job['output'].rstrip('/\\') + '.log', 'w', encoding='utf-8') as f:
+        f.write(log.getvalue())
+    return stats
+
+
+def sitemap_refs(stats):
+    """(loc, newest lastmod) for a shard's sitemap, or one per child if it is an index."""
+    path = stats['sitemap']
+    name = os.path.basename(path)
+    newest = None
+    children = []
+    for entry in iter_entries(path):
+        if entry.kind == 'sitemap':
+            children.append((entry.loc, entry.lastmod))
+        elif entry.lastmod and (newest or '') < entry.lastmod:
+            newest = entry.lastmod
+    return children or [(f"{stats['domain']}/{name}", newest)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--map', required=True, help='JSON shard -> domain (or -> {domain, input, output, target})')
+    parser.add_argument('--shards-root', default='shards', help='Default parent of shard inputs (default: shards)')
+    parser.add_argument('--output-root', default='.', help='Default parent of dist_seo_<shard> outputs')
+    parser.add_argument('--jobs', type=int, default=0, help='Shards processed at once (0 = one per CPU)')
+    parser.add_argument('--only', action='append', help='Run just this shard (repeatable)')
+    parser.add_argument('--no-apply', action='store_true', help='Only generate; do not patch the targets')
+    parser.add_argument('--gzip-sitemap', action='store_true', help='Passed to generate_seo')
+    parser.add_argument('--precompress', action='store_true', help='Passed to generate_seo')
+    parser.add_argument('--sitemap-index', help='Write a sitemapindex over all shard sitemaps here')
+    parser.add_argument('--summary', help='Write the per-shard JSON summary here (default: print only)')
+    add_cache_args(parser)
+    add_metrics_args(parser)
+    args = parser.parse_args()
+    if args.precompress and missing_encodings():
+        parser.error('--precompress cannot write ' + ', '.join(missing_encodings()))
+    metrics = Metrics.from_args('seo_batch', args)
+    jobs_n = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+
+    jobs = load_map(args.map, args.shards_root, args.output_root)
+    if args.only:
+        jobs = [j for j in jobs if j['shard'] in args.only]
+    missing = [j['shard'] for j in jobs if not os.path.isdir(j['input'])]
+    if missing:
+        print('input folder missing for shard(s):', ', '.join(missing))
+        sys.exit(1)
+    extra = [flag for flag, on in (('--gzip-sitemap', args.gzip_sitemap), ('--precompress', args.precompress),
+                                   ('--no-cache', args.no_cache), ('--rebuild-cache', args.rebuild_cache)) if on]
+    jobs.sort(key=shard_size, reverse=True)
+
+    metrics.mark('setup')
+    t0 = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=min(jobs_n, len(jobs)) or 1) as pool:
+        futures = [pool.submit(run_shard, job, not args.no_apply, extra) for job in jobs]
+        for fut in as_completed(futures):
+            s = fut.result()
+            results.append(s)
+            if s['ok']:
+                gen = s['generate']
+                applied = f", {s['apply']['patched']} patched" if 'apply' in s else ''
+                print(f"{s['shard']:>4}: {gen['pages']} pages, {gen['changed']} changed{applied}, "
+                      f"{gen['bytes_written'] + s.get('apply', {}).get('bytes_written', 0)} bytes written "
+                      f"in {s['seconds']:.2f}s")
+            else:
+                print(f"{s['shard']:>4}: FAILED {s['error']} (see its .log)")
+    wall = time.perf_counter() - t0
+    metrics.mark('shards')
+    results.sort(key=lambda s: s['shard'])
+    ok = [s for s in results if s['ok']]
+    for s in ok:
+        for phase, seconds in s['generate']['phases'].items():
+            metrics.add(f'shards.generate.{phase}', seconds)
+        if 'apply' in s:
+            metrics.add('shards.apply', s['apply']['seconds'])
+
+    if args.sitemap_index and ok:
+        refs = [ref for s in ok for ref in sitemap_refs(s)]
+        fd, tmp = tempfile.mkstemp(suffix='.xml')
+        os.close(fd)
+        try:
+            write_index(tmp, refs)
+            with open(tmp, 'rb') as f:
+                data = f.read()
+        finally:
+            os.remove(tmp)
+        write_if_changed(args.sitemap_index, data)
+        metrics.mark('sitemap_index')
+        print(f'Sitemap index with {len(refs)} sitemaps -> {args.sitemap_index}')
+
+    totals = {'shards': len(results), 'failed': len(results) - len(ok),
+              'pages': sum(s['generate']['pages'] for s in ok),
+              'changed': sum(s['generate']['changed'] for s in ok),
+              'bytes_written': sum(s['generate']['bytes_written'] + s.get('apply', {}).get('bytes_written', 0)
+                                   for s in ok),
+              'shard_seconds': round(sum(s['seconds'] for s in results), 3),
+              'wall_seconds': round(wall, 3), 'workers': min(jobs_n, len(jobs))}
+    summary = {'totals': totals, 'shards': results}
+    if args.summary:
+        os.makedirs(os.path.dirname(os.path.abspath(args.summary)), exist_ok=True)
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=1)
+    print(f"{totals['shards']} shards, {totals['pages']} pages ({totals['changed']} changed), "
+          f"{totals['bytes_written']} bytes written; {totals['shard_seconds']:.2f}s of shard time in "
+          f"{totals['wall_seconds']:.2f}s wall on {totals['workers']} workers"
+          + (f"; summary in {args.summary}" if args.summary else ''))
+    for key in ('pages', 'changed', 'bytes_written', 'failed'):
+        metrics.count(key, totals[key])
+    metrics.finish()
+    if totals['failed']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
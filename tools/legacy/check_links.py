@@ -1,52 +1,184 @@
 #!/usr/bin/env python3
-import re,os
+"""Check local links in every HTML page and build the page -> target link graph.
+
+The tree is walked once into an in-memory set of files and directories, so
+checking a reference is a set lookup; resolving a (page dir, link) pair is
+memoized because the same /css/... or /games/... targets recur in hundreds
+of pages. href, src, srcset and data-src attributes are all followed.
+
+  --graph-json/--graph-csv  export every edge (page, attr, link, target, exists)
+  --dependents PATH         list the pages that reference PATH, i.e. what
+                            breaks if it is deleted; with --load-graph the
+                            answer comes from an exported JSON graph without
+                            rescanning
+  --metrics-json/--profile  walk, read, regex and resolve timings (see
+                            common/metrics.py)
+  --mmap-threshold BYTES    pages of at least this size are scanned in place
+                            through mmap (see common/bytescan.py)
+"""
+import argparse,csv,json,re,os,sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import bytescan
+from common.bytescan import add_mmap_args, bytes_regex, findall, mapped
+from common.metrics import Metrics, add_metrics_args
+from common.scan_cache import ScanCache, add_cache_args, namespace, source_digest
+
+parser=argparse.ArgumentParser()
+parser.add_argument('--graph-json',help='Write the link graph as JSON')
+parser.add_argument('--graph-csv',help='Write the link graph as CSV')
+parser.add_argument('--dependents',action='append',default=[],metavar='PATH',
+                    help='List pages referencing PATH (repo-relative, repeatable)')
+parser.add_argument('--load-graph',metavar='JSON',help='Answer --dependents from an exported graph instead of scanning')
+add_cache_args(parser)
+add_metrics_args(parser)
+add_mmap_args(parser)
+args=parser.parse_args()
+metrics=Metrics.from_args('check_links',args)
+
 root='.'
-IGNORE_DIRS = {'.history','dist','.venv','node_modules'}
+IGNORE_DIRS = {'.history','dist','.venv','node_modules','fixtures'}
+# not walked at all; links into them fall back to a (memoized) stat
+PRUNE_DIRS = IGNORE_DIRS | {'.git'}
+
+# attribute values are double-quoted throughout the site; the lookbehind
+# keeps data-src from also matching as src
+ref_re=re.compile(r'(?<![\w-])(href|src|srcset|data-src)\s*=\s*"([^"]+)"')
+EXTERNAL=('http:','https:','//','mailto:','tel:')
+SKIP=('javascript:','data:','blob:','#')
+
+
+def print_dependents(graph_edges, targets):
+    for t in targets:
+        t=os.path.normpath(t.lstrip('/'))
+        pages=sorted({e['page'] for e in graph_edges if e['target']==t})
+        print(f'\n{len(pages)} pages reference {t}:')
+        for p in pages:
+            print('-',p)
+
+
+if args.load_graph:
+    with open(args.load_graph,'r',encoding='utf-8') as fh:
+        print_dependents(json.load(fh)['edges'],args.dependents)
+    sys.exit(0)
+
 html_files=[]
+known=set()
 for dirpath,dirs,files in os.walk(root):
-    # skip ignored directories
-    parts = set(dirpath.split(os.sep))
-    if parts & IGNORE_DIRS:
-        continue
+    dirs[:]=[d for d in dirs if d not in PRUNE_DIRS]
+    rel_dir=os.path.normpath(dirpath)
+    known.add(rel_dir)
+    for d in dirs:
+        known.add(os.path.normpath(os.path.join(dirpath,d)))
     for f in files:
+        known.add(os.path.normpath(os.path.join(dirpath,f)))
         if f.endswith('.html'):
             html_files.append(os.path.join(dirpath,f))
+metrics.mark('walk')
+
+stat_memo={}
+def exists(path):
+    if path in known:
+        return True
+    top=path.split(os.sep,1)[0]
+    if top=='..' or os.path.isabs(path) or top in PRUNE_DIRS:
+        if path not in stat_memo:
+            stat_memo[path]=os.path.exists(path)
+        return stat_memo[path]
+    return False
+
+resolve_memo={}
+def resolve(page_dir,link):
+    key=(None if link.startswith('/') else page_dir,link)
+    path=resolve_memo.get(key)
+    if path is not None:
+        return path
+    # treat root-relative paths (starting with '/') as repo-root relative
+    if link.startswith('/'):
+        rel = link.lstrip('/')
+        # map '/' to 'index.html'
+        if rel == '':
+            rel = 'index.html'
+        path = os.path.normpath(os.path.join(root, rel))
+        # normalize repeated slashes (avoid index.html/index.html cases)
+        if path.endswith(os.path.join('index.html','index.html')):
+            path = path.rsplit(os.path.join('index.html','index.html'),1)[0] + os.path.join('index.html')
+    else:
+        path=os.path.normpath(os.path.join(page_dir,link))
+    # if link points to directory (ends with /) check index.html
+    # but don't double-append for the special root '/' which we map to index.html already
+    if link.endswith('/') and link != '/':
+        path=os.path.join(path,'index.html')
+    resolve_memo[key]=path
+    return path
 
-link_re=re.compile(r'href\s*=\s*"([^"]+)"')
+def references(attr,value):
+    if attr=='srcset':
+        # "a.png 1x, b.png 2x" -> every candidate URL
+        return [c.split()[0] for c in value.split(',') if c.strip()]
+    return [value]
+
+cache=ScanCache.from_args(namespace('check_links', source_digest(__file__,bytescan.__file__)), args)
+edges=[]
 missing=[]
 external_count=0
 for hf in html_files:
-    with open(hf,'r',encoding='utf-8',errors='ignore') as fh:
-        txt=fh.read()
-    for m in link_re.findall(txt):
-        # strip fragments and query strings
-        link=m.split('#')[0].split('?')[0]
-        if link.startswith('http') or link.startswith('mailto:'):
-            external_count+=1
-            continue
-        if link=='' or link.startswith('javascript:'):
-            continue
-        # treat root-relative paths (starting with '/') as repo-root relative
-        if link.startswith('/'):
-            rel = link.lstrip('/')
-            # map '/' to 'index.html'
-            if rel == '':
-                rel = 'index.html'
-            path = os.path.normpath(os.path.join(root, rel))
-            # normalize repeated slashes (avoid index.html/index.html cases)
-            if path.endswith(os.path.join('index.html','index.html')):
-                path = path.rsplit(os.path.join('index.html','index.html'),1)[0] + os.path.join('index.html')
+    refs=cache.get(hf)
+    if refs is None:
+        size=os.path.getsize(hf)
+        if size>=args.mmap_threshold:
+            with metrics.phase('regex'), mapped(hf) as buf:
+                refs=findall(bytes_regex(ref_re,ignorecase=False),buf)
+            metrics.count('bytes_mapped',size)
         else:
-            path=os.path.normpath(os.path.join(os.path.dirname(hf),link))
-        # if link points to directory (ends with /) check index.html
-        # but don't double-append for the special root '/' which we map to index.html already
-        if link.endswith('/') and link != '/':
-            path=os.path.join(path,'index.html')
-        if not os.path.exists(path):
-            missing.append((hf,link,path))
-
-print('Checked',len(html_files),'HTML files; found',len(missing),'missing local links; skipped',external_count,'external links')
+            with metrics.phase('read'):
+                with open(hf,'r',encoding='utf-8',errors='ignore') as fh:
+                    text=fh.read()
+            with metrics.phase('regex'):
+                refs=ref_re.findall(text)
+            metrics.count('chars_read',len(text))
+        metrics.count('files_read')
+        cache.put(hf,refs)
+    metrics.count('regex_matches',len(refs))
+    page=os.path.normpath(hf)
+    page_dir=os.path.dirname(hf)
+    with metrics.phase('resolve'):
+        for attr,value in refs:
+            for m in references(attr,value):
+                # strip fragments and query strings
+                link=m.split('#')[0].split('?')[0]
+                if link.startswith(EXTERNAL):
+                    external_count+=1
+                    continue
+                if link=='' or m.startswith(SKIP):
+                    continue
+                path=resolve(page_dir,link)
+                ok=exists(path)
+                edges.append({'page':page,'attr':attr,'link':m,'target':path,'exists':ok})
+                if not ok:
+                    missing.append((hf,link,path))
+
+metrics.count('cache_pruned',cache.prune())
+cache.close()
+metrics.mark('cache')
+
+if args.graph_json:
+    with open(args.graph_json,'w',encoding='utf-8') as fh:
+        json.dump({'root':os.path.abspath(root),'pages':len(html_files),'edges':edges},fh,indent=1)
+if args.graph_csv:
+    with open(args.graph_csv,'w',newline='',encoding='utf-8') as fh:
+        w=csv.DictWriter(fh,fieldnames=['page','attr','link','target','exists'])
+        w.writeheader()
+        w.writerows(edges)
+metrics.mark('write')
+
+print('Checked',len(html_files),'HTML files;',len(edges),'local references to',len({e['target'] for e in edges}),
+      'targets; found',len(missing),'missing local links; skipped',external_count,'external links')
 if missing:
     print('\nMissing links:')
     for hf,link,path in missing:
         print(f'- In {hf}: "{link}" -> {path} (MISSING)')
+if args.dependents:
+    print_dependents(edges,args.dependents)
+metrics.count('pages',len(html_files))
+metrics.count('missing',len(missing))
+metrics.finish(cache_hits=cache.hits,cache_misses=cache.misses)
@@ -1,20 +1,27 @@
 #!/usr/bin/env python3
 """Cross-check sitemap.xml vs games.json and dist/ pages."""
-import re, json, os
+import argparse, re, os, sys
 from urllib.parse import urlparse
 
-ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.catalog import load
+from common.metrics import Metrics, add_metrics_args
+from common.sitemap import iter_locs
 
-sitemap = open(os.path.join(ROOT, 'sitemap.xml')).read()
-sitemap_slugs = set(re.findall(r'/game/[^/]+/([^/]+)/', sitemap))
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-games = json.load(open(os.path.join(ROOT, 'games.json')))
+parser = argparse.ArgumentParser(description=__doc__)
+add_metrics_args(parser)
+metrics = Metrics.from_args('check_sitemap', parser.parse_args())
 
-def slug(link):
-    p = urlparse(link).path.strip('/')
-    return p.split('/')[-1] if p else link
+game_re = re.compile(r'/game/[^/]+/([^/]+)/')
+game_locs = [loc for loc in iter_locs(os.path.join(ROOT, 'sitemap.xml')) if game_re.search(loc)]
+sitemap_slugs = {game_re.search(loc).group(1) for loc in game_locs}
+metrics.mark('sitemap')
 
-game_slugs = {slug(g['link']): g for g in games if g.get('show')}
+catalog = load(os.path.join(ROOT, 'games.json'))
+game_slugs = {g.slug: g for g in catalog.select(show=True)}
+metrics.mark('catalog')
 
 print(f"Sitemap game URLs : {len(sitemap_slugs)}")
 print(f"games.json show=true: {len(game_slugs)}")
@@ -23,16 +30,18 @@ print()
 not_in_sitemap = {s: g for s, g in game_slugs.items() if s not in sitemap_slugs}
 not_in_games   = sitemap_slugs - set(game_slugs)
 missing_pages  = []
-for url in re.findall(r'<loc>(https://poki2\.online/game/[^<]+)</loc>', sitemap):
-    path = url.replace('https://play.poki2.online', '').strip('/')
+for url in game_locs:
+    path = urlparse(url).path.strip('/')
     page = os.path.join(ROOT, 'dist', path, 'index.html')
     if not os.path.exists(page):
         missing_pages.append(url)
+metrics.mark('pages')
+metrics.count('urls', len(game_locs))
 
 if not_in_sitemap:
     print(f"❌ In games.json (show=true) but NOT in sitemap ({len(not_in_sitemap)}):")
     for s, g in sorted(not_in_sitemap.items()):
-        print(f"   {s}  ({g['title']})")
+        print(f"   {s}  ({g.title})")
 else:
     print("✅ All show=true games are in sitemap")
 
@@ -49,3 +58,5 @@ if missing_pages:
         print(f"   {u}")
 else:
     print("✅ All sitemap URLs have a dist/game/.../index.html")
+metrics.mark('report')
+metrics.finish()
@@ -1,59 +1,32 @@
 #!/usr/bin/env python3
-import xml.etree.ElementTree as ET
-import subprocess
+"""Fetch every sitemap.xml URL and flag pages that are really the site index.
+
+Each URL gets one GET (redirects followed on keep-alive connections) that
+yields the final status, effective URL and a streamed SHA-256 of the body,
+compared against the local index.html to spot SPA fallbacks. Crawling goes
+through common.crawler: rate limited, retried, conditional on the stored
+ETags and resumable with --resume.
+
+Point --sitemap at a file whose <loc>s use http://127.0.0.1:PORT to run it
+offline against a local stand-in server.
+"""
+import argparse
 import csv
 import hashlib
+import os
+import sys
 from pathlib import Path
 
-ROOT = Path(__file__).resolve().parents[1]
-SITEMAP = ROOT / 'sitemap.xml'
-OUT_CSV = ROOT / 'tools' / 'sitemap_full_report.csv'
-LOCAL_INDEX = ROOT / 'index.html'
-
-if not SITEMAP.exists():
-    print('sitemap.xml not found at', SITEMAP)
-    raise SystemExit(1)
-if not LOCAL_INDEX.exists():
-    print('Local index.html not found at', LOCAL_INDEX)
-    raise SystemExit(1)
-
-with LOCAL_INDEX.open('rb') as f:
-    local_index_hash = hashlib.sha256(f.read()).hexdigest()
-
-ns = {'ns0': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
-
-tree = ET.parse(SITEMAP)
-root = tree.getroot()
-
-urls = []
-for loc in root.findall('.//ns0:loc', ns):
-    text = (loc.text or '').strip()
-    if text:
-        urls.append(text)
-
-print(f'Found {len(urls)} URLs in sitemap.xml')
-
-results = []
-for u in urls:
-    # get final http code and effective url
-    cmd_code = ['curl', '-s', '-o', '/dev/null', '-w', '%{http_code} %{url_effective}', '-L', u]
-    try:
-        out = subprocess.check_output(cmd_code, text=True, stderr=subprocess.DEVNULL).strip()
-    except subprocess.CalledProcessError:
-        out = '000 '
-    parts = out.split(' ', 1)
-    code = parts[0]
-    eff = parts[1] if len(parts) > 1 else ''
-
-    # fetch body
-    cmd_body = ['curl', '-s', '-L', u]
-    try:
-        body = subprocess.check_output(cmd_body)
-    except subprocess.CalledProcessError:
-        body = b''
-    body_hash = hashlib.sha256(body).hexdigest()
-    is_index = (body_hash == local_index_hash)
-    note = ''
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.crawler import Crawler, add_crawl_args
+from common.metrics import Metrics, add_metrics_args
+from common.sitemap import iter_locs
+
+ROOT = Path(__file__).resolve().parents[2]
+
+def classify(rec, local_index_hash):
+    code = f"{rec['status']:03d}"
+    is_index = (rec['sha256'] == local_index_hash)
     if is_index:
         note = 'served_index'
     elif code.startswith('3'):
@@ -62,25 +35,75 @@ for u in urls:
         note = 'ok'
     else:
         note = 'other'
+    return code, is_index, note
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sitemap', default=str(ROOT / 'sitemap.xml'))
+    parser.add_argument('--local-index', default=str(ROOT / 'index.html'))
+    parser.add_argument('--out', default=str(ROOT / 'tools' / 'sitemap_full_report.csv'))
+    add_crawl_args(parser)
+    add_metrics_args(parser)
+    args = parser.parse_args()
+    metrics = Metrics.from_args('check_sitemap_full', args)
+
+    sitemap = Path(args.sitemap)
+    local_index = Path(args.local_index)
+    out_csv = Path(args.out)
+    if not sitemap.exists():
+        print('sitemap.xml not found at', sitemap)
+        raise SystemExit(1)
+    if not local_index.exists():
+        print('Local index.html not found at', local_index)
+        raise SystemExit(1)
+
+    with local_index.open('rb') as f:
+        local_index_hash = hashlib.sha256(f.read()).hexdigest()
+
+    urls = list(iter_locs(sitemap))
+    print(f'Found {len(urls)} URLs in sitemap.xml')
+
+    def progress(rec):
+        code, is_index, _ = classify(rec, local_index_hash)
+        print(rec['url'], code, rec['effective_url'], 'index=', is_index)
+
+    metrics.mark('sitemap')
+    crawler = Crawler.from_args('sitemap_full', args)
+    records = crawler.run(urls, on_result=progress)
+
+    results = []
+    for rec in records:
+        code, is_index, note = classify(rec, local_index_hash)
+        results.append((rec['url'], code, rec['effective_url'], rec['sha256'], str(is_index), note))
+
+    metrics.mark('network')
+
+    # write CSV
+    out_csv.parent.mkdir(parents=True, exist_ok=True)
+    with out_csv.open('w', newline='') as f:
+        w = csv.writer(f)
+        w.writerow(['url', 'http_code', 'effective_url', 'body_sha256', 'is_index', 'note'])
+        w.writerows(results)
 
-    results.append((u, code, eff, body_hash, str(is_index), note))
-    print(u, code, eff, 'index=', is_index)
+    # summary
+    counts = {}
+    for _, code, _, _, is_index, _ in results:
+        counts['code_'+code] = counts.get('code_'+code, 0) + 1
+        counts['index_'+is_index] = counts.get('index_'+is_index, 0) + 1
 
-# write CSV
-OUT_CSV.parent.mkdir(parents=True, exist_ok=True)
-with OUT_CSV.open('w', newline='') as f:
-    w = csv.writer(f)
-    w.writerow(['url', 'http_code', 'effective_url', 'body_sha256', 'is_index', 'note'])
-    w.writerows(results)
+    print('\nSummary:')
+    for k, v in sorted(counts.items()):
+        print(k, v)
+    print('Crawl:', ', '.join(f'{k}={v}' for k, v in crawler.stats.items()))
 
-# summary
-counts = {}
-for _, code, _, _, is_index, _ in results:
-    counts['code_'+code] = counts.get('code_'+code, 0) + 1
-    counts['index_'+is_index] = counts.get('index_'+is_index, 0) + 1
+    print('\nCSV report written to', out_csv)
+    metrics.mark('report')
+    metrics.count('urls', len(urls))
+    for key, n in crawler.stats.items():
+        metrics.count(key, n)
+    metrics.finish()
 
-print('\nSummary:')
-for k, v in sorted(counts.items()):
-    print(k, v)
 
-print('\nCSV report written to', OUT_CSV)
+if __name__ == '__main__':
+    main()
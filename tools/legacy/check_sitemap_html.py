@@ -1,62 +1,77 @@
 #!/usr/bin/env python3
-import xml.etree.ElementTree as ET
-import subprocess
+"""Report the final status and effective URL of every .html URL in sitemap.xml.
+
+Crawling goes through common.crawler (rate limited, retried, conditional on
+the stored ETags, resumable with --resume).
+"""
+import argparse
 import csv
+import os
+import sys
 from pathlib import Path
 
-ROOT = Path(__file__).resolve().parents[1]
-SITEMAP = ROOT / 'sitemap.xml'
-OUT_CSV = ROOT / 'tools' / 'sitemap_html_report.csv'
-
-if not SITEMAP.exists():
-    print('sitemap.xml not found at', SITEMAP)
-    raise SystemExit(1)
-
-ns = {'ns0': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
-
-tree = ET.parse(SITEMAP)
-root = tree.getroot()
-
-urls = []
-for loc in root.findall('.//ns0:loc', ns):
-    text = (loc.text or '').strip()
-    if '.html' in text:
-        urls.append(text)
-
-print(f'Found {len(urls)} .html URLs in sitemap.xml')
-
-results = []
-for u in urls:
-    # Use curl to follow redirects and report final code + effective URL
-    cmd = ['curl', '-s', '-o', '/dev/null', '-w', '%{http_code} %{url_effective}', '-L', u]
-    try:
-        out = subprocess.check_output(cmd, text=True, stderr=subprocess.DEVNULL).strip()
-    except subprocess.CalledProcessError as e:
-        out = f'000 {u}'
-    if out:
-        parts = out.split(' ', 1)
-        code = parts[0]
-        eff = parts[1] if len(parts) > 1 else ''
-    else:
-        code = '000'
-        eff = ''
-    results.append((u, code, eff))
-    print(u, code, '->', eff)
-
-# write CSV
-OUT_CSV.parent.mkdir(parents=True, exist_ok=True)
-with OUT_CSV.open('w', newline='') as f:
-    w = csv.writer(f)
-    w.writerow(['url', 'http_code', 'effective_url'])
-    w.writerows(results)
-
-# summary
-counts = {}
-for _, code, _ in results:
-    counts[code] = counts.get(code, 0) + 1
-
-print('\nSummary:')
-for code, cnt in sorted(counts.items(), key=lambda x: x[0]):
-    print(code, cnt)
-
-print('\nCSV report written to', OUT_CSV)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.crawler import Crawler, add_crawl_args
+from common.metrics import Metrics, add_metrics_args
+from common.sitemap import iter_locs
+
+ROOT = Path(__file__).resolve().parents[2]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sitemap', default=str(ROOT / 'sitemap.xml'))
+    parser.add_argument('--out', default=str(ROOT / 'tools' / 'sitemap_html_report.csv'))
+    add_crawl_args(parser)
+    add_metrics_args(parser)
+    args = parser.parse_args()
+    metrics = Metrics.from_args('check_sitemap_html', args)
+
+    sitemap = Path(args.sitemap)
+    out_csv = Path(args.out)
+    if not sitemap.exists():
+        print('sitemap.xml not found at', sitemap)
+        raise SystemExit(1)
+
+    urls = [loc for loc in iter_locs(sitemap) if '.html' in loc]
+
+    print(f'Found {len(urls)} .html URLs in sitemap.xml')
+
+    def progress(rec):
+        print(rec['url'], f"{rec['status']:03d}", '->', rec['effective_url'] or rec['url'])
+
+    metrics.mark('sitemap')
+    crawler = Crawler.from_args('sitemap_html', args)
+    results = []
+    for rec in crawler.run(urls, on_result=progress):
+        # a failed fetch reports the URL itself as the effective URL, like curl did
+        results.append((rec['url'], f"{rec['status']:03d}", rec['effective_url'] or rec['url']))
+
+    metrics.mark('network')
+
+    # write CSV
+    out_csv.parent.mkdir(parents=True, exist_ok=True)
+    with out_csv.open('w', newline='') as f:
+        w = csv.writer(f)
+        w.writerow(['url', 'http_code', 'effective_url'])
+        w.writerows(results)
+
+    # summary
+    counts = {}
+    for _, code, _ in results:
+        counts[code] = counts.get(code, 0) + 1
+
+    print('\nSummary:')
+    for code, cnt in sorted(counts.items(), key=lambda x: x[0]):
+        print(code, cnt)
+    print('Crawl:', ', '.join(f'{k}={v}' for k, v in crawler.stats.items()))
+
+    print('\nCSV report written to', out_csv)
+    metrics.mark('report')
+    metrics.count('urls', len(urls))
+    for key, n in crawler.stats.items():
+        metrics.count(key, n)
+    metrics.finish()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Replay every sitemap.xml URL against a built dist/ folder, offline.
+
+The offline counterpart of check_sitemap_full.py: instead of fetching
+production, each URL is answered by common.pages, which applies
+`_redirects`, Pages' HTML handling, 404/SPA fallbacks and `_headers` to the
+files in --dist. For every URL the CSV records the final status, redirect
+hops, the file that would be served, its size and the caching headers.
+
+Notes:
+  ok            200 straight from a file
+  redirect      reached a file through redirects (a wasted round trip for
+                a sitemap URL)
+  served_index  answered by index.html through a fallback
+  not_found     404
+  external      redirected off-site, or not one of --domain
+  loop          redirect loop
+
+Exits 1 with --strict when any URL is not "ok", for use as a pre-deploy
+gate.
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.metrics import Metrics, add_metrics_args
+from common.pages import PagesSite
+from common.sitemap import iter_locs
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sitemap', default=str(ROOT / 'sitemap.xml'))
+    parser.add_argument('--dist', default=str(ROOT / 'dist'), help='Built site folder')
+    parser.add_argument('--redirects', help='Rules file (default: <dist>/_redirects)')
+    parser.add_argument('--headers', help='Headers file (default: <dist>/_headers)')
+    parser.add_argument('--domain', action='append',
+                        help='Host served from --dist (repeatable; default: the hosts in the sitemap)')
+    parser.add_argument('--out', default=str(ROOT / 'tools' / 'sitemap_local_report.csv'))
+    parser.add_argument('--strict', action='store_true', help='Exit 1 unless every URL is "ok"')
+    add_metrics_args(parser)
+    args = parser.parse_args()
+
+    sitemap = Path(args.sitemap)
+    if not sitemap.exists():
+        print('sitemap.xml not found at', sitemap)
+        raise SystemExit(1)
+    if not os.path.isdir(args.dist):
+        print('Built site not found at', args.dist)
+        raise SystemExit(1)
+
+    t0 = time.perf_counter()
+    metrics = Metrics.from_args('check_sitemap_local', args)
+    urls = list(iter_locs(sitemap))
+    domains = args.domain or sorted({urlsplit(u).hostname for u in urls if urlsplit(u).hostname})
+    metrics.mark('sitemap')
+    site = PagesSite(args.dist, domains, args.redirects, args.headers)
+    metrics.mark('walk')
+    for name, lineno, msg in site.problems:
+        print(f'{name}:{lineno}: {msg}' if lineno else f'{name}: {msg}')
+    print(f'Found {len(urls)} URLs in {sitemap.name}, {len(site.files)} files in {args.dist}')
+
+    counts = {}
+    out_csv = Path(args.out)
+    out_csv.parent.mkdir(parents=True, exist_ok=True)
+    with out_csv.open('w', newline='') as f:
+        w = csv.writer(f)
+        w.writerow(['url', 'http_code', 'hops', 'final_path', 'file', 'bytes', 'cache_control', 'note', 'chain'])
+        for url in urls:
+            res = site.resolve(url)
+            chain = ' > '.join(f'{status} {loc} ({why})' for status, loc, why in res.hops)
+            w.writerow([url, res.status or '', len(res.hops), res.path or '', res.file or res.location or '',
+                        '' if res.size is None else res.size, res.header('Cache-Control'), res.note, chain])
+            counts[res.note] = counts.get(res.note, 0) + 1
+            if res.note != 'ok':
+                print(url, res.status, res.note, res.file or res.location or '', chain)
+
+    metrics.mark('resolve')
+
+    print('\nSummary:')
+    for k, v in sorted(counts.items()):
+        print(k, v)
+    print(f'Checked {len(urls)} URLs in {time.perf_counter() - t0:.2f}s')
+    print('\nCSV report written to', out_csv)
+    metrics.count('urls', len(urls))
+    metrics.count('files', len(site.files))
+    metrics.finish()
+    if args.strict and set(counts) - {'ok'}:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,47 +4,76 @@ Convert existing sitemap.xml entries that use query-style game links
 to path-style /games/<slug>/ and emit a redirect map for review.
 
 Usage:
-  python3 tools/convert_sitemap.py
+  python3 tools/convert_sitemap.py [--gzip]
 
 Outputs:
-  - sitemap.new.xml   (updated sitemap)
+  - sitemap.new.xml   (updated sitemap; sharded behind a sitemapindex
+                       if it outgrows the 50k URL / 50 MB limits)
   - redirects-old-query.txt (list of old -> new)
+
+The sitemap is streamed entry by entry, so its size does not matter.
+Elements the converter does not model (xhtml:link alternates, video:video,
+...) are copied through unchanged. If reading fails, nothing is replaced:
+the new sitemap is only published once the whole input has been read, and
+shards left by an earlier, larger run are removed then.
 """
+import argparse
+import os
 import re
 import sys
-from xml.etree import ElementTree as ET
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.metrics import Metrics, add_metrics_args
+from common.sitemap import SitemapWriter, iter_entries
 
 IN = 'sitemap.xml'
-OUT = 'sitemap.new.xml'
+OUT = 'sitemap.new'
 REDIR = 'redirects-old-query.txt'
 
+QUERY_RE = re.compile(r'[?&](?:play-|play=|game=|id=)([A-Za-z0-9\-_]+)')
+
+
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--gzip', action='store_true', help='Write sitemap.new.xml.gz')
+    add_metrics_args(parser)
+    args = parser.parse_args()
+    metrics = Metrics.from_args('convert_sitemap', args)
+
+    if not os.path.exists(IN):
+        print('Error reading', IN, 'not found')
+        sys.exit(1)
+
+    redirects = []
+    writer = SitemapWriter('.', name=OUT, base_url=f'https://{get_host()}', gzip_output=args.gzip, images=True)
     try:
-        tree = ET.parse(IN)
+        for entry in iter_entries(IN):
+            text = entry.loc
+            m = QUERY_RE.search(text)
+            if m:
+                slug = m.group(1)
+                new = f'https://{get_host()}/games/{slug}/'
+                entry.loc = new
+                redirects.append((text, new))
+            writer.add(entry)
+            metrics.count('urls')
     except Exception as e:
+        writer.abort()
         print('Error reading', IN, e)
         sys.exit(1)
-    root = tree.getroot()
-    ns = {'ns': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
+    writer.close()
+    # parsing and writing are interleaved, entry by entry
+    metrics.mark('convert')
 
-    redirects = []
-    for url in root.findall('ns:url', ns):
-        loc = url.find('ns:loc', ns)
-        if loc is None or not loc.text:
-            continue
-        text = loc.text
-        m = re.search(r'[?&](?:play-|play=|game=|id=)([A-Za-z0-9\-_]+)', text)
-        if m:
-            slug = m.group(1)
-            new = f'https://{get_host()}/games/{slug}/'
-            loc.text = new
-            redirects.append((text, new))
-
-    tree.write(OUT, encoding='utf-8', xml_declaration=True)
     with open(REDIR, 'w', encoding='utf-8') as f:
         for old, new in redirects:
             f.write(f"{old} -> {new}\n")
-    print('Wrote', OUT, 'and', REDIR)
+    metrics.mark('write')
+    metrics.count('rewritten', len(redirects))
+    print('Wrote', ', '.join(writer.files), 'and', REDIR)
+    for path in writer.removed:
+        print('Removed stale shard', path)
+    metrics.finish()
 
 def get_host():
     # default host — replace if necessary
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""Measure what every built page costs to load and check it against a budget.
+
+Usage:
+  python3 tools/legacy/page_weight.py --dist dist [--budget tools/page-budget.json]
+  python3 tools/legacy/page_weight.py --dist dist --save-baseline tools/.cache/page-weight.json
+  python3 tools/legacy/page_weight.py --dist dist --baseline tools/.cache/page-weight.json
+
+Each HTML file under --dist is parsed and the resources a cold visit would
+fetch are resolved against the tree:
+
+  - stylesheets (plus their @import and @font-face fonts), scripts,
+    preloaded resources, eager images, icons, the manifest and iframes;
+  - lazy images and prefetches are listed apart and not counted;
+  - render-blocking: stylesheets (not media=print) and scripts without
+    async/defer/type=module that appear before <body>, and CSS they @import.
+
+Transferred bytes use the smallest of the file, its .br and its .gz sibling,
+as a server negotiating encodings would send. Third-party resources are
+counted as requests and origins (their size is not known offline). A
+resource shared by many pages is counted for each of them.
+
+The budget file is JSON:
+
+  {"default": {"bytes": 400000, "requests": 40, "blocking": 3, ...},
+   "pages":   [{"match": "game/*/*/index.html", "bytes": 150000}],
+   "max_growth": 0.05}
+
+Limits (all optional): bytes, html_bytes, blocking_bytes, requests,
+blocking, third_party. The first "pages" entry whose fnmatch pattern
+matches a page's path overrides the defaults key by key. With --baseline,
+a page whose bytes, requests or blocking resources grew by more than
+max_growth since the saved run also fails. Any failure exits 1.
+"""
+import argparse
+import fnmatch
+import json
+import os
+import re
+import sys
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.metrics import Metrics, add_metrics_args
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_BUDGET = os.path.join(ROOT, 'tools', 'page-budget.json')
+DEFAULT_DOMAINS = ('poki2.online', 'play.poki2.online')
+LIMITS = ('bytes', 'html_bytes', 'blocking_bytes', 'requests', 'blocking', 'third_party')
+# compared against the baseline
+GROWTH_KEYS = ('bytes', 'requests', 'blocking')
+
+css_import_re = re.compile(r'@import\s+(?:url\()?\s*["\']?([^"\')\s;]+)')
+font_face_re = re.compile(r'@font-face\s*{[^}]*}', re.S)
+css_url_re = re.compile(r'url\(\s*["\']?([^"\')]+)["\']?\s*\)')
+
+
+class ResourceParser(HTMLParser):
+    """Collect (kind, url, blocking) for everything a page loads."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.in_body = False
+        self.noscript = 0
+        self.resources = []    # (kind, url, blocking)
+        self.deferred = []     # (kind, url): lazy images, prefetches
+
+    def handle_starttag(self, tag, attrs):
+        a = {k: (v or '') for k, v in attrs}
+        if tag == 'body':
+            self.in_body = True
+        elif tag == 'noscript':
+            self.noscript += 1
+        elif self.noscript:
+            return  # fallbacks a scripting browser never loads
+        elif tag == 'link' and a.get('href'):
+            rel = a.get('rel', '').lower().split()
+            href = a['href']
+            if 'stylesheet' in rel:
+                media = a.get('media', 'all').strip().lower()
+                blocking = not self.in_body and media not in ('print', 'none') and 'disabled' not in a
+                self.resources.append(('css', href, blocking))
+            elif 'preload' in rel or 'modulepreload' in rel:
+                self.resources.append(('css' if a.get('as') == 'style' else 'preload', href, False))
+            elif 'prefetch' in rel:
+                self.deferred.append(('prefetch', href))
+            elif 'icon' in rel or 'manifest' in rel:
+                self.resources.append(('icon' if 'icon' in rel else 'manifest', href, False))
+        elif tag == 'script' and a.get('src'):
+            sync = 'async' not in a and 'defer' not in a and a.get('type', '').lower() != 'module'
+            self.resources.append(('js', a['src'], sync and not self.in_body))
+        elif tag == 'img' and (a.get('src') or a.get('data-src')):
+            src = a.get('src') or a['data-src']
+            if a.get('loading', '').lower() == 'lazy' or not a.get('src'):
+                self.deferred.append(('img', src))
+            else:
+                self.resources.append(('img', src, False))
+        elif tag == 'iframe' and a.get('src'):
+            self.resources.append(('iframe', a['src'], False))
+
+    def handle_endtag(self, tag):
+        if tag == 'noscript' and self.noscript:
+            self.noscript -= 1
+
+
+class Site:
+    """Resolves URLs to files under root and remembers transfer sizes."""
+
+    def __init__(self, root, domains):
+        self.root = os.path.abspath(root)
+        self.domains = frozenset(domains)
+        self._sizes = {}
+        self._css = {}
+
+    def locate(self, url, page_rel):
+        """('local', path) | ('external', origin) | (None, None) for data:/javascript: and the like."""
+        if url.startswith(('data:', 'blob:', 'javascript:', 'about:', 'mailto:', '#')):
+            return None, None
+        parts = urlsplit(url)
+        if parts.scheme in ('http', 'https') or url.startswith('//'):
+            if parts.hostname not in self.domains:
+                return 'external', f'{parts.scheme or "https"}://{parts.hostname}'
+            path = parts.path
+        elif parts.scheme:
+            return None, None
+        elif parts.path.startswith('/'):
+            path = parts.path
+        else:
+            path = '/' + os.path.normpath(os.path.join(os.path.dirname(page_rel), parts.path)).replace(os.sep, '/')
+        path = path.lstrip('/')
+        if path == '' or path.endswith('/'):
+            path += 'index.html'
+        return 'local', path
+
+    def transfer_size(self, rel):
+        """Bytes on the wire for rel (best of plain/.br/.gz), or None if it does not exist."""
+        if rel not in self._sizes:
+            full = os.path.join(self.root, rel)
+            best = None
+            for candidate in (full, full + '.br', full + '.gz'):
+                try:
+                    size = os.path.getsize(candidate)
+                except OSError:
+                    continue
+                best = size if best is None else min(best, size)
+            self._sizes[rel] = best
+        return self._sizes[rel]
+
+    def css_refs(self, rel):
+        """(imports, fonts) referenced by a local stylesheet, as URLs relative to it."""
+        if rel not in self._css:
+            try:
+                with open(os.path.join(self.root, rel), 'r', encoding='utf-8', errors='ignore') as f:
+                    text = f.read()
+            except OSError:
+                text = ''
+            fonts = []
+            for block in font_face_re.findall(text):
+                urls = css_url_re.findall(block)
+                if urls:
+                    fonts.append(urls[0])  # the browser fetches the first format it supports
+            self._css[rel] = (css_import_re.findall(text), fonts)
+        return self._css[rel]
+
+
+def measure(site, page_rel):
+    """Cost of one cold load of page_rel."""
+    with open(os.path.join(site.root, page_rel), 'r', encoding='utf-8', errors='ignore') as f:
+        parser = ResourceParser()
+        parser.feed(f.read())
+    html_bytes = site.transfer_size(page_rel) or 0
+    stats = {'html_bytes': html_bytes, 'bytes': html_bytes, 'requests': 1, 'blocking': 0, 'blocking_bytes': 0,
+             'third_party': [], 'missing': [], 'by_kind': {}, 'deferred': len(parser.deferred)}
+    seen = set()
+    queue = [(kind, url, blocking, page_rel) for kind, url, blocking in parser.resources]
+    while queue:
+        kind, url, blocking, base = queue.pop(0)
+        where, target = site.locate(url, base)
+        if where is None or (where, target) in seen:
+            continue
+        seen.add((where, target))
+        stats['requests'] += 1
+        row = stats['by_kind'].setdefault(kind, [0, 0])
+        row[0] += 1
+        if blocking:
+            stats['blocking'] += 1
+        if where == 'external':
+            if target not in stats['third_party']:
+                stats['third_party'].append(target)
+            continue
+        size = site.transfer_size(target)
+        if size is None:
+            stats['missing'].append(target)
+            continue
+        row[1] += size
+        stats['bytes'] += size
+        if blocking:
+            stats['blocking_bytes'] += size
+        if kind == 'css':
+            imports, fonts = site.css_refs(target)
+            queue += [('css', u, blocking, target) for u in imports]
+            queue += [('font', u, False, target) for u in fonts]
+    return stats
+
+
+def collect_pages(root):
+    pages = []
+    for dirpath, dirs, files in os.walk(root):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith(('.html', '.htm')):
+                pages.append(os.path.relpath(os.path.join(dirpath, name), root).replace(os.sep, '/'))
+    return pages
+
+
+def limits_for(budget, page_rel):
+    limits = dict(budget.get('default', {}))
+    for entry in budget.get('pages', []):
+        if fnmatch.fnmatch(page_rel, entry['match']):
+            limits.update({k: v for k, v in entry.items() if k != 'match'})
+            break
+    return limits
+
+
+def check(results, budget, baseline=None):
+    """[(page, message)] for every limit exceeded or regression beyond max_growth."""
+    failures = []
+    growth = budget.get('max_growth')
+    for page, stats in results.items():
+        limits = limits_for(budget, page)
+        for key in LIMITS:
+            if key not in limits:
+                continue
+            value = len(stats[key]) if key == 'third_party' else stats[key]
+            if value > limits[key]:
+                failures.append((page, f'{key} {value} > budget {limits[key]}'))
+        if stats['missing']:
+            failures.append((page, f'missing: {", ".join(stats["missing"][:5])}'))
+        before = (baseline or {}).get(page)
+        if before and growth is not None:
+            for key in GROWTH_KEYS:
+                if before.get(key) and stats[key] > before[key] * (1 + growth):
+                    failures.append((page, f'{key} grew {before[key]} -> {stats[key]} '
+                                           f'(+{stats[key] / before[key] - 1:.1%}, allowed {growth:.0%})'))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dist', default=os.path.join(ROOT, 'dist'), help='Built site folder')
+    parser.add_argument('--budget', default=DEFAULT_BUDGET, help='Budget JSON (see module docstring)')
+    parser.add_argument('--domain', action='append',
+                        help=f'Host served from --dist (repeatable; default: {", ".join(DEFAULT_DOMAINS)})')
+    parser.add_argument('--include', action='append', help='Only pages matching this fnmatch pattern (repeatable)')
+    parser.add_argument('--baseline', help='Fail on growth beyond max_growth relative to this saved run')
+    parser.add_argument('--save-baseline', help='Write this run as a baseline')
+    parser.add_argument('--json', help='Write per-page results as JSON')
+    parser.add_argument('--top', type=int, default=20, help='Heaviest pages to list (default 20)')
+    add_metrics_args(parser)
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.dist):
+        print('Built site not found at', args.dist)
+        sys.exit(1)
+    budget = {}
+    if args.budget and os.path.exists(args.budget):
+        with open(args.budget, 'r', encoding='utf-8') as f:
+            budget = json.load(f)
+    metrics = Metrics.from_args('page_weight', args)
+    site = Site(args.dist, args.domain or DEFAULT_DOMAINS)
+    pages = collect_pages(args.dist)
+    if args.include:
+        pages = [p for p in pages if any(fnmatch.fnmatch(p, pat) for pat in args.include)]
+    metrics.mark('walk')
+    results = {page: measure(site, page) for page in pages}
+    metrics.mark('measure')
+    metrics.count('pages', len(results))
+
+    print(f'{len(results)} pages in {args.dist}')
+    print(f"\n{'page':48} {'KB':>8} {'html KB':>8} {'reqs':>5} {'block':>5} {'block KB':>8} {'3p':>3}")
+    heaviest = sorted(results.items(), key=lambda kv: -kv[1]['bytes'])[:args.top]
+    for page, s in heaviest:
+        print(f"{page[-48:]:48} {s['bytes'] / 1024:8.1f} {s['html_bytes'] / 1024:8.1f} {s['requests']:5d} "
+              f"{s['blocking']:5d} {s['blocking_bytes'] / 1024:8.1f} {len(s['third_party']):3d}")
+    origins = {}
+    for s in results.values():
+        for origin in s['third_party']:
+            origins[origin] = origins.get(origin, 0) + 1
+    if origins:
+        print('\nThird-party origins (pages using them):')
+        for origin, count in sorted(origins.items(), key=lambda kv: (-kv[1], kv[0])):
+            print(f'- {origin}: {count}')
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump({p: {k: s[k] for k in GROWTH_KEYS} for p, s in results.items()}, f, indent=1, sort_keys=True)
+
+    failures = check(results, budget, baseline)
+    metrics.mark('report')
+    metrics.count('failures', len(failures))
+    if failures:
+        print(f'\nBudget failures: {len(failures)}')
+        for page, msg in failures:
+            print(f'- {page}: {msg}')
+        metrics.finish()
+        sys.exit(1)
+    print('\nAll pages within budget' if budget else '\nNo budget file; nothing checked')
+    metrics.finish()
+
+
+if __name__ == '__main__':
+    main()
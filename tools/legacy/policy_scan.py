@@ -1,16 +1,32 @@
 #!/usr/bin/env python3
-import os, re, sys
+import argparse, hashlib, os, re, sys, zlib
+import random
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from functools import partial
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import bytescan
+from common.bytescan import MMAP_THRESHOLD, LoweredText, MappedText, add_mmap_args, mapped
+from common.metrics import Metrics, add_metrics_args
+from common.scan_cache import ScanCache, add_cache_args, namespace, source_digest
 
 root='.'
-IGNORE_DIRS = {'.history','dist','.venv','node_modules'}
+IGNORE_DIRS = {'.history','dist','.venv','node_modules','fixtures'}
 
 adult_kw = ['porn','xxx','adult','sex','erotic','nude','nsfw']
 copyright_kw = ['download full','full game','crack','torrent','warez','copyright']
 suspicious_ext = ['.exe','.msi','.apk']
 
-link_re = re.compile(r'href\s*=\s*"([^"]+)"', re.I)
-src_re = re.compile(r'(?:src|data-src)\s*=\s*"([^"]+)"', re.I)
+# scan_file lowercases the text first; re.I would only defeat the regex
+# engine's literal-prefix search and is several times slower on big bundles
+# (mapped files cannot be lowercased up front and are searched with re.I)
+link_re = re.compile(r'href\s*=\s*"([^"]+)"')
+src_re = re.compile(r'(?:src|data-src)\s*=\s*"([^"]+)"')
 base64_re = re.compile(r'[A-Za-z0-9+/]{120,}={0,2}')
+# script/style blocks are dropped, any other tag becomes a space
+strip_re = re.compile(r'(<script[^>]*>.*?</script>|<style[^>]*>.*?</style>)|<[^>]+>', re.S)
+ws_re = re.compile(r'\s+')
 
 findings = {
     'adult': [],
@@ -20,89 +36,324 @@ findings = {
     'obfuscated_strings': []
 }
 
-img_re = re.compile(r'<img[^>]+>', re.I)
-src_attr_re = re.compile(r'src\s*=\s*["\']([^"\']+)["\']', re.I)
-alt_attr_re = re.compile(r'alt\s*=\s*["\']([^"\']*)["\']', re.I)
+# img_re's matches are lowercased like the rest of the text, so no re.I here either
+img_re = re.compile(r'<img[^>]+>')
+src_attr_re = re.compile(r'src\s*=\s*["\']([^"\']+)["\']')
+alt_attr_re = re.compile(r'alt\s*=\s*["\']([^"\']*)["\']')
 from difflib import SequenceMatcher
 
 page_texts = {}
+page_fingerprints = {}
+page_signatures = {}
 duplicate_groups = {}
 image_hosts = {}
 images_missing_alt = []
 
 known_stock_hosts = ['unsplash.com','images.unsplash.com','pexels.com','pixabay.com','shutterstock.com']
 
+NEAR_DUP_THRESHOLD = 0.90
+
+# MinHash/LSH parameters. Signatures use one-permutation hashing: each shingle
+# is hashed once and kept as the minimum of one of MINHASH_BINS bins, instead
+# of being hashed once per permutation; empty bins borrow the next filled
+# bin's value, offset by the distance. 128 bins in 32 bands of 4 rows put the
+# LSH candidate threshold around shingle Jaccard 0.42.
+#
+# That is a recall trade-off, not a guarantee: SequenceMatcher compares
+# characters, so a pair with small edits spread through the text (a word
+# changed every few words) can clear 0.90 while sharing few 3-word shingles,
+# and is then never verified. --similarity-backend exact checks every pair.
+SHINGLE_WORDS = 3
+MINHASH_BINS = 128
+LSH_BANDS = 32
+_BIN_BITS = 7                       # MINHASH_BINS == 1 << _BIN_BITS
+_MERSENNE_PRIME = (1 << 61) - 1
+_EMPTY = 1 << 61                    # above any h >> _BIN_BITS
+_rng = random.Random(0x5eed)
+_HASH_A = _rng.randrange(1, _MERSENNE_PRIME)
+_HASH_B = _rng.randrange(0, _MERSENNE_PRIME)
+
 def is_ignored(path):
     parts = set(path.split(os.sep))
     return bool(parts & IGNORE_DIRS)
 
-def scan_file(path):
-    try:
-        with open(path,'r',encoding='utf-8',errors='ignore') as fh:
-            txt = fh.read().lower()
-    except Exception as e:
-        return
+def extract_text(txt):
+    text_only = strip_re.sub(lambda m: '' if m.group(1) else ' ', txt)
+    return ws_re.sub(' ', text_only).strip()
+
+def scan_file(path, with_text=True, mmap_threshold=MMAP_THRESHOLD):
+    """Scan one file and return its findings as a plain record.
+
+    The record is picklable and touches no module state, so it can be produced
+    in a worker process and folded into the globals by merge_result().
+    Normalized page text is only extracted for HTML files and only when
+    with_text is set (duplicate detection enabled). rec['timings'] holds the
+    per-stage Metrics snapshot; main() merges it and drops it before caching.
+
+    Files of at least mmap_threshold bytes whose text is not needed (game
+    bundles) are scanned in place through mmap rather than read and
+    lowercased; see common/bytescan.py.
+    """
+    metrics = Metrics()
+    with_text = with_text and path.endswith(('.html','.htm'))
+    with ExitStack() as stack:
+        try:
+            if not with_text and os.path.getsize(path) >= mmap_threshold:
+                txt = MappedText(stack.enter_context(mapped(path)))
+                metrics.count('bytes_mapped', len(txt))
+            else:
+                with open(path,'r',encoding='utf-8',errors='ignore') as fh:
+                    txt = LoweredText(fh.read())
+                metrics.count('chars_read', len(txt))
+        except Exception as e:
+            return None
+        metrics.mark('scan.read')
+        metrics.count('files_read')
+        return scan_text(path, txt, with_text, metrics)
+
+def scan_text(path, txt, with_text, metrics):
+    """scan_file() on a LoweredText or MappedText."""
+    rec = {
+        'adult': [],
+        'copyright': [],
+        'suspicious_links': [],
+        'external_scripts': {},
+        'obfuscated_strings': [],
+        'stock_images': [],
+        'image_hosts': {},
+        'images_missing_alt': [],
+        'text': None,
+        'fingerprint': None,
+        'minhash': None,
+    }
     # keywords
+    found = txt.present(adult_kw + copyright_kw)
     for kw in adult_kw:
-        if kw in txt:
-            findings['adult'].append((path, kw))
+        if kw in found:
+            rec['adult'].append((path, kw))
     for kw in copyright_kw:
-        if kw in txt:
-            findings['copyright'].append((path, kw))
+        if kw in found:
+            rec['copyright'].append((path, kw))
+    metrics.mark('scan.keywords')
     # links and src
-    for m in link_re.findall(txt)+src_re.findall(txt):
+    links = txt.findall(link_re)+txt.findall(src_re)
+    metrics.count('regex_matches', len(links))
+    for m in links:
         link = m.split('#')[0].split('?')[0]
         if not link:
             continue
         # suspicious file extensions
         for ext in suspicious_ext:
-            if link.lower().endswith(ext):
-                findings['suspicious_links'].append((path, link))
+            if link.endswith(ext):
+                rec['suspicious_links'].append((path, link))
         # external scripts/domains
         if link.startswith('http://') or link.startswith('https://'):
             host = re.sub(r'^https?://','',link).split('/')[0]
-            findings['external_scripts'].setdefault(host,0)
-            findings['external_scripts'][host]+=1
+            rec['external_scripts'].setdefault(host,0)
+            rec['external_scripts'][host]+=1
         # plain IP addresses in links
         if re.search(r'https?://\d+\.\d+\.\d+\.\d+', link):
-            findings['suspicious_links'].append((path, link))
-    # obfuscated/base64 long strings
-    for b64 in base64_re.findall(txt):
-        findings['obfuscated_strings'].append((path, b64[:120]))
+            rec['suspicious_links'].append((path, link))
+    metrics.mark('scan.links')
+    # obfuscated/base64 long strings; the class already covers both cases
+    for b64 in txt.findall(base64_re, ignorecase=False):
+        rec['obfuscated_strings'].append((path, b64[:120]))
+    metrics.count('regex_matches', len(rec['obfuscated_strings']))
+    metrics.mark('scan.base64')
     # images: find <img> tags
-    for tag in img_re.findall(txt):
+    tags = txt.findall(img_re)
+    metrics.count('regex_matches', len(tags))
+    for tag in tags:
         srcm = src_attr_re.search(tag)
         altm = alt_attr_re.search(tag)
         if srcm:
             src = srcm.group(1)
             if src.startswith('http://') or src.startswith('https://'):
                 host = re.sub(r'^https?://','',src).split('/')[0]
-                image_hosts.setdefault(host,0)
-                image_hosts[host]+=1
+                rec['image_hosts'].setdefault(host,0)
+                rec['image_hosts'][host]+=1
                 # flag known stock hosts
                 for kh in known_stock_hosts:
                     if kh in host:
-                        findings.setdefault('stock_images',[]).append((path,src))
+                        rec['stock_images'].append((path,src))
         # missing alt
         if not altm:
-            images_missing_alt.append((path, tag[:120]))
+            rec['images_missing_alt'].append((path, tag[:120]))
+    metrics.mark('scan.images')
     # capture normalized page text for duplicate detection
-    text_only = re.sub(r'<script[^>]*>.*?</script>','',txt,flags=re.S)
-    text_only = re.sub(r'<style[^>]*>.*?</style>','',text_only,flags=re.S)
-    text_only = re.sub(r'<[^>]+>',' ',text_only)
-    text_only = re.sub(r'\s+',' ',text_only).strip()
-    page_texts[path] = text_only
+    if with_text:
+        text = extract_text(txt.text)
+        rec['text'] = text
+        rec['fingerprint'] = hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+        if text:
+            rec['minhash'] = minhash(shingles(text))
+        metrics.mark('scan.text')
+    rec['timings'] = metrics.snapshot()
+    return rec
 
-def main():
-    files_scanned=0
+def merge_result(path, rec):
+    """Fold one scan_file() record into the module-level findings.
+
+    Records must be merged in walk order; dict insertion order then matches a
+    serial run, which keeps the count-sorted host tables stable.
+    """
+    if rec is None:
+        return
+    for key in ('adult','copyright','suspicious_links','obfuscated_strings'):
+        findings[key].extend(rec[key])
+    for host,count in rec['external_scripts'].items():
+        findings['external_scripts'][host] = findings['external_scripts'].get(host,0)+count
+    for host,count in rec['image_hosts'].items():
+        image_hosts[host] = image_hosts.get(host,0)+count
+    if rec['stock_images']:
+        findings.setdefault('stock_images',[]).extend(rec['stock_images'])
+    images_missing_alt.extend(rec['images_missing_alt'])
+    if rec['text'] is not None:
+        page_texts[path] = rec['text']
+        page_fingerprints[path] = rec['fingerprint']
+        page_signatures[path] = rec['minhash']
+
+def collect_files():
+    paths = []
     for dirpath,dirs,files in os.walk(root):
         if is_ignored(dirpath):
             continue
         for f in files:
             if f.endswith(('.html','.htm','.js','.css')):
-                p = os.path.join(dirpath,f)
-                scan_file(p)
-                files_scanned+=1
+                paths.append(os.path.join(dirpath,f))
+    return paths
+
+def shingles(text):
+    words = text.split()
+    if len(words) <= SHINGLE_WORDS:
+        return {zlib.crc32(text.encode('utf-8'))}
+    return {zlib.crc32(' '.join(words[i:i+SHINGLE_WORDS]).encode('utf-8'))
+            for i in range(len(words)-SHINGLE_WORDS+1)}
+
+def minhash(shingle_set):
+    sig = [_EMPTY] * MINHASH_BINS
+    mask = MINHASH_BINS - 1
+    for x in shingle_set:
+        h = (_HASH_A*x + _HASH_B) % _MERSENNE_PRIME
+        b = h & mask
+        v = h >> _BIN_BITS
+        if v < sig[b]:
+            sig[b] = v
+    # densify: pages with the same filled bins fill the empty ones the same way
+    filled = [b for b in range(MINHASH_BINS) if sig[b] != _EMPTY]
+    if len(filled) < MINHASH_BINS:
+        nxt = filled[0] + MINHASH_BINS
+        for b in range(MINHASH_BINS-1, -1, -1):
+            if sig[b] != _EMPTY:
+                nxt = b
+            else:
+                sig[b] = sig[nxt % MINHASH_BINS] + (nxt - b) * _EMPTY
+    return sig
+
+def near_duplicates_exact(paths):
+    near_dups = []
+    for i in range(len(paths)):
+        for j in range(i+1,len(paths)):
+            a = page_texts[paths[i]]
+            b = page_texts[paths[j]]
+            if not a or not b:
+                continue
+            ratio = SequenceMatcher(None,a,b).ratio()
+            if ratio>NEAR_DUP_THRESHOLD and (paths[i],paths[j],ratio) not in near_dups:
+                near_dups.append((paths[i],paths[j],ratio))
+    return near_dups
+
+def near_duplicates_minhash(paths, cache=None):
+    """Bucket pages by LSH bands over MinHash signatures and only run
+    SequenceMatcher on pairs that share a bucket. Candidates are verified in
+    the same (i, j) order as the exact pass, so every pair found is reported
+    as the exact pass would; pairs LSH never proposes are missed (see the
+    recall note above MINHASH_BINS).
+    Verified ratios are memoized in `cache` by the pair's text fingerprints."""
+    rows = MINHASH_BINS // LSH_BANDS
+    buckets = {}
+    for i,p in enumerate(paths):
+        text = page_texts[p]
+        if not text:
+            continue
+        sig = page_signatures.get(p) or minhash(shingles(text))
+        for band in range(LSH_BANDS):
+            key = (band, tuple(sig[band*rows:(band+1)*rows]))
+            buckets.setdefault(key,[]).append(i)
+    candidates = set()
+    for members in buckets.values():
+        for x in range(len(members)):
+            for y in range(x+1,len(members)):
+                candidates.add((members[x],members[y]))
+    near_dups = []
+    for i,j in sorted(candidates):
+        key = None
+        if cache is not None and paths[i] in page_fingerprints and paths[j] in page_fingerprints:
+            key = page_fingerprints[paths[i]] + page_fingerprints[paths[j]]
+        ratio = cache.memo_get(key) if key else None
+        if ratio is None:
+            sm = SequenceMatcher(None,page_texts[paths[i]],page_texts[paths[j]])
+            # quick_ratio() is an upper bound on ratio(), so this only skips losers
+            if sm.real_quick_ratio()<=NEAR_DUP_THRESHOLD or sm.quick_ratio()<=NEAR_DUP_THRESHOLD:
+                ratio = 0.0
+            else:
+                ratio = sm.ratio()
+            if key:
+                cache.memo_put(key, ratio)
+        if ratio>NEAR_DUP_THRESHOLD:
+            near_dups.append((paths[i],paths[j],ratio))
+    return near_dups
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--similarity-backend', choices=['minhash','exact'], default='minhash',
+                        help='Near-duplicate detection: MinHash/LSH candidates (default; fast, but can miss pairs '
+                             'whose >0.90 similarity comes from many small scattered edits, as those share few '
+                             '3-word shingles) or the exhaustive all-pairs SequenceMatcher pass')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Scan files in N worker processes (0 = one per CPU)')
+    parser.add_argument('--no-duplicates', action='store_true',
+                        help='Skip page text extraction and duplicate/near-duplicate detection')
+    add_cache_args(parser)
+    add_metrics_args(parser)
+    add_mmap_args(parser)
+    args = parser.parse_args()
+    if args.jobs <= 0:
+        args.jobs = os.cpu_count() or 1
+
+    metrics = Metrics.from_args('policy_scan', args)
+    paths = collect_files()
+    metrics.mark('walk')
+    with_text = not args.no_duplicates
+    scan = partial(scan_file, with_text=with_text, mmap_threshold=args.mmap_threshold)
+    # every pattern, keyword list and MinHash parameter scan_file uses lives in these two files
+    cache = ScanCache.from_args(namespace('policy_scan', with_text, source_digest(__file__, bytescan.__file__)), args)
+    records = {}
+    todo = []
+    for p in paths:
+        rec = cache.get(p)
+        if rec is None:
+            todo.append(p)
+        else:
+            records[p] = rec
+    if args.jobs > 1 and len(todo) > 1:
+        # executor.map yields in submission order, so merging stays deterministic
+        chunksize = max(1, len(todo) // (args.jobs * 8))
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            records.update(zip(todo, pool.map(scan, todo, chunksize=chunksize)))
+    else:
+        for p in todo:
+            records[p] = scan(p)
+    metrics.mark('scan')
+    for p in todo:
+        if records[p] is not None:
+            metrics.merge(records[p].pop('timings'))
+            cache.put(p, records[p])
+    for p in paths:
+        merge_result(p, records[p])
+    files_scanned = len(paths)
+    metrics.count('files', files_scanned)
+    metrics.mark('merge')
 
     out = []
     out.append(f"Scanned {files_scanned} files\n")
@@ -135,38 +386,41 @@ def main():
             out.append(f"- {p}: {src}\n")
 
     # duplicate/near-duplicate detection
-    hashes = {}
-    for p,t in page_texts.items():
-        h = hash(t)
-        hashes.setdefault(h,[]).append(p)
-    # exact duplicates
-    dup_count = 0
-    for h,files in hashes.items():
-        if len(files)>1:
-            dup_count += len(files)
-            out.append(f"\nExact duplicate pages (content hash): {len(files)}\n")
-            for f in files:
-                out.append(f"- {f}\n")
-    # near duplicates via SequenceMatcher
-    near_dups = []
-    paths = list(page_texts.keys())
-    for i in range(len(paths)):
-        for j in range(i+1,len(paths)):
-            a = page_texts[paths[i]]
-            b = page_texts[paths[j]]
-            if not a or not b:
-                continue
-            ratio = SequenceMatcher(None,a,b).ratio()
-            if ratio>0.90 and (paths[i],paths[j],ratio) not in near_dups:
-                near_dups.append((paths[i],paths[j],ratio))
-    out.append(f"\nNear-duplicate page pairs (>0.90): {len(near_dups)}\n")
-    for a,b,r in near_dups[:100]:
-        out.append(f"- {a} <=> {b}: similarity={r:.2f}\n")
+    if not args.no_duplicates:
+        hashes = {}
+        for p,t in page_texts.items():
+            h = hash(t)
+            hashes.setdefault(h,[]).append(p)
+        # exact duplicates
+        dup_count = 0
+        for h,files in hashes.items():
+            if len(files)>1:
+                dup_count += len(files)
+                out.append(f"\nExact duplicate pages (content hash): {len(files)}\n")
+                for f in files:
+                    out.append(f"- {f}\n")
+        # near duplicates via SequenceMatcher
+        paths = list(page_texts.keys())
+        if args.similarity_backend == 'exact':
+            near_dups = near_duplicates_exact(paths)
+        else:
+            near_dups = near_duplicates_minhash(paths, cache)
+        out.append(f"\nNear-duplicate page pairs (>0.90): {len(near_dups)}\n")
+        for a,b,r in near_dups[:100]:
+            out.append(f"- {a} <=> {b}: similarity={r:.2f}\n")
+        metrics.mark('duplicates')
+
+    # memoized ratios are keyed by two text fingerprints; keep those of pages still present
+    live = set(page_fingerprints.values())
+    metrics.count('cache_pruned', cache.prune(lambda key: key[:32] in live and key[32:] in live))
+    cache.close()
 
     report = ''.join(out)
     print(report)
     with open('tools/policy-scan-report.txt','w',encoding='utf-8') as fo:
         fo.write(report)
+    metrics.mark('report')
+    metrics.finish(cache_hits=cache.hits, cache_misses=cache.misses)
 
 if __name__=='__main__':
     main()
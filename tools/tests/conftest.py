@@ -0,0 +1,158 @@
+"""
+Shared setup for the tools/ test suite (python3 -m pytest tools/tests).
+
+Puts tools/ and tools/content/ on sys.path the way the scripts do for
+themselves, so tests import `common.*` and the content stages directly,
+and provides `stub_server`, a local stand-in HTTP server for the network
+code (common/httpclient.py, common/crawler.py).
+"""
+import collections
+import hashlib
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+TOOLS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (TOOLS_DIR, os.path.join(TOOLS_DIR, 'content')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+def pytest_addoption(parser):
+    parser.addoption('--update-golden', action='store_true',
+                     help='Rewrite golden files under tests/fixtures instead of comparing against them')
+
+
+# bigger than httpclient.CHUNK, so a body dropped halfway has already been fed in part
+PAGE = b'<html><body>' + b'stand-in page ' * 10000 + b'</body></html>'
+
+
+def reply(handler, status, body=b'', headers=None, chunked=False):
+    """Send a response from a StubServer route; HEAD gets the headers only."""
+    handler.send_response(status)
+    for name, value in (headers or {}).items():
+        handler.send_header(name, value)
+    if chunked:
+        handler.send_header('Transfer-Encoding', 'chunked')
+    else:
+        handler.send_header('Content-Length', str(len(body)))
+    handler.end_headers()
+    if handler.command == 'HEAD':
+        return
+    if not chunked:
+        handler.wfile.write(body)
+        return
+    for i in range(0, len(body), 1000):
+        piece = body[i:i + 1000]
+        handler.wfile.write(b'%x\r\n%s\r\n' % (len(piece), piece))
+    handler.wfile.write(b'0\r\n\r\n')
+
+
+def _page(handler):
+    if handler.headers.get('If-None-Match') == '"v1"':
+        return reply(handler, 304, headers={'ETag': '"v1"'})
+    reply(handler, 200, PAGE, {'ETag': '"v1"', 'Content-Type': 'text/html'})
+
+
+def _drop(handler):
+    # the first request for /drop that arrives on a reused keep-alive connection
+    # gets half its body and then a closed socket
+    stub = handler.server.stub
+    if handler.on_conn > 1 and not stub.hits['/drop.dropped']:
+        stub.hits['/drop.dropped'] += 1
+        handler.send_response(200)
+        handler.send_header('Content-Length', str(len(PAGE)))
+        handler.end_headers()
+        handler.wfile.write(PAGE[:len(PAGE) // 2])
+        handler.wfile.flush()
+        handler.connection.shutdown(socket.SHUT_RDWR)
+        handler.close_connection = True
+        return
+    reply(handler, 200, PAGE)
+
+
+def _slow(handler):
+    time.sleep(0.3)
+    reply(handler, 200, b'slow')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.on_conn = 0
+        with self.server.stub.lock:
+            self.server.stub.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def _dispatch(self):
+        stub = self.server.stub
+        self.on_conn += 1
+        path = self.path.split('?', 1)[0]
+        with stub.lock:
+            stub.hits[path] += 1
+            stub.requests.append((self.command, self.path, dict(self.headers)))
+        route = stub.routes.get(path)
+        if route is None:
+            reply(self, 404, b'not found')
+        else:
+            route(self)
+
+    do_GET = do_HEAD = _dispatch
+
+
+class StubServer:
+    """Local stand-in HTTP/1.1 server (keep-alive) on an ephemeral port.
+
+    Default routes: /page (ETag "v1", 304 on If-None-Match), /redirect and
+    /redirect2 (-> /page), /chunked, /drop (see _drop) and /slow (0.3 s).
+    Tests add their own with stub.routes[path] = fn(handler), answering
+    through reply(). hits counts requests per path, connections the TCP
+    connections accepted.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = collections.Counter()
+        self.requests = []
+        self.connections = 0
+        self.routes = {
+            '/page': _page,
+            '/redirect': lambda h: reply(h, 301, headers={'Location': '/redirect2'}),
+            '/redirect2': lambda h: reply(h, 302, headers={'Location': '/page'}),
+            '/chunked': lambda h: reply(h, 200, PAGE, chunked=True),
+            '/drop': _drop,
+            '/slow': _slow,
+        }
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.stub = self
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def url(self, path):
+        return f'http://127.0.0.1:{self.httpd.server_port}{path}'
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def stub_server():
+    server = StubServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def page_sha256():
+    return hashlib.sha256(PAGE).hexdigest()
@@ -0,0 +1,112 @@
+"""apply_seo: extract_head/rewrite_page against the golden files in fixtures/apply_seo.
+
+generated/ holds landing pages as generate_seo writes them and targets/ the
+shard pages they are applied to. expected/<generated>/ holds the output for
+each target (and head.html for extract_head). Where the implementation before
+the html.parser rewrite produced something else, its output sits next to it
+as <name>.old.html (produced by the regex implementation), and the
+difference must be one documented below.
+
+Regenerate after an intentional change with
+  python3 -m pytest tools/tests/test_apply_seo.py --update-golden
+and review the diff.
+"""
+import fnmatch
+import os
+
+import pytest
+
+from apply_seo import AD_LOADER, extract_head, rewrite_page
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'apply_seo')
+CANONICAL = 'https://play.poki2.online/games/blockninja/'
+
+
+def names(folder):
+    return sorted(f[:-len('.html')] for f in os.listdir(os.path.join(FIXTURES, folder)))
+
+
+GENERATED = names('generated')
+TARGETS = names('targets')
+
+# Where the old output differs, and why: all cases the old code mangled.
+# Keys are '<generated>/<name>' glob patterns over the .old.html files.
+DOCUMENTED_DIFFERENCES = {
+    '*/no_head': 'no <head>: the old re.sub replaced <body ...> with "\\x01" (a \'\\1\' in a '
+                 'non-raw string) and so never added the ad slot; the new head now goes before <body>',
+    '*/unclosed_head': '<head> without </head>: the old code inserted a second head before <body>, '
+                       'with the same "\\x01" damage; the old head is now replaced up to <body>',
+    '*/script_markup': 'the old re.sub replaced every <head>...</head>, including one inside an inline '
+                       'script string; only the page\'s own head is replaced now',
+    'escapes/*': 'backslashes in the generated head were re.sub template escapes ("\\n" became a newline) '
+                 'wherever the old code spliced it with re.sub; they are copied literally now',
+    'no_canonical/*': 'the old code added the canonical link before a lowercase </head> only; '
+                      'an uppercase </HEAD> now gets one too',
+}
+
+
+def read(*parts):
+    with open(os.path.join(FIXTURES, *parts), encoding='utf-8', newline='') as f:
+        return f.read()
+
+
+def check_golden(request, actual, *parts):
+    path = os.path.join(FIXTURES, *parts)
+    if request.config.getoption('update_golden'):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            f.write(actual)
+    assert actual == read(*parts)
+
+
+def old_output(gen, name):
+    parts = ('expected', gen, name + '.old.html')
+    return read(*parts) if os.path.exists(os.path.join(FIXTURES, *parts)) else None
+
+
+def documented(case):
+    return [why for pattern, why in DOCUMENTED_DIFFERENCES.items() if fnmatch.fnmatchcase(case, pattern)]
+
+
+@pytest.mark.parametrize('gen', GENERATED)
+def test_extract_head(request, gen):
+    head = extract_head(read('generated', gen + '.html'), CANONICAL)
+    check_golden(request, head, 'expected', gen, 'head.html')
+    assert head.count('rel="canonical"') == 1
+    assert f'<link rel="canonical" href="{CANONICAL}">' in head
+
+
+def test_extract_head_without_canonical_href_or_head():
+    html = read('generated', 'landing.html')
+    assert extract_head(html) == html[html.index('<head>'):html.index('</head>') + len('</head>')]
+    assert extract_head(read('targets', 'no_head.html'), CANONICAL) is None
+
+
+@pytest.mark.parametrize('name', TARGETS)
+@pytest.mark.parametrize('gen', GENERATED)
+def test_rewrite_page(request, gen, name):
+    head = extract_head(read('generated', gen + '.html'), CANONICAL)
+    page = rewrite_page(read('targets', name + '.html'), head)
+    check_golden(request, page, 'expected', gen, name + '.html')
+    assert page.count(AD_LOADER) == 1
+    if '<body' in page.lower():
+        assert page.count('id="ad-slot-top"') == 1
+    # applying the same head again is a no-op
+    assert rewrite_page(page, head) == page
+
+
+@pytest.mark.parametrize('gen', GENERATED)
+def test_differences_from_the_old_output_are_documented(gen):
+    for name in ['head'] + TARGETS:
+        old = old_output(gen, name)
+        if old is None:
+            continue
+        assert old != read('expected', gen, name + '.html')
+        assert documented(f'{gen}/{name}'), f'undocumented difference from the old output: {gen}/{name}'
+
+
+def test_every_documented_difference_occurs():
+    cases = [f'{gen}/{name}' for gen in GENERATED for name in ['head'] + TARGETS
+             if old_output(gen, name) is not None]
+    for pattern in DOCUMENTED_DIFFERENCES:
+        assert fnmatch.filter(cases, pattern), f'no old output differs as {pattern!r} says'
@@ -0,0 +1,76 @@
+"""build_preview_images: Pillow encode/crop path and the manifest cache."""
+import json
+import os
+import sys
+
+import pytest
+
+Image = pytest.importorskip('PIL.Image')
+
+import build_preview_images as bpi
+
+
+def make_game(root, name, size=(800, 600), color=(200, 40, 40)):
+    game = root / name
+    game.mkdir()
+    Image.new('RGB', size, color).save(game / 'thumbnail.png')
+    return game
+
+
+def run(monkeypatch, inp, *extra):
+    monkeypatch.setattr(sys, 'argv', ['build_preview_images.py', '--input', str(inp), '--jobs', '1', *extra])
+    bpi.main()
+    with open(inp / bpi.MANIFEST_NAME, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_variants_and_og_crop(tmp_path, monkeypatch):
+    make_game(tmp_path, 'wide', size=(800, 600))
+    manifest = run(monkeypatch, tmp_path)
+    entry = manifest['games']['wide']
+    assert entry['size'] == [800, 600]
+    assert entry['source'] == 'thumbnail.png'
+
+    webp = {v['width']: v for v in entry['variants'] if v['format'] == 'webp'}
+    assert sorted(webp) == [320, 640]
+    for width, v in webp.items():
+        with Image.open(tmp_path / 'wide' / v['file']) as img:
+            assert img.format == 'WEBP'
+            assert img.size == (width, round(600 * width / 800)) == (v['width'], v['height'])
+
+    og = entry['og']
+    assert og == {'file': 'preview/og-1200x630.jpg', 'width': 1200, 'height': 630}
+    with Image.open(tmp_path / 'wide' / og['file']) as img:
+        assert img.format == 'JPEG'
+        assert img.size == bpi.OG_SIZE
+
+
+def test_widths_not_smaller_than_source_are_skipped(tmp_path, monkeypatch):
+    make_game(tmp_path, 'small', size=(400, 300))
+    entry = run(monkeypatch, tmp_path)['games']['small']
+    assert {v['width'] for v in entry['variants']} == {320}
+    # the OG crop is always produced, upscaled if need be
+    with Image.open(tmp_path / 'small' / entry['og']['file']) as img:
+        assert img.size == bpi.OG_SIZE
+
+
+def test_unchanged_sources_are_not_reencoded(tmp_path, monkeypatch, capsys):
+    game = make_game(tmp_path, 'g')
+    first = run(monkeypatch, tmp_path)
+    og = game / first['games']['g']['og']['file']
+    mtime = os.stat(og).st_mtime_ns
+    capsys.readouterr()
+
+    assert run(monkeypatch, tmp_path) == first
+    assert '0 processed, 1 unchanged' in capsys.readouterr().out
+    assert os.stat(og).st_mtime_ns == mtime
+
+    # new content re-encodes; a removed output does too
+    Image.new('RGB', (800, 600), (10, 10, 250)).save(game / 'thumbnail.png')
+    third = run(monkeypatch, tmp_path)
+    assert third['games']['g']['sha256'] != first['games']['g']['sha256']
+    capsys.readouterr()
+    os.remove(og)
+    run(monkeypatch, tmp_path)
+    assert '1 processed, 0 unchanged' in capsys.readouterr().out
+    assert og.exists()
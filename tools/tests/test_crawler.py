@@ -0,0 +1,137 @@
+"""common/crawler.py: retries, rate limiting, conditional requests and resume."""
+import asyncio
+import json
+import os
+import time
+
+import pytest
+
+from common.crawler import Crawler, TokenBucket
+from conftest import reply
+
+
+def make_crawler(tmp_path, **kw):
+    kw.setdefault('rate', 0)
+    kw.setdefault('backoff', 0.01)
+    return Crawler('test', store_path=str(tmp_path / 'etags.json'), cache_dir=str(tmp_path), **kw)
+
+
+def fail_first(status, times, **headers):
+    """Route answering `status` for the first `times` requests, then 200."""
+    seen = []
+
+    def route(handler):
+        seen.append(1)
+        if len(seen) <= times:
+            reply(handler, status, b'busy', headers)
+        else:
+            reply(handler, 200, b'ok')
+    return route
+
+
+def test_429_and_503_are_retried(stub_server, tmp_path):
+    stub_server.routes['/limited'] = fail_first(429, 1, **{'Retry-After': '0'})
+    stub_server.routes['/busy'] = fail_first(503, 2)
+    crawler = make_crawler(tmp_path, retries=3)
+    limited, busy = crawler.run([stub_server.url('/limited'), stub_server.url('/busy')])
+    assert (limited['status'], limited['attempts']) == (200, 2)
+    assert (busy['status'], busy['attempts']) == (200, 3)
+    assert crawler.stats['retries'] == 3
+    assert crawler.stats['errors'] == 0
+
+
+def test_retries_give_up_with_the_last_status(stub_server, tmp_path):
+    stub_server.routes['/down'] = fail_first(503, 100)
+    crawler = make_crawler(tmp_path, retries=1)
+    (rec,) = crawler.run([stub_server.url('/down')])
+    assert (rec['status'], rec['attempts']) == (503, 2)
+    assert stub_server.hits['/down'] == 2
+
+
+def test_connection_errors_are_retried_and_recorded(tmp_path):
+    crawler = make_crawler(tmp_path, retries=2, timeout=1.0)
+    (rec,) = crawler.run(['http://127.0.0.1:9/unreachable'])
+    assert rec['status'] == 0 and rec['error']
+    assert rec['attempts'] == 3
+    assert crawler.stats['errors'] == 1
+
+
+def test_second_run_gets_304_and_keeps_the_stored_facts(stub_server, tmp_path, page_sha256):
+    url = stub_server.url('/page')
+    (first,) = make_crawler(tmp_path).run([url])
+    assert first['status'] == 200 and not first['not_modified']
+    assert first['etag'] == '"v1"'
+
+    crawler = make_crawler(tmp_path)
+    (second,) = crawler.run([url])
+    assert stub_server.requests[-1][2].get('If-None-Match') == '"v1"'
+    assert second['not_modified']
+    assert (second['status'], second['sha256'], second['size']) == (200, page_sha256, first['size'])
+    assert crawler.stats['not_modified'] == 1
+
+    (plain,) = make_crawler(tmp_path, conditional=False).run([url])
+    assert 'If-None-Match' not in stub_server.requests[-1][2]
+    assert plain['status'] == 200 and not plain['not_modified']
+
+
+class Interrupted(Exception):
+    pass
+
+
+def test_resume_skips_urls_in_the_checkpoint(stub_server, tmp_path):
+    urls = [stub_server.url(f'/page?n={i}') for i in range(4)]
+    finished = []
+
+    def stop_after_two(rec):
+        finished.append(rec['url'])
+        if len(finished) == 2:
+            raise Interrupted
+
+    with pytest.raises(Interrupted):
+        make_crawler(tmp_path, concurrency=1).run(urls, on_result=stop_after_two)
+    checkpoint = tmp_path / 'crawl-test.checkpoint.jsonl'
+    with open(checkpoint, encoding='utf-8') as f:
+        recorded = {json.loads(line)['url'] for line in f if line.strip()}
+    assert set(finished) <= recorded < set(urls)
+    # a write torn by the interruption is skipped on resume
+    with open(checkpoint, 'a', encoding='utf-8') as f:
+        f.write('{"url": "http://torn')
+    before = stub_server.hits['/page']
+
+    crawler = make_crawler(tmp_path, concurrency=1, resume=True)
+    results = crawler.run(urls)
+    assert [r['url'] for r in results] == urls
+    assert all(r['status'] == 200 for r in results)
+    assert crawler.stats['resumed'] == len(recorded)
+    assert stub_server.hits['/page'] - before == len(urls) - len(recorded)
+    assert not checkpoint.exists()
+
+
+def test_without_resume_the_checkpoint_is_ignored(stub_server, tmp_path):
+    url = stub_server.url('/page')
+    with open(tmp_path / 'crawl-test.checkpoint.jsonl', 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'url': url, 'status': 500}) + '\n')
+    (rec,) = make_crawler(tmp_path).run([url])
+    assert rec['status'] == 200
+    assert stub_server.hits['/page'] == 1
+
+
+def test_token_bucket_paces_requests_after_the_burst():
+    async def take(bucket, n):
+        t0 = time.monotonic()
+        for _ in range(n):
+            await bucket.acquire()
+        return time.monotonic() - t0
+
+    # a burst of 2 is free, the next 5 tokens come at 50/s
+    assert asyncio.run(take(TokenBucket(50, 2), 7)) >= 0.09
+    assert asyncio.run(take(TokenBucket(0, 1), 100)) < 0.05
+
+
+def test_crawler_rate_limit(stub_server, tmp_path):
+    crawler = make_crawler(tmp_path, rate=40, concurrency=1)
+    t0 = time.monotonic()
+    crawler.run([stub_server.url(f'/page?n={i}') for i in range(5)])
+    # one token up front, then 4 more at 40/s
+    assert time.monotonic() - t0 >= 0.09
+    assert os.path.exists(tmp_path / 'etags.json')
@@ -0,0 +1,89 @@
+"""common/httpclient.py against the local stand-in server (conftest.StubServer)."""
+import asyncio
+import hashlib
+
+from common.httpclient import ConnectionPool, fetch, fetch_all
+from conftest import PAGE
+
+
+def fetch_seq(server, paths, per_host=1, timeout=5.0, **kw):
+    """Fetch paths one after another on one pool, so connections get reused."""
+    async def go():
+        pool = ConnectionPool(per_host=per_host, timeout=timeout)
+        try:
+            return [await fetch(pool, server.url(p), **kw) for p in paths]
+        finally:
+            await pool.close()
+    return asyncio.run(go())
+
+
+def test_keep_alive_reuses_one_connection(stub_server, page_sha256):
+    results = fetch_seq(stub_server, ['/page'] * 5)
+    assert [r.status for r in results] == [200] * 5
+    assert all(r.sha256 == page_sha256 and r.size == len(PAGE) for r in results)
+    assert stub_server.connections == 1
+
+
+def test_redirect_chain_is_followed_and_recorded(stub_server, page_sha256):
+    (r,) = fetch_seq(stub_server, ['/redirect'], keep_body=True)
+    assert r.status == 200
+    assert r.url == stub_server.url('/page')
+    assert r.chain == [(301, stub_server.url('/redirect')), (302, stub_server.url('/redirect2'))]
+    # only the final body is hashed and kept
+    assert r.sha256 == page_sha256
+    assert r.body == PAGE
+    assert stub_server.connections == 1
+
+
+def test_head_has_no_body_and_keeps_the_connection(stub_server):
+    results = fetch_seq(stub_server, ['/page', '/page'], method='HEAD')
+    assert [r.status for r in results] == [200, 200]
+    assert all(r.size == 0 and r.sha256 == hashlib.sha256(b'').hexdigest() for r in results)
+    assert results[0].headers['content-length'] == str(len(PAGE))
+    assert stub_server.connections == 1
+
+
+def test_chunked_body(stub_server, page_sha256):
+    chunked, plain = fetch_seq(stub_server, ['/chunked', '/page'], keep_body=True)
+    assert chunked.headers['transfer-encoding'] == 'chunked'
+    assert chunked.body == PAGE
+    assert (chunked.sha256, chunked.size) == (page_sha256, len(PAGE))
+    # the chunked body was read to its end, so the connection carried on
+    assert plain.status == 200
+    assert stub_server.connections == 1
+
+
+def test_dropped_reused_connection_is_retried_with_fresh_state(stub_server, page_sha256):
+    first, dropped = fetch_seq(stub_server, ['/page', '/drop'], keep_body=True)
+    assert stub_server.hits['/drop.dropped'] == 1
+    assert stub_server.hits['/drop'] == 2
+    assert not dropped.error
+    # half a body arrived before the drop; none of it may leak into the retry
+    assert dropped.body == PAGE
+    assert (dropped.sha256, dropped.size) == (page_sha256, len(PAGE))
+    assert stub_server.connections == 2
+
+
+def test_timeout_does_not_count_waiting_for_a_host_slot(stub_server):
+    # four 0.3 s requests through one slot take ~1.2 s, well past the timeout,
+    # but each one only spends 0.3 s on the wire
+    urls = [stub_server.url('/slow')] * 4
+    results = asyncio.run(fetch_all(urls, concurrency=4, per_host=1, timeout=0.6))
+    assert [(r.status, r.error) for r in results] == [(200, '')] * 4
+
+
+def test_slow_exchange_still_times_out(stub_server):
+    (r,) = fetch_seq(stub_server, ['/slow'], timeout=0.1)
+    assert r.error == 'timeout'
+    assert r.status == 0
+
+
+def test_missing_page_and_refused_connection(stub_server):
+    (r,) = fetch_seq(stub_server, ['/nope'])
+    assert r.status == 404 and not r.error
+    (r,) = fetch_seq(stub_server, ['/page'])
+    port = stub_server.httpd.server_port
+    stub_server.close()
+    refused = asyncio.run(fetch_all([f'http://127.0.0.1:{port}/page'], timeout=2.0))[0]
+    assert refused.status == 0
+    assert refused.error.startswith(('ConnectionRefusedError', 'OSError'))